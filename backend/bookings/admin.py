@@ -2,7 +2,7 @@
 Admin configuration for Bookings app
 """
 from django.contrib import admin
-from .models import Booking, BookingSeat
+from .models import Booking, BookingSeat, CheckoutIntent, WaitlistEntry
 
 
 class BookingSeatInline(admin.TabularInline):
@@ -27,3 +27,21 @@ class BookingAdmin(admin.ModelAdmin):
         ('Status', {'fields': ('status', 'lock_expires_at')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
+
+
+@admin.register(CheckoutIntent)
+class CheckoutIntentAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'bus', 'status', 'booking', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['user__email', 'bus__name', 'passenger_name']
+    ordering = ['-created_at']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'bus', 'seat_count', 'status', 'booking', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['user__email', 'bus__name']
+    ordering = ['-created_at']
+    readonly_fields = ['id', 'created_at', 'updated_at']
@@ -0,0 +1,159 @@
+"""
+Automatic seat selection for group bookings.
+
+Instead of a party picking seats one by one (and colliding with other
+users between the availability check and the hold), the server picks
+the best block from the seat grid and holds it with one conditional
+UPDATE. rank_blocks orders candidate blocks: one row first, then the
+fewest adjacent rows, optionally favouring window seats. If another user
+takes a seat of the block first, the hold updates fewer rows than
+expected and is rolled back; the grid is re-read and the next best block
+is tried, at most AUTO_PICK_MAX_ATTEMPTS times.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from buses.fares import FareEngine
+from buses.models import Bus, Seat
+from gobus import metrics
+from .cache import TripCache
+from .models import Booking, BookingSeat, BookingStatus
+
+
+def rank_blocks(free, size: int, rows: int, seats_per_row: int, prefer_window: bool = False) -> list:
+    """
+    Candidate blocks of `size` free seats, best first, as lists of seat IDs.
+    
+    `free` lists the free seats as (row, column, seat_id). A block is the
+    smallest rectangle of adjacent rows and columns that fits the party;
+    it may have taken seats only in the slack of its last row, and the
+    seats used in that row sit side by side. Blocks on fewer rows rank
+    first, then tighter ones, then (with prefer_window) those with more
+    window seats, then the ones nearer the front.
+    """
+    grid = {(row, column): seat_id for row, column, seat_id in free}
+    last_column = seats_per_row - 1
+    min_height = -(-size // seats_per_row)
+    max_height = min(rows, size, min_height + 1)
+    
+    candidates = []
+    for height in range(min_height, max_height + 1):
+        width = -(-size // height)
+        last_row_seats = size - (height - 1) * width
+        if last_row_seats <= 0:
+            # The party already fits in fewer rows of this width
+            continue
+        for top in range(1, rows - height + 2):
+            bottom = top + height - 1
+            for left in range(seats_per_row - width + 1):
+                cells = [(row, column) for row in range(top, bottom) for column in range(left, left + width)]
+                if any(cell not in grid for cell in cells):
+                    continue
+                # The last row's seats sit side by side; the slack may be either side
+                first = next((
+                    first for first in range(left, left + width - last_row_seats + 1)
+                    if all((bottom, column) in grid for column in range(first, first + last_row_seats))
+                ), None)
+                if first is None:
+                    continue
+                cells += [(bottom, column) for column in range(first, first + last_row_seats)]
+                windows = sum(1 for _, column in cells if column in (0, last_column))
+                score = (height, height * width - size, -windows if prefer_window else 0, top, left)
+                candidates.append((score, [grid[cell] for cell in cells]))
+    
+    candidates.sort(key=lambda candidate: candidate[0])
+    seen = set()
+    blocks = []
+    for _, seat_ids in candidates:
+        key = frozenset(seat_ids)
+        if key not in seen:
+            seen.add(key)
+            blocks.append(seat_ids)
+    return blocks
+
+
+class SeatAutoPickService:
+    """Service for picking and holding seats on behalf of a group"""
+    
+    @staticmethod
+    def _load_seats(bus) -> list:
+        return list(
+            Seat.objects.filter(bus=bus)
+            .only('id', 'seat_number', 'row', 'column', 'is_booked', 'segment_mask', 'locked_until')
+        )
+    
+    @staticmethod
+    def hold_best_block(user, bus_id, seat_count: int, passenger_name, passenger_phone, passenger_email,
+                        prefer_window: bool = False):
+        """
+        Pick the best block of `seat_count` seats and hold it as a pending
+        booking at the current fare. Returns (booking, attempts); raises
+        ValueError when no block fits or every attempt collided.
+        """
+        try:
+            bus = Bus.objects.get(id=bus_id, is_active=True)
+        except Bus.DoesNotExist:
+            raise ValueError("Bus not found or not available")
+        
+        lock_timeout_minutes = getattr(settings, 'SEAT_LOCK_TIMEOUT', 10)
+        max_attempts = getattr(settings, 'AUTO_PICK_MAX_ATTEMPTS', 3)
+        seats = SeatAutoPickService._load_seats(bus)
+        
+        for attempt in range(1, max_attempts + 1):
+            free = [seat for seat in seats if seat.is_available]
+            blocks = rank_blocks(
+                [(seat.row, seat.column, seat.id) for seat in free],
+                seat_count,
+                bus.rows,
+                bus.seats_per_row,
+                prefer_window
+            )
+            if not blocks:
+                raise ValueError(f"No {seat_count} seats together are available on this bus")
+            
+            block = blocks[0]
+            now = timezone.now()
+            lock_expires = now + timezone.timedelta(minutes=lock_timeout_minutes)
+            with transaction.atomic():
+                # Conditional hold: only seats still free are locked, so a
+                # short count means someone else got there first
+                held = Seat.objects.filter(
+                    id__in=block,
+                    bus=bus,
+                    is_booked=False,
+                    segment_mask=0
+                ).filter(
+                    Q(locked_until__isnull=True) | Q(locked_until__lte=now)
+                ).update(locked_until=lock_expires, locked_by=user)
+                
+                if held == len(block):
+                    by_id = {seat.id: seat for seat in free}
+                    picked = sorted((by_id[seat_id] for seat_id in block), key=lambda seat: (seat.row, seat.column))
+                    occupancy = (len(seats) - len(free)) * 100 // len(seats)
+                    quote = FareEngine.quote(bus, picked, occupancy=occupancy)
+                    
+                    booking = Booking.objects.create(
+                        user=user,
+                        bus=bus,
+                        passenger_name=passenger_name,
+                        passenger_phone=passenger_phone,
+                        passenger_email=passenger_email,
+                        seat_count=seat_count,
+                        price_per_seat=quote['price_per_seat'],
+                        total_amount=quote['total_amount'],
+                        fare_breakdown=quote['breakdown'],
+                        status=BookingStatus.PENDING,
+                        lock_expires_at=lock_expires
+                    )
+                    BookingSeat.objects.bulk_create([BookingSeat(booking=booking, seat=seat) for seat in picked])
+                    TripCache.invalidate(user.id)
+                    metrics.increment('bookings.auto_pick.held')
+                    return booking, attempt
+                
+                transaction.set_rollback(True)
+            
+            metrics.increment('bookings.auto_pick.collisions')
+            seats = SeatAutoPickService._load_seats(bus)
+        
+        raise ValueError("Seats on this bus are selling fast; please try again")
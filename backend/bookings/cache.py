@@ -0,0 +1,95 @@
+"""
+Per-user cached projections for the My Trips / My Tickets screens.
+
+Each projection is the fully serialized list for one user, so a repeat
+read is a single cache get. Booking history is the exception: it grows
+without bound, so it is cached a page at a time under a per-user version
+that invalidation retires. Entries are dropped whenever a booking or
+ticket of that user changes state (see TripCache.invalidate).
+"""
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+PROJECTIONS = ('history', 'upcoming', 'tickets')
+
+
+def _key(user_id, projection):
+    return f"my_trips:{user_id}:{projection}"
+
+
+def _timeout():
+    return getattr(settings, 'MY_TRIPS_CACHE_TIMEOUT', 300)
+
+
+class TripCache:
+    """Cached per-user trip projections with event-driven invalidation"""
+    
+    @staticmethod
+    def get_history_page(user, status, page, build) -> dict:
+        """
+        One page of the user's bookings (optionally of one status), as
+        built by build() on a miss; only that page is loaded
+        """
+        version_key = _key(user.id, 'history')
+        version = cache.get(version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(version_key, version, _timeout())
+        
+        key = f"{version_key}:{version}:{status or 'all'}:{page}"
+        data = cache.get(key)
+        if data is None:
+            data = build()
+            cache.set(key, data, _timeout())
+        return data
+    
+    @staticmethod
+    def get_upcoming(user) -> list:
+        """Confirmed bookings that have not departed yet, soonest first"""
+        key = _key(user.id, 'upcoming')
+        data = cache.get(key)
+        if data is None:
+            from .models import Booking, BookingStatus
+            from .serializers import BookingListSerializer
+            
+            now = timezone.now()
+            bookings = list(Booking.objects.filter(
+                user=user,
+                status=BookingStatus.CONFIRMED,
+                bus__departure_time__gte=now
+            ).select_related('bus').prefetch_related('seats').order_by('bus__departure_time'))
+            data = BookingListSerializer(bookings, many=True).data
+            
+            # Expire no later than the first departure so departed trips drop out
+            timeout = _timeout()
+            if bookings:
+                seconds_left = int((bookings[0].bus.departure_time - now).total_seconds()) + 1
+                timeout = max(1, min(timeout, seconds_left))
+            cache.set(key, data, timeout)
+        return data
+    
+    @staticmethod
+    def get_tickets(user) -> list:
+        """All tickets of the user, newest first"""
+        key = _key(user.id, 'tickets')
+        data = cache.get(key)
+        if data is None:
+            from tickets.models import Ticket
+            from tickets.serializers import TicketSerializer
+            
+            tickets = Ticket.objects.filter(
+                booking__user=user
+            ).select_related('booking', 'booking__bus').prefetch_related('booking__seats').order_by('-created_at')
+            data = TicketSerializer(tickets, many=True).data
+            cache.set(key, data, _timeout())
+        return data
+    
+    @staticmethod
+    def invalidate(*user_ids):
+        """Drop the cached projections of the given users once the transaction commits"""
+        keys = [_key(user_id, projection) for user_id in set(user_ids) for projection in PROJECTIONS]
+        if keys:
+            transaction.on_commit(lambda: cache.delete_many(keys))
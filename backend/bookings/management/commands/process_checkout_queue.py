@@ -0,0 +1,49 @@
+"""
+Worker for the async checkout queue
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from bookings.services import CheckoutService
+
+
+class Command(BaseCommand):
+    help = 'Apply queued checkout intents, one shard of buses per worker'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker threads in this process (one shard each)')
+        parser.add_argument('--shard-offset', type=int, default=0,
+                            help='First shard index handled by this process')
+        parser.add_argument('--shard-count', type=int, default=None,
+                            help='Total shards across all processes (defaults to --workers)')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue')
+        parser.add_argument('--interval', type=float, default=1.0, help='Poll interval in seconds')
+    
+    def handle(self, *args, **options):
+        workers = options['workers']
+        shard_count = options['shard_count'] or workers
+        shards = [options['shard_offset'] + i for i in range(workers)]
+        
+        def run_shard(shard_index):
+            close_old_connections()
+            try:
+                return CheckoutService.process_pending(
+                    shard_index=shard_index,
+                    shard_count=shard_count,
+                    limit=options['batch_size']
+                )
+            finally:
+                close_old_connections()
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                processed = sum(executor.map(run_shard, shards))
+                if processed:
+                    self.stdout.write(f"Processed {processed} checkout intents")
+                if not options['loop']:
+                    break
+                if not processed:
+                    time.sleep(options['interval'])
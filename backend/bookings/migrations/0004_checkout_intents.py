@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:13
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_initial'),
+        ('buses', '0003_alter_bus_operator'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutIntent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('seat_ids', models.JSONField(default=list)),
+                ('passenger_name', models.CharField(max_length=255)),
+                ('passenger_phone', models.CharField(max_length=20)),
+                ('passenger_email', models.EmailField(max_length=254)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('booking', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='checkout_intent', to='bookings.booking')),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkout_intents', to='buses.bus')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkout_intents', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'checkout_intents',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['bus', 'status', 'created_at'], name='checkout_in_bus_id_34c30b_idx')],
+            },
+        ),
+    ]
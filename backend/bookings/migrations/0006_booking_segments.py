@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_waitlist_entries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='alighting_stop',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='boarding_stop',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checkoutintent',
+            name='alighting_stop',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checkoutintent',
+            name='boarding_stop',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
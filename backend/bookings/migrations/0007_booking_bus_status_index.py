@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_booking_segments'),
+        ('buses', '0005_bus_departure_time_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['bus', 'status'], name='bookings_bus_id_788c50_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_bus_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='fare_breakdown',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
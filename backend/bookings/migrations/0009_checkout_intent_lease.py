@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_booking_fare_breakdown'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkoutintent',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -2,9 +2,9 @@
 Booking model for GoBus
 """
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
-from buses.models import Bus, Seat
+from buses.models import Bus, Seat, segment_mask
 
 
 class BookingStatus(models.TextChoices):
@@ -36,6 +36,10 @@ class Booking(models.Model):
         through='BookingSeat'
     )
     
+    # Boarding/alighting stop sequences for multi-stop trips (null = full route)
+    boarding_stop = models.PositiveSmallIntegerField(null=True, blank=True)
+    alighting_stop = models.PositiveSmallIntegerField(null=True, blank=True)
+    
     # Passenger details
     passenger_name = models.CharField(max_length=255)
     passenger_phone = models.CharField(max_length=20)
@@ -45,6 +49,7 @@ class Booking(models.Model):
     seat_count = models.IntegerField(default=1)
     price_per_seat = models.DecimalField(max_digits=10, decimal_places=2)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    fare_breakdown = models.JSONField(default=dict, blank=True)  # fare quoted at hold time, per seat
     
     # Status
     status = models.CharField(
@@ -62,33 +67,79 @@ class Booking(models.Model):
     class Meta:
         db_table = 'bookings'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['bus', 'status']),
+        ]
     
     def __str__(self):
         return f"Booking {self.id} - {self.user.name} - {self.bus.name}"
     
     @property
     def seat_numbers(self):
-        """Get list of seat numbers"""
-        return list(self.seats.values_list('seat_number', flat=True))
+        """Get list of seat numbers (served from prefetch_related('seats') when present)"""
+        return [seat.seat_number for seat in self.seats.all()]
+    
+    @property
+    def segment_mask(self):
+        """Segments occupied by a partial-route booking, or None for the full route"""
+        if self.boarding_stop is None or self.alighting_stop is None:
+            return None
+        return segment_mask(self.boarding_stop, self.alighting_stop)
     
+    @transaction.atomic
     def confirm(self):
         """Confirm the booking and mark seats as booked"""
+        from notifications.services import NotificationService
+        from tickets.rendering import schedule_ticket_render
+        from .cache import TripCache
+        
         self.status = BookingStatus.CONFIRMED
         self.save(update_fields=['status', 'updated_at'])
+        TripCache.invalidate(self.user_id)
+        NotificationService().send_booking_confirmation(self)
+        
+        # Issue and render the e-ticket off the request path
+        transaction.on_commit(lambda: schedule_ticket_render(self.id))
+        
+        mask = self.segment_mask
+        if mask is not None:
+            # Occupy only the travelled segments so the rest stay sellable
+            self.seats.update(
+                segment_mask=models.F('segment_mask').bitor(mask),
+                locked_until=None,
+                locked_by=None
+            )
+            return
         
         # Mark all seats as booked
         for seat in self.seats.all():
             seat.book()
     
+    @transaction.atomic
     def cancel(self):
-        """Cancel the booking and release seats"""
+        """Cancel the booking, release seats and queue a refund if it was paid"""
+        from notifications.services import NotificationService
+        from payments.models import RefundReason
+        from payments.refunds import RefundService
+        from .cache import TripCache
+        
+        was_confirmed = self.status == BookingStatus.CONFIRMED
         self.status = BookingStatus.CANCELLED
         self.save(update_fields=['status', 'updated_at'])
+        TripCache.invalidate(self.user_id)
+        if was_confirmed:
+            NotificationService().send_cancellation_alert(self)
+            RefundService.enqueue_for_bookings([self.id], RefundReason.BOOKING_CANCELLED)
+        
+        mask = self.segment_mask
+        if mask is not None:
+            if was_confirmed:
+                self.seats.update(segment_mask=models.F('segment_mask').bitand(~mask))
+            self.seats.filter(is_booked=False).update(locked_until=None, locked_by=None)
+            return
         
         # Release all seats
-        for seat in self.seats.all():
-            seat.is_booked = False
-            seat.unlock()
+        self.seats.update(is_booked=False, locked_until=None, locked_by=None)
 
 
 class BookingSeat(models.Model):
@@ -100,3 +151,119 @@ class BookingSeat(models.Model):
     class Meta:
         db_table = 'booking_seats'
         unique_together = ['booking', 'seat']
+
+
+class CheckoutIntentStatus(models.TextChoices):
+    QUEUED = 'queued', 'Queued'
+    PROCESSING = 'processing', 'Processing'
+    SUCCEEDED = 'succeeded', 'Succeeded'
+    FAILED = 'failed', 'Failed'
+
+
+class CheckoutIntent(models.Model):
+    """Queued seat hold request used by the async checkout mode"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='checkout_intents'
+    )
+    bus = models.ForeignKey(
+        Bus,
+        on_delete=models.CASCADE,
+        related_name='checkout_intents'
+    )
+    
+    # Requested hold
+    seat_ids = models.JSONField(default=list)
+    boarding_stop = models.PositiveSmallIntegerField(null=True, blank=True)
+    alighting_stop = models.PositiveSmallIntegerField(null=True, blank=True)
+    passenger_name = models.CharField(max_length=255)
+    passenger_phone = models.CharField(max_length=20)
+    passenger_email = models.EmailField()
+    
+    # Outcome
+    status = models.CharField(
+        max_length=20,
+        choices=CheckoutIntentStatus.choices,
+        default=CheckoutIntentStatus.QUEUED
+    )
+    booking = models.OneToOneField(
+        Booking,
+        on_delete=models.SET_NULL,
+        related_name='checkout_intent',
+        null=True,
+        blank=True
+    )
+    error_message = models.TextField(blank=True, null=True)
+    
+    # Lease of the worker processing the intent; an expired one is claimed again
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'checkout_intents'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['bus', 'status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Checkout {self.id} - {self.bus_id} - {self.status}"
+
+
+class WaitlistStatus(models.TextChoices):
+    WAITING = 'waiting', 'Waiting'
+    OFFERED = 'offered', 'Offered'
+    EXPIRED = 'expired', 'Expired'
+    CANCELLED = 'cancelled', 'Cancelled'
+
+
+class WaitlistEntry(models.Model):
+    """FIFO waitlist entry for a sold-out bus"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries'
+    )
+    bus = models.ForeignKey(
+        Bus,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries'
+    )
+    
+    # Request
+    seat_count = models.IntegerField(default=1)
+    preferences = models.JSONField(default=dict, blank=True)  # e.g. {"window": true, "together": true}
+    
+    # Outcome
+    status = models.CharField(
+        max_length=20,
+        choices=WaitlistStatus.choices,
+        default=WaitlistStatus.WAITING
+    )
+    booking = models.OneToOneField(
+        Booking,
+        on_delete=models.SET_NULL,
+        related_name='waitlist_entry',
+        null=True,
+        blank=True
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'waitlist_entries'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['bus', 'status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Waitlist {self.id} - {self.bus_id} - {self.seat_count} seat(s)"
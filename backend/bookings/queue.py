@@ -0,0 +1,119 @@
+"""
+Pluggable queue backends for the async checkout mode.
+
+Checkout intents are sharded by bus: every worker owns a fixed subset of
+bus IDs, so holds on the same bus are always applied one after another by
+a single worker and never contend for the same seat rows. Claimed intents
+carry a lease, so the intents of a worker that died mid-batch are picked
+up again once it runs out.
+"""
+import abc
+import uuid
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from buses.models import Bus
+from .models import CheckoutIntent, CheckoutIntentStatus
+
+
+def _claimable(now) -> Q:
+    """Queued intents, and claimed ones whose worker's lease ran out"""
+    return Q(status=CheckoutIntentStatus.QUEUED) | (
+        Q(status=CheckoutIntentStatus.PROCESSING)
+        & (Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+    )
+
+
+def shard_for(bus_id, shard_count: int) -> int:
+    """Map a bus ID onto one of `shard_count` worker shards"""
+    return uuid.UUID(str(bus_id)).int % shard_count
+
+
+class BaseCheckoutQueue(abc.ABC):
+    """Interface every checkout queue backend implements"""
+    
+    @abc.abstractmethod
+    def enqueue(self, user, bus_id, seat_ids, passenger_name, passenger_phone, passenger_email,
+                boarding_stop=None, alighting_stop=None) -> CheckoutIntent:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def pending_shards(self) -> list:
+        """Return bus IDs that have queued intents"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def claim(self, bus_id, limit: int) -> list:
+        """Claim up to `limit` queued (or abandoned) intents for a bus in FIFO order"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def complete(self, intent: CheckoutIntent, booking=None, error: str = None):
+        """Record the outcome of a claimed intent"""
+        raise NotImplementedError
+
+
+class DatabaseCheckoutQueue(BaseCheckoutQueue):
+    """Queue backed by the checkout_intents table; needs no outside service"""
+    
+    def enqueue(self, user, bus_id, seat_ids, passenger_name, passenger_phone, passenger_email,
+                boarding_stop=None, alighting_stop=None) -> CheckoutIntent:
+        if not Bus.objects.filter(id=bus_id, is_active=True).exists():
+            raise ValueError("Bus not found or not available")
+        
+        return CheckoutIntent.objects.create(
+            user=user,
+            bus_id=bus_id,
+            seat_ids=list(seat_ids),
+            passenger_name=passenger_name,
+            passenger_phone=passenger_phone,
+            passenger_email=passenger_email,
+            boarding_stop=boarding_stop,
+            alighting_stop=alighting_stop,
+            status=CheckoutIntentStatus.QUEUED
+        )
+    
+    def pending_shards(self) -> list:
+        return list(
+            CheckoutIntent.objects.filter(_claimable(timezone.now()))
+            .order_by()
+            .values_list('bus_id', flat=True)
+            .distinct()
+        )
+    
+    def claim(self, bus_id, limit: int) -> list:
+        now = timezone.now()
+        lease_until = now + timezone.timedelta(seconds=getattr(settings, 'CHECKOUT_QUEUE_LEASE_SECONDS', 60))
+        with transaction.atomic():
+            intents = list(
+                CheckoutIntent.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('user')
+                .filter(_claimable(now), bus_id=bus_id)
+                .order_by('created_at')[:limit]
+            )
+            if intents:
+                CheckoutIntent.objects.filter(id__in=[i.id for i in intents]).update(
+                    status=CheckoutIntentStatus.PROCESSING,
+                    claimed_until=lease_until
+                )
+        return intents
+    
+    def complete(self, intent: CheckoutIntent, booking=None, error: str = None):
+        intent.booking = booking
+        intent.error_message = error
+        intent.status = CheckoutIntentStatus.FAILED if error else CheckoutIntentStatus.SUCCEEDED
+        intent.save(update_fields=['booking', 'error_message', 'status', 'updated_at'])
+
+
+_queue = None
+
+
+def get_checkout_queue() -> BaseCheckoutQueue:
+    """Return the configured checkout queue backend"""
+    global _queue
+    if _queue is None:
+        backend = getattr(settings, 'CHECKOUT_QUEUE_BACKEND', 'bookings.queue.DatabaseCheckoutQueue')
+        _queue = import_string(backend)()
+    return _queue
@@ -2,7 +2,7 @@
 Booking serializers
 """
 from rest_framework import serializers
-from .models import Booking, BookingStatus
+from .models import Booking, BookingStatus, CheckoutIntent, WaitlistEntry
 from buses.serializers import BusListSerializer, SeatSerializer
 
 
@@ -18,6 +18,15 @@ class BookingCreateSerializer(serializers.Serializer):
     passenger_name = serializers.CharField(max_length=255)
     passenger_phone = serializers.CharField(max_length=20)
     passenger_email = serializers.EmailField()
+    boarding_stop = serializers.IntegerField(min_value=0, required=False)
+    alighting_stop = serializers.IntegerField(min_value=1, required=False)
+    
+    def validate(self, attrs):
+        if ('boarding_stop' in attrs) != ('alighting_stop' in attrs):
+            raise serializers.ValidationError(
+                'boarding_stop and alighting_stop must be given together.'
+            )
+        return attrs
 
 
 class BookingSerializer(serializers.ModelSerializer):
@@ -31,6 +40,7 @@ class BookingSerializer(serializers.ModelSerializer):
         model = Booking
         fields = [
             'id', 'bus', 'seats', 'seat_numbers',
+            'boarding_stop', 'alighting_stop',
             'passenger_name', 'passenger_phone', 'passenger_email',
             'seat_count', 'price_per_seat', 'total_amount',
             'status', 'lock_expires_at', 'created_at'
@@ -58,3 +68,83 @@ class BookingConfirmSerializer(serializers.Serializer):
     """Serializer for confirming a booking"""
     
     payment_id = serializers.CharField(max_length=255)
+
+
+class CheckoutIntentSerializer(serializers.ModelSerializer):
+    """Serializer for async checkout status"""
+    
+    checkout_id = serializers.UUIDField(source='id', read_only=True)
+    bus_id = serializers.UUIDField(read_only=True)
+    booking = BookingSerializer(read_only=True)
+    
+    class Meta:
+        model = CheckoutIntent
+        fields = [
+            'checkout_id', 'bus_id', 'seat_ids', 'status',
+            'booking', 'error_message', 'created_at', 'updated_at'
+        ]
+
+
+class WaitlistJoinSerializer(serializers.Serializer):
+    """Serializer for joining a bus waitlist"""
+    
+    bus_id = serializers.UUIDField()
+    seat_count = serializers.IntegerField(min_value=1, max_value=10)
+    preferences = serializers.DictField(required=False)
+
+
+class AutoPickSerializer(serializers.Serializer):
+    """Serializer for letting the server pick seats for a group"""
+    
+    bus_id = serializers.UUIDField()
+    seat_count = serializers.IntegerField(min_value=1, max_value=10)
+    prefer_window = serializers.BooleanField(required=False, default=False)
+    passenger_name = serializers.CharField(max_length=255)
+    passenger_phone = serializers.CharField(max_length=20)
+    passenger_email = serializers.EmailField()
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    """Serializer for waitlist entries"""
+    
+    bus_id = serializers.UUIDField(read_only=True)
+    booking_id = serializers.UUIDField(read_only=True)
+    
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'bus_id', 'seat_count', 'preferences',
+            'status', 'booking_id', 'created_at'
+        ]
+
+
+class TripCancelSerializer(serializers.Serializer):
+    """Serializer for an operator cancelling a whole trip"""
+    
+    reason = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+
+class TripBulkCancelSerializer(TripCancelSerializer):
+    """Serializer for cancelling many trips at once"""
+    
+    bus_ids = serializers.ListField(child=serializers.UUIDField(), min_length=1, max_length=500)
+
+
+class TripRescheduleSerializer(serializers.Serializer):
+    """Serializer for moving many trips by the same offset"""
+    
+    bus_ids = serializers.ListField(child=serializers.UUIDField(), min_length=1, max_length=500)
+    shift_minutes = serializers.IntegerField(min_value=-7 * 24 * 60, max_value=7 * 24 * 60)
+    reason = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    
+    def validate_shift_minutes(self, value):
+        if value == 0:
+            raise serializers.ValidationError("Shift must not be zero")
+        return value
+
+
+class SeatTransferSerializer(serializers.Serializer):
+    """Serializer for moving a trip's bookings to a replacement bus"""
+    
+    target_bus_id = serializers.UUIDField()
+    strategy = serializers.ChoiceField(choices=['label', 'best_fit'], default='label')
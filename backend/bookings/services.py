@@ -1,20 +1,30 @@
 """
 Booking business logic services
 """
+import logging
+import time
 from django.utils import timezone
 from django.conf import settings
 from django.db import transaction
-from buses.models import Bus, Seat
-from .models import Booking, BookingStatus
+from django.db.models import F, Q
+from buses.fares import FareEngine, route_share
+from buses.models import Bus, BusStop, Seat, segment_mask
+from .models import Booking, BookingSeat, BookingStatus, WaitlistEntry, WaitlistStatus
+from .cache import TripCache
+from .queue import get_checkout_queue, shard_for
+
+logger = logging.getLogger(__name__)
 
 
 class BookingService:
     """Service for handling booking operations"""
     
     @staticmethod
-    def create_booking(user, bus_id, seat_ids, passenger_name, passenger_phone, passenger_email):
+    def create_booking(user, bus_id, seat_ids, passenger_name, passenger_phone, passenger_email,
+                       boarding_stop=None, alighting_stop=None):
         """
         Create a new booking with seat locks.
+        Pass boarding/alighting stop sequences to book part of a multi-stop route.
         Returns the booking if successful, raises exception otherwise.
         """
         try:
@@ -22,6 +32,17 @@ class BookingService:
         except Bus.DoesNotExist:
             raise ValueError("Bus not found or not available")
         
+        mask = ~0
+        share = None
+        if boarding_stop is not None or alighting_stop is not None:
+            stop_sequences = set(bus.stops.values_list('sequence', flat=True))
+            if boarding_stop not in stop_sequences or alighting_stop not in stop_sequences:
+                raise ValueError("Boarding or alighting stop not found on this route")
+            if boarding_stop >= alighting_stop:
+                raise ValueError("Alighting stop must come after boarding stop")
+            mask = segment_mask(boarding_stop, alighting_stop)
+            share = route_share(boarding_stop, alighting_stop, max(stop_sequences))
+        
         # Verify all seats exist and are available
         seats = Seat.objects.filter(id__in=seat_ids, bus=bus)
         
@@ -30,13 +51,18 @@ class BookingService:
         
         unavailable_seats = []
         for seat in seats:
-            if not seat.is_available:
+            if not seat.is_available_for(mask):
                 unavailable_seats.append(seat.seat_number)
         
         if unavailable_seats:
             raise ValueError(f"Seats not available: {', '.join(unavailable_seats)}")
         
         with transaction.atomic():
+            # Quote the current fare before our own holds count towards occupancy;
+            # a partial trip pays its share of the route's segments
+            seat_count = len(seat_ids)
+            quote = FareEngine.quote(bus, seats, share=share)
+            
             # Lock seats for checkout
             lock_timeout_minutes = getattr(settings, 'SEAT_LOCK_TIMEOUT', 10)
             lock_expires = timezone.now() + timezone.timedelta(minutes=lock_timeout_minutes)
@@ -44,11 +70,6 @@ class BookingService:
             for seat in seats:
                 seat.lock(user, minutes=lock_timeout_minutes)
             
-            # Calculate pricing
-            seat_count = len(seat_ids)
-            price_per_seat = bus.price
-            total_amount = price_per_seat * seat_count
-            
             # Create booking
             booking = Booking.objects.create(
                 user=user,
@@ -57,14 +78,18 @@ class BookingService:
                 passenger_phone=passenger_phone,
                 passenger_email=passenger_email,
                 seat_count=seat_count,
-                price_per_seat=price_per_seat,
-                total_amount=total_amount,
+                price_per_seat=quote['price_per_seat'],
+                total_amount=quote['total_amount'],
+                fare_breakdown=quote['breakdown'],
                 status=BookingStatus.PENDING,
-                lock_expires_at=lock_expires
+                lock_expires_at=lock_expires,
+                boarding_stop=boarding_stop,
+                alighting_stop=alighting_stop
             )
             
             # Add seats to booking
             booking.seats.set(seats)
+            TripCache.invalidate(user.id)
             
             return booking
     
@@ -86,6 +111,85 @@ class BookingService:
         booking.confirm()
         return booking
     
+    @staticmethod
+    def _still_holds(booking, seats, now) -> bool:
+        """Whether a pending booking's hold is live and its seats are still free for it"""
+        if booking.lock_expires_at and booking.lock_expires_at <= now:
+            return False
+        mask = booking.segment_mask
+        for seat in seats:
+            if seat.is_booked or (seat.segment_mask if mask is None else seat.segment_mask & mask):
+                return False
+            if seat.locked_until and seat.locked_until > now and seat.locked_by_id != booking.user_id:
+                return False
+        return True
+    
+    @staticmethod
+    def confirm_bookings(booking_ids) -> list:
+        """
+        Confirm many pending bookings with set-based updates (one UPDATE for
+        the bookings, one per seat occupancy pattern). Bookings that are no
+        longer pending, whose hold lapsed or whose seats were since held or
+        sold to someone else are skipped. Returns the bookings that were
+        confirmed.
+        """
+        from notifications.outbox import OutboxService
+        from notifications.services import NotificationService
+        from tickets.rendering import schedule_ticket_render
+        
+        with transaction.atomic():
+            bookings = list(
+                Booking.objects.select_for_update(of=('self',))
+                .filter(id__in=list(booking_ids), status=BookingStatus.PENDING)
+                .select_related('bus', 'user')
+                .prefetch_related('seats')
+            )
+            if not bookings:
+                return []
+            
+            # Late payments (webhooks, reconciliation) can arrive after the hold
+            # lapsed; never take seats another user has re-held or bought since
+            now = timezone.now()
+            seats = Seat.objects.select_for_update().in_bulk(
+                [seat.id for booking in bookings for seat in booking.seats.all()]
+            )
+            bookings = [
+                booking for booking in bookings
+                if BookingService._still_holds(booking, [seats[seat.id] for seat in booking.seats.all()], now)
+            ]
+            if not bookings:
+                return []
+            
+            confirmed_ids = [booking.id for booking in bookings]
+            Booking.objects.filter(id__in=confirmed_ids).update(
+                status=BookingStatus.CONFIRMED,
+                updated_at=timezone.now()
+            )
+            
+            # Full-route bookings book their seats; partial ones occupy only their segments
+            by_mask = {}
+            for booking in bookings:
+                by_mask.setdefault(booking.segment_mask, []).append(booking.id)
+            for mask, ids in by_mask.items():
+                seats = Seat.objects.filter(
+                    id__in=BookingSeat.objects.filter(booking_id__in=ids).values('seat_id')
+                )
+                if mask is None:
+                    seats.update(is_booked=True, locked_until=None, locked_by=None)
+                else:
+                    seats.update(segment_mask=F('segment_mask').bitor(mask), locked_until=None, locked_by=None)
+            
+            notification_service = NotificationService()
+            with OutboxService.batch():
+                for booking in bookings:
+                    booking.status = BookingStatus.CONFIRMED
+                    notification_service.send_booking_confirmation(booking)
+            
+            TripCache.invalidate(*[booking.user_id for booking in bookings])
+            transaction.on_commit(lambda: [schedule_ticket_render(booking_id) for booking_id in confirmed_ids])
+        
+        return bookings
+    
     @staticmethod
     def cancel_booking(booking_id, user):
         """Cancel a booking"""
@@ -102,8 +206,169 @@ class BookingService:
             raise ValueError("Cannot cancel a booking after trip has started")
         
         booking.cancel()
+        WaitlistService.match_released_seats([booking.bus_id])
         return booking
     
+    @staticmethod
+    def cancel_trip(bus, reason: str = '') -> dict:
+        """Operator cancellation of a single trip (see cancel_trips)"""
+        if not bus.is_active:
+            raise ValueError("Trip is already cancelled")
+        if bus.departure_time < timezone.now():
+            raise ValueError("Cannot cancel a trip that has already departed")
+        
+        result = BookingService.cancel_trips([bus.id], reason)
+        bus.is_active = False
+        return result
+    
+    @staticmethod
+    def _open_trips(bus_ids, now):
+        """Active, not yet departed buses among bus_ids, locked for the rest of the transaction"""
+        return list(
+            Bus.objects.select_for_update()
+            .filter(id__in=list(bus_ids), is_active=True, departure_time__gt=now)
+            .order_by('id')
+        )
+    
+    @staticmethod
+    def cancel_trips(bus_ids, reason: str = '') -> dict:
+        """
+        Cancel many trips at once, as one transaction of set-based statements
+        whose count does not grow with the number of trips or passengers:
+        cancel every open booking, release all seats, close the waitlists,
+        queue refunds for paid bookings and one notice per passenger. The
+        buses are deactivated so they can no longer be sold. Buses that are
+        inactive or already departed are skipped.
+        """
+        from notifications.services import NotificationService
+        from payments.models import RefundReason
+        from payments.refunds import RefundService
+        
+        started = time.perf_counter()
+        requested = {str(bus_id) for bus_id in bus_ids}
+        now = timezone.now()
+        with transaction.atomic():
+            buses = BookingService._open_trips(requested, now)
+            ids = [bus.id for bus in buses]
+            Bus.objects.filter(id__in=ids).update(is_active=False, updated_at=now)
+            
+            bookings = list(
+                Booking.objects.filter(
+                    bus_id__in=ids,
+                    status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED]
+                ).order_by().values_list('id', 'bus_id', 'user_id', 'status')
+            )
+            recipients = {}
+            confirmed_ids = []
+            for booking_id, bus_id, user_id, booking_status in bookings:
+                if booking_status == BookingStatus.CONFIRMED:
+                    confirmed_ids.append(booking_id)
+                    recipients.setdefault(bus_id, set()).add(user_id)
+            
+            cancelled = Booking.objects.filter(id__in=[row[0] for row in bookings]).update(
+                status=BookingStatus.CANCELLED,
+                updated_at=now
+            )
+            seats_released = Seat.objects.filter(bus_id__in=ids).filter(
+                Q(is_booked=True) | ~Q(segment_mask=0) | Q(locked_until__isnull=False)
+            ).update(is_booked=False, segment_mask=0, locked_until=None, locked_by=None)
+            waitlist_closed = WaitlistEntry.objects.filter(
+                bus_id__in=ids,
+                status__in=[WaitlistStatus.WAITING, WaitlistStatus.OFFERED]
+            ).update(status=WaitlistStatus.CANCELLED, updated_at=now)
+            
+            refunds = RefundService.enqueue_for_bookings(confirmed_ids, RefundReason.TRIP_CANCELLED)
+            notified = NotificationService().queue_trip_cancellations(
+                {bus: recipients.get(bus.id, ()) for bus in buses}, reason
+            )
+            TripCache.invalidate(*[row[2] for row in bookings])
+        
+        return {
+            'buses': len(ids),
+            'skipped_bus_ids': sorted(requested - {str(bus_id) for bus_id in ids}),
+            'cancelled_bookings': cancelled,
+            'seats_released': seats_released,
+            'waitlist_closed': waitlist_closed,
+            'refunds_queued': refunds,
+            'passengers_notified': len(notified),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+    
+    @staticmethod
+    def reschedule_trips(bus_ids, shift: timezone.timedelta, reason: str = '') -> dict:
+        """
+        Move many trips by the same offset with set-based statements: bus and
+        stop times shift in place, so bookings and seats stay as they are.
+        Unvalidated tickets are dropped and reissued in the background, since
+        their signed tokens expire relative to the old arrival time, and sent
+        reminders are cleared so passengers are reminded of the new time
+        (right away when that reminder is already due).
+        Buses that are inactive, already departed or would be moved into the
+        past are skipped.
+        """
+        from notifications.models import TripReminder
+        from notifications.reminders import ReminderService
+        from notifications.services import NotificationService
+        from tickets.models import Ticket
+        from tickets.rendering import schedule_ticket_render
+        
+        started = time.perf_counter()
+        requested = {str(bus_id) for bus_id in bus_ids}
+        now = timezone.now()
+        with transaction.atomic():
+            buses = [
+                bus for bus in BookingService._open_trips(requested, now)
+                if bus.departure_time + shift > now
+            ]
+            ids = [bus.id for bus in buses]
+            Bus.objects.filter(id__in=ids).update(
+                departure_time=F('departure_time') + shift,
+                arrival_time=F('arrival_time') + shift,
+                updated_at=now
+            )
+            BusStop.objects.filter(bus_id__in=ids).update(
+                arrival_time=F('arrival_time') + shift,
+                departure_time=F('departure_time') + shift
+            )
+            for bus in buses:
+                bus.departure_time += shift
+                bus.arrival_time += shift
+            
+            bookings = list(
+                Booking.objects.filter(
+                    bus_id__in=ids,
+                    status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED]
+                ).order_by().values_list('id', 'bus_id', 'user_id', 'status')
+            )
+            recipients = {}
+            confirmed_ids = []
+            for booking_id, bus_id, user_id, booking_status in bookings:
+                if booking_status == BookingStatus.CONFIRMED:
+                    confirmed_ids.append(booking_id)
+                    recipients.setdefault(bus_id, set()).add(user_id)
+            
+            reissue_ids = list(
+                Ticket.objects.filter(booking_id__in=confirmed_ids, is_validated=False).values_list('booking_id', flat=True)
+            )
+            Ticket.objects.filter(booking_id__in=reissue_ids).delete()
+            TripReminder.objects.filter(booking_id__in=confirmed_ids).delete()
+            ReminderService.queue_moved_trips(ids, now)
+            
+            notified = NotificationService().queue_trip_reschedules(
+                {bus: recipients.get(bus.id, ()) for bus in buses}, shift, reason
+            )
+            TripCache.invalidate(*[row[2] for row in bookings])
+            transaction.on_commit(lambda: [schedule_ticket_render(booking_id) for booking_id in reissue_ids])
+        
+        return {
+            'buses': len(ids),
+            'skipped_bus_ids': sorted(requested - {str(bus_id) for bus_id in ids}),
+            'bookings_moved': len(bookings),
+            'tickets_reissued': len(reissue_ids),
+            'passengers_notified': len(notified),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+    
     @staticmethod
     def get_user_bookings(user, status=None):
         """Get all bookings for a user, optionally filtered by status"""
@@ -125,6 +390,7 @@ class BookingService:
             lock_expires_at__lt=expired_time
         )
         
+        released_bus_ids = set()
         for booking in expired_bookings:
             # Release seat locks
             for seat in booking.seats.all():
@@ -133,9 +399,260 @@ class BookingService:
             # Mark booking as cancelled
             booking.status = BookingStatus.CANCELLED
             booking.save(update_fields=['status'])
+            released_bus_ids.add(booking.bus_id)
+            TripCache.invalidate(booking.user_id)
+        
+        # Waitlist holds that were not paid in time
+        WaitlistEntry.objects.filter(
+            status=WaitlistStatus.OFFERED,
+            booking__status=BookingStatus.CANCELLED
+        ).update(status=WaitlistStatus.EXPIRED)
         
         # Also clean up orphan seat locks
-        Seat.objects.filter(
+        orphan_locks = Seat.objects.filter(
             locked_until__lt=expired_time,
             is_booked=False
-        ).update(locked_until=None, locked_by=None)
+        )
+        released_bus_ids.update(orphan_locks.values_list('bus_id', flat=True).distinct())
+        orphan_locks.update(locked_until=None, locked_by=None)
+        
+        WaitlistService.match_released_seats(released_bus_ids)
+
+
+class CheckoutService:
+    """Service for the queue-backed async checkout mode"""
+    
+    @staticmethod
+    def enqueue(user, bus_id, seat_ids, passenger_name, passenger_phone, passenger_email,
+                boarding_stop=None, alighting_stop=None):
+        """Queue a hold request and return the checkout intent"""
+        return get_checkout_queue().enqueue(
+            user=user,
+            bus_id=bus_id,
+            seat_ids=seat_ids,
+            passenger_name=passenger_name,
+            passenger_phone=passenger_phone,
+            passenger_email=passenger_email,
+            boarding_stop=boarding_stop,
+            alighting_stop=alighting_stop
+        )
+    
+    @staticmethod
+    def process_bus(bus_id, limit=None):
+        """Apply queued holds for one bus in FIFO order. Returns count processed."""
+        queue = get_checkout_queue()
+        limit = limit or getattr(settings, 'CHECKOUT_QUEUE_BATCH_SIZE', 50)
+        intents = queue.claim(bus_id, limit)
+        
+        for intent in intents:
+            try:
+                # The hold and its outcome commit together, so an intent
+                # claimed again after a worker crash is never held twice
+                with transaction.atomic():
+                    booking = BookingService.create_booking(
+                        user=intent.user,
+                        bus_id=intent.bus_id,
+                        seat_ids=intent.seat_ids,
+                        passenger_name=intent.passenger_name,
+                        passenger_phone=intent.passenger_phone,
+                        passenger_email=intent.passenger_email,
+                        boarding_stop=intent.boarding_stop,
+                        alighting_stop=intent.alighting_stop
+                    )
+                    queue.complete(intent, booking=booking)
+            except ValueError as e:
+                queue.complete(intent, error=str(e))
+            except Exception:
+                # Never leave a claimed intent in PROCESSING; the client would poll forever
+                logger.exception("Checkout intent %s failed", intent.id)
+                queue.complete(intent, error="Checkout could not be completed, please try again")
+        
+        return len(intents)
+    
+    @staticmethod
+    def process_pending(shard_index=0, shard_count=1, limit=None):
+        """Process every bus shard owned by this worker. Returns count processed."""
+        processed = 0
+        for bus_id in get_checkout_queue().pending_shards():
+            if shard_for(bus_id, shard_count) == shard_index:
+                processed += CheckoutService.process_bus(bus_id, limit)
+        return processed
+
+
+class WaitlistService:
+    """Service for the per-bus waitlist and released seat matching"""
+    
+    @staticmethod
+    def join(user, bus_id, seat_count, preferences=None):
+        """Add a user to the waitlist of a bus"""
+        try:
+            bus = Bus.objects.get(id=bus_id, is_active=True)
+        except Bus.DoesNotExist:
+            raise ValueError("Bus not found or not available")
+        
+        if bus.departure_time < timezone.now():
+            raise ValueError("Cannot join the waitlist after departure")
+        
+        if WaitlistEntry.objects.filter(user=user, bus=bus, status=WaitlistStatus.WAITING).exists():
+            raise ValueError("Already on the waitlist for this bus")
+        
+        entry = WaitlistEntry.objects.create(
+            user=user,
+            bus=bus,
+            seat_count=seat_count,
+            preferences=preferences or {}
+        )
+        
+        # Seats may already be free (e.g. released before anyone queued)
+        WaitlistService.match_released_seats([bus.id])
+        entry.refresh_from_db()
+        return entry
+    
+    @staticmethod
+    def leave(entry_id, user):
+        """Remove a waiting entry from the waitlist"""
+        updated = WaitlistEntry.objects.filter(
+            id=entry_id,
+            user=user,
+            status=WaitlistStatus.WAITING
+        ).update(status=WaitlistStatus.CANCELLED, updated_at=timezone.now())
+        
+        if not updated:
+            raise ValueError("Waitlist entry not found")
+    
+    @staticmethod
+    def match_released_seats(bus_ids):
+        """
+        Hand free seats to waiting users in one batched pass per bus.
+        Returns the list of bookings (holds) created.
+        """
+        bus_ids = set(WaitlistEntry.objects.filter(
+            bus_id__in=list(bus_ids),
+            status=WaitlistStatus.WAITING
+        ).values_list('bus_id', flat=True).distinct())
+        
+        holds = []
+        for bus in Bus.objects.filter(id__in=bus_ids, is_active=True, departure_time__gt=timezone.now()):
+            holds.extend(WaitlistService._match_bus(bus))
+        
+        return holds
+    
+    @staticmethod
+    def _match_bus(bus):
+        now = timezone.now()
+        lock_timeout_minutes = getattr(settings, 'SEAT_LOCK_TIMEOUT', 10)
+        lock_expires = now + timezone.timedelta(minutes=lock_timeout_minutes)
+        
+        with transaction.atomic():
+            # Lock the free seats so concurrent passes cannot hand them out twice
+            pool = list(
+                Seat.objects.select_for_update(skip_locked=True)
+                .filter(bus=bus, is_booked=False, segment_mask=0)
+                .filter(Q(locked_until__isnull=True) | Q(locked_until__lte=now))
+                .order_by('row', 'column')
+            )
+            if not pool:
+                return []
+            
+            # Holds of this pass are all priced at the occupancy before it
+            fare_table = FareEngine.price_table(bus)
+            occupancy = FareEngine.occupancy([bus]).get(bus.id, 0)
+            
+            waiters = (
+                WaitlistEntry.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('user')
+                .filter(bus=bus, status=WaitlistStatus.WAITING)
+                .order_by('created_at')
+            )
+            
+            holds = []
+            booking_seats = []
+            matched = []
+            for entry in waiters:
+                if len(pool) < entry.seat_count:
+                    continue
+                picked = WaitlistService._pick_seats(bus, pool, entry.seat_count, entry.preferences)
+                picked_ids = {seat.id for seat in picked}
+                quote = FareEngine.quote(bus, picked, occupancy=occupancy, table=fare_table)
+                pool = [seat for seat in pool if seat.id not in picked_ids]
+                
+                Seat.objects.filter(id__in=picked_ids).update(
+                    locked_until=lock_expires,
+                    locked_by=entry.user
+                )
+                
+                booking = Booking(
+                    user=entry.user,
+                    bus=bus,
+                    passenger_name=entry.user.name,
+                    passenger_phone=entry.user.phone or '',
+                    passenger_email=entry.user.email,
+                    seat_count=entry.seat_count,
+                    price_per_seat=quote['price_per_seat'],
+                    total_amount=quote['total_amount'],
+                    fare_breakdown=quote['breakdown'],
+                    status=BookingStatus.PENDING,
+                    lock_expires_at=lock_expires
+                )
+                holds.append(booking)
+                booking_seats.extend(BookingSeat(booking=booking, seat=seat) for seat in picked)
+                
+                entry.status = WaitlistStatus.OFFERED
+                entry.booking = booking
+                entry.updated_at = now
+                matched.append(entry)
+                
+                if not pool:
+                    break
+            
+            if holds:
+                Booking.objects.bulk_create(holds)
+                BookingSeat.objects.bulk_create(booking_seats)
+                WaitlistEntry.objects.bulk_update(matched, ['status', 'booking', 'updated_at'])
+                TripCache.invalidate(*[hold.user_id for hold in holds])
+                WaitlistService._notify(holds)
+            
+            return holds
+    
+    @staticmethod
+    def _pick_seats(bus, pool, count, preferences):
+        """Pick seats from the free pool honouring window/together preferences"""
+        last_column = bus.seats_per_row - 1
+        
+        def is_window(seat):
+            return seat.column in (0, last_column)
+        
+        if preferences.get('window'):
+            ordered = sorted(pool, key=lambda seat: (not is_window(seat), seat.row, seat.column))
+        else:
+            ordered = pool
+        
+        if preferences.get('together', True):
+            by_row = {}
+            for seat in ordered:
+                by_row.setdefault(seat.row, []).append(seat)
+            for row_seats in by_row.values():
+                if len(row_seats) < count:
+                    continue
+                row_seats = sorted(row_seats, key=lambda seat: seat.column)
+                blocks = [
+                    block for block in (row_seats[i:i + count] for i in range(len(row_seats) - count + 1))
+                    if block[-1].column - block[0].column == count - 1
+                ]
+                if not blocks:
+                    continue
+                if preferences.get('window'):
+                    blocks.sort(key=lambda block: not any(is_window(seat) for seat in block))
+                return blocks[0]
+        
+        return ordered[:count]
+    
+    @staticmethod
+    def _notify(holds):
+        from notifications.services import NotificationService
+        
+        notification_service = NotificationService()
+        for booking in Booking.objects.filter(
+            id__in=[hold.id for hold in holds]
+        ).select_related('user', 'bus').prefetch_related('seats'):
+            notification_service.send_waitlist_offer(booking)
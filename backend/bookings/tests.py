@@ -0,0 +1,198 @@
+"""
+Booking read endpoint query budgets and group seat auto-pick
+"""
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from buses.fares import FareEngine
+from buses.models import Bus, Seat
+from users.models import User
+from .autopick import SeatAutoPickService, rank_blocks
+from .models import Booking, BookingSeat, BookingStatus
+
+
+class BookingQueryCountTests(APITestCase):
+    """History, upcoming and detail must not issue a query per booking or seat"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='passenger@example.com', password='secret', name='Passenger')
+        now = timezone.now()
+        cls.bookings = []
+        for index in range(20):
+            bus = Bus.objects.create(
+                name=f'Bus {index}',
+                bus_number=f'KA01{index:04d}',
+                source='Bangalore',
+                destination='Chennai',
+                departure_time=now + timezone.timedelta(days=1, hours=index),
+                arrival_time=now + timezone.timedelta(days=1, hours=index + 6),
+                price=500
+            )
+            bus.create_seats()
+            seats = list(bus.seats.all()[:3])
+            booking = Booking.objects.create(
+                user=cls.user,
+                bus=bus,
+                passenger_name='Passenger',
+                passenger_phone='9999999999',
+                passenger_email='passenger@example.com',
+                seat_count=len(seats),
+                price_per_seat=500,
+                total_amount=500 * len(seats),
+                status=BookingStatus.CONFIRMED
+            )
+            BookingSeat.objects.bulk_create([BookingSeat(booking=booking, seat=seat) for seat in seats])
+            cls.bookings.append(booking)
+    
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+    
+    def test_history_page(self):
+        # Count, one page of bookings with their buses, then one prefetch for its seats
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('booking_history'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(response.data['results'][0]['seat_numbers']), 3)
+        
+        # Repeat reads come from the cached page; a filtered listing is cached on its own
+        with self.assertNumQueries(0):
+            self.client.get(reverse('booking_history'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('booking_history'), {'status': BookingStatus.CANCELLED})
+        self.assertEqual(response.data['count'], 0)
+    
+    def test_upcoming_trips(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('upcoming_trips'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+        
+        with self.assertNumQueries(0):
+            self.client.get(reverse('upcoming_trips'))
+    
+    def test_booking_detail(self):
+        booking = self.bookings[0]
+        # Booking with bus, seats prefetch, and one seat count for the bus's
+        # current fare and its available seats
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('booking_detail', args=[booking.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['seats']), 3)
+        self.assertEqual(len(response.data['seat_numbers']), 3)
+        self.assertEqual(response.data['bus']['available_seats'], booking.bus.available_seats_count)
+        self.assertEqual(response.data['bus']['current_fare'], str(FareEngine.current_fares([booking.bus])[booking.bus_id]))
+
+
+def seat_grid(rows=10, seats_per_row=4, taken=()):
+    """Free seats as rank_blocks takes them, labelled like Bus.create_seats"""
+    return [
+        (row, column, f"{row}{'ABCD'[column]}")
+        for row in range(1, rows + 1)
+        for column in range(seats_per_row)
+        if f"{row}{'ABCD'[column]}" not in taken
+    ]
+
+
+class RankBlocksTests(SimpleTestCase):
+    """Ordering and shape of the candidate blocks"""
+    
+    def test_one_row_before_two(self):
+        blocks = rank_blocks(seat_grid(), 4, 10, 4)
+        self.assertEqual(blocks[0], ['1A', '1B', '1C', '1D'])
+        self.assertEqual(blocks[1], ['2A', '2B', '2C', '2D'])
+    
+    def test_tightest_rectangle_over_rows(self):
+        blocks = rank_blocks(seat_grid(), 6, 10, 4)
+        self.assertEqual(blocks[0], ['1A', '1B', '1C', '2A', '2B', '2C'])
+    
+    def test_taken_seat_only_allowed_in_last_row_slack(self):
+        # 1B taken: no block may span row 1 in columns A-C
+        blocks = rank_blocks(seat_grid(taken={'1B'}), 6, 10, 4)
+        self.assertTrue(all('1A' not in block and '1C' not in block for block in blocks[:2]))
+        self.assertEqual(blocks[0], ['2A', '2B', '2C', '3A', '3B', '3C'])
+        
+        # 2B taken sits in the slack of a 5-seat block over rows 1-2
+        blocks = rank_blocks(seat_grid(taken={'2B'}), 5, 10, 4)
+        self.assertEqual(blocks[0], ['1B', '1C', '1D', '2C', '2D'])
+    
+    def test_last_row_seats_are_side_by_side(self):
+        # Row 2 has A and C free around a taken B: a party of 5 must not be split there
+        blocks = rank_blocks(seat_grid(taken={'2B', '2D'}), 5, 10, 4)
+        for block in blocks:
+            self.assertFalse({'2A', '2C'} <= set(block))
+        self.assertEqual(blocks[0], ['3A', '3B', '3C', '4A', '4B'])
+    
+    def test_prefer_window(self):
+        blocks = rank_blocks(seat_grid(taken={'1A', '1D'}), 2, 10, 4, prefer_window=True)
+        self.assertEqual(blocks[0], ['2A', '2B'])
+    
+    def test_no_block(self):
+        self.assertEqual(rank_blocks([(1, 0, '1A'), (3, 0, '3A')], 2, 10, 4), [])
+
+
+@override_settings(AUTO_PICK_MAX_ATTEMPTS=3)
+class SeatAutoPickTests(TestCase):
+    """Conditional hold and retry when another user takes the chosen block first"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='group@example.com', password='secret', name='Group')
+        cls.other = User.objects.create_user(email='other@example.com', password='secret', name='Other')
+        now = timezone.now()
+        cls.bus = Bus.objects.create(
+            name='Bus',
+            bus_number='KA010001',
+            source='Bangalore',
+            destination='Chennai',
+            departure_time=now + timezone.timedelta(days=1),
+            arrival_time=now + timezone.timedelta(days=1, hours=6),
+            price=500
+        )
+        cls.bus.create_seats()
+    
+    def hold(self, seat_count=4):
+        return SeatAutoPickService.hold_best_block(
+            self.user, self.bus.id, seat_count, 'Group', '9999999999', 'group@example.com'
+        )
+    
+    def take_row(self, row):
+        Seat.objects.filter(bus=self.bus, row=row).update(
+            locked_until=timezone.now() + timezone.timedelta(minutes=5),
+            locked_by=self.other
+        )
+    
+    def test_holds_best_block(self):
+        booking, attempts = self.hold()
+        self.assertEqual(attempts, 1)
+        self.assertEqual(booking.status, BookingStatus.PENDING)
+        self.assertEqual(booking.seat_numbers, ['1A', '1B', '1C', '1D'])
+        self.assertEqual(Seat.objects.filter(bus=self.bus, locked_by=self.user).count(), 4)
+    
+    def test_collision_rolls_back_and_retries_next_block(self):
+        # The first read still shows row 1 free, but another user holds it by the time we lock
+        stale = SeatAutoPickService._load_seats(self.bus)
+        self.take_row(1)
+        load = mock.Mock(side_effect=[stale, SeatAutoPickService._load_seats(self.bus)])
+        with mock.patch.object(SeatAutoPickService, '_load_seats', load):
+            booking, attempts = self.hold()
+        
+        self.assertEqual(attempts, 2)
+        self.assertEqual(booking.seat_numbers, ['2A', '2B', '2C', '2D'])
+        row_one = Seat.objects.filter(bus=self.bus, row=1)
+        self.assertEqual(set(row_one.values_list('locked_by', flat=True)), {self.other.id})
+        self.assertEqual(Booking.objects.count(), 1)
+    
+    def test_gives_up_after_max_attempts(self):
+        stale = SeatAutoPickService._load_seats(self.bus)
+        self.take_row(1)
+        with mock.patch.object(SeatAutoPickService, '_load_seats', return_value=stale):
+            with self.assertRaisesMessage(ValueError, 'selling fast'):
+                self.hold()
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(Seat.objects.filter(bus=self.bus, locked_by=self.user).exists())
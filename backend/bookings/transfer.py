@@ -0,0 +1,262 @@
+"""
+Seat transfer between buses for vehicle swaps.
+
+When a vehicle is replaced, every confirmed booking of the trip moves to
+the replacement bus. plan_seat_transfer maps each booking's seats onto
+free seats of the new layout, either keeping seat labels where the new
+bus has them or packing each party into the tightest block available.
+SeatTransferService applies the plan with set-based updates in one
+transaction and reissues the affected tickets in the background.
+"""
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, Q, TextField, Value, When
+from django.utils import timezone
+from buses.models import Bus, BusStop, Seat
+from .cache import TripCache
+from .models import Booking, BookingSeat, BookingStatus, WaitlistEntry, WaitlistStatus
+
+STRATEGIES = ('label', 'best_fit')
+
+
+def _best_block(free, size):
+    """
+    Tightest block of `size` free seats: a contiguous run within one row if
+    there is one, otherwise the row-major window with the smallest row span.
+    `free` is a row-major list of (row, column, seat_id).
+    """
+    by_row = {}
+    for seat in free:
+        by_row.setdefault(seat[0], []).append(seat)
+    for row_seats in by_row.values():
+        for i in range(len(row_seats) - size + 1):
+            window = row_seats[i:i + size]
+            if window[-1][1] - window[0][1] == size - 1:
+                return window
+    
+    best = None
+    for i in range(len(free) - size + 1):
+        window = free[i:i + size]
+        span = window[-1][0] - window[0][0]
+        if best is None or span < best[0]:
+            best = (span, window)
+    return best[1] if best else None
+
+
+def plan_seat_transfer(bookings: dict, free_seats: list, strategy: str = 'label') -> dict:
+    """
+    Assign new seats to every booking.
+    
+    bookings maps booking ID to its current seats as (seat_number, row,
+    column); free_seats lists the replacement bus's free seats as
+    (seat_id, seat_number, row, column). With the 'label' strategy a
+    booking keeps its seat labels when all of them are free on the new
+    bus; everything else is placed with the 'best_fit' strategy, largest
+    parties first, so groups stay together. Returns booking ID -> new
+    seat IDs, or raises ValueError when the new bus is too small.
+    """
+    needed = sum(len(seats) for seats in bookings.values())
+    if needed > len(free_seats):
+        raise ValueError(
+            f"Replacement bus has {len(free_seats)} free seats for {needed} booked seats"
+        )
+    
+    by_label = {seat_number: seat_id for seat_id, seat_number, _, _ in free_seats}
+    taken = set()
+    plan = {}
+    
+    if strategy == 'label':
+        for booking_id, seats in bookings.items():
+            seat_ids = [by_label.get(seat_number) for seat_number, _, _ in seats]
+            if all(seat_ids) and not taken.intersection(seat_ids):
+                plan[booking_id] = seat_ids
+                taken.update(seat_ids)
+    
+    remaining = sorted(
+        (booking_id for booking_id in bookings if booking_id not in plan),
+        key=lambda booking_id: (-len(bookings[booking_id]), str(booking_id))
+    )
+    free = sorted(
+        (row, column, seat_id) for seat_id, _, row, column in free_seats if seat_id not in taken
+    )
+    for booking_id in remaining:
+        block = _best_block(free, len(bookings[booking_id]))
+        plan[booking_id] = [seat_id for _, _, seat_id in block]
+        block_ids = set(plan[booking_id])
+        free = [seat for seat in free if seat[2] not in block_ids]
+    
+    return plan
+
+
+class SeatTransferService:
+    """Service for moving a trip's bookings to a replacement bus"""
+    
+    @staticmethod
+    def transfer_trip(source: Bus, target: Bus, strategy: str = 'label') -> dict:
+        """
+        Move every confirmed booking of `source` onto free seats of `target`
+        in one transaction: BookingSeat rows are re-pointed, new seats are
+        occupied, ticket tokens are re-signed for the new bus and seats, and
+        passengers are notified of their new seats. Pending holds on the old
+        bus are cancelled, waiting list entries follow the trip, and the old
+        bus is deactivated. QR images are re-rendered after commit.
+        """
+        from notifications.models import TripReminder
+        from notifications.reminders import ReminderService
+        from notifications.services import NotificationService
+        from tickets.models import Ticket
+        from tickets.rendering import schedule_ticket_render
+        from tickets.tokens import encode_token, seat_index
+        
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy. Use one of: {', '.join(STRATEGIES)}")
+        if source.id == target.id:
+            raise ValueError("Replacement bus must be a different bus")
+        
+        started = time.perf_counter()
+        now = timezone.now()
+        with transaction.atomic():
+            locked = {
+                bus.id: bus for bus in Bus.objects.select_for_update().filter(id__in=[source.id, target.id]).order_by('id')
+            }
+            source, target = locked[source.id], locked[target.id]
+            if not source.is_active:
+                raise ValueError("Trip is no longer active")
+            if not target.is_active or target.arrival_time < now:
+                raise ValueError("Replacement bus is not available")
+            
+            bookings = list(
+                Booking.objects.filter(bus=source, status=BookingStatus.CONFIRMED)
+                .select_related('user')
+                .prefetch_related('seats')
+                .order_by('created_at')
+            )
+            if any(booking.segment_mask is not None for booking in bookings):
+                stops = [
+                    list(BusStop.objects.filter(bus_id=bus.id).order_by('sequence').values_list('name', flat=True))
+                    for bus in (source, target)
+                ]
+                if stops[0] != stops[1]:
+                    raise ValueError("Replacement bus must serve the same stops as the trip")
+            
+            free_seats = list(
+                Seat.objects.select_for_update().filter(bus=target, is_booked=False, segment_mask=0)
+                .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+                .values_list('id', 'seat_number', 'row', 'column')
+            )
+            old_seats = {
+                booking.id: sorted(booking.seats.all(), key=lambda seat: (seat.row, seat.column))
+                for booking in bookings
+            }
+            plan = plan_seat_transfer(
+                {
+                    booking_id: [(seat.seat_number, seat.row, seat.column) for seat in seats]
+                    for booking_id, seats in old_seats.items()
+                },
+                free_seats,
+                strategy
+            )
+            
+            # Re-point each BookingSeat row at its new seat
+            new_seat_for = {
+                (booking_id, seat.id): new_seat_id
+                for booking_id, seats in old_seats.items()
+                for seat, new_seat_id in zip(seats, plan[booking_id])
+            }
+            booking_seats = list(
+                BookingSeat.objects.filter(booking_id__in=list(plan)).values_list('id', 'booking_id', 'seat_id')
+            )
+            if booking_seats:
+                BookingSeat.objects.filter(id__in=[row[0] for row in booking_seats]).update(seat_id=Case(
+                    *[
+                        When(id=row_id, then=Value(new_seat_for[(booking_id, seat_id)]))
+                        for row_id, booking_id, seat_id in booking_seats
+                    ],
+                    output_field=BigIntegerField()
+                ))
+            
+            moved_ids = [booking.id for booking in bookings]
+            Booking.objects.filter(id__in=moved_ids).update(bus=target, updated_at=now)
+            
+            # Occupy the new seats: whole seats for full-route bookings, segments otherwise
+            by_mask = {}
+            for booking in bookings:
+                by_mask.setdefault(booking.segment_mask, []).extend(plan[booking.id])
+            for mask, seat_ids in by_mask.items():
+                seats = Seat.objects.filter(id__in=seat_ids)
+                if mask is None:
+                    seats.update(is_booked=True, locked_until=None, locked_by=None)
+                else:
+                    seats.update(segment_mask=F('segment_mask').bitor(mask), locked_until=None, locked_by=None)
+            
+            # Pending holds on the old vehicle are dropped; the trip itself is retired
+            held_by = list(
+                Booking.objects.filter(bus=source, status=BookingStatus.PENDING).values_list('user_id', flat=True)
+            )
+            Booking.objects.filter(bus=source, status=BookingStatus.PENDING).update(
+                status=BookingStatus.CANCELLED,
+                updated_at=now
+            )
+            Seat.objects.filter(bus=source).update(is_booked=False, segment_mask=0, locked_until=None, locked_by=None)
+            Bus.objects.filter(id=source.id).update(is_active=False, updated_at=now)
+            waitlist_moved = WaitlistEntry.objects.filter(bus=source, status=WaitlistStatus.WAITING).update(
+                bus=target,
+                updated_at=now
+            )
+            
+            # Re-sign tickets for the new bus and seats; validation state is kept
+            seat_positions = {
+                seat_id: (row, column) for seat_id, _, row, column in free_seats
+            }
+            expires_at = target.arrival_time + timezone.timedelta(
+                hours=getattr(settings, 'TICKET_TOKEN_GRACE_HOURS', 6)
+            )
+            tokens = {
+                booking_id: encode_token(
+                    booking_id=booking_id,
+                    bus_id=target.id,
+                    seat_indices=[
+                        seat_index(*seat_positions[seat_id], target.seats_per_row) for seat_id in seat_ids
+                    ],
+                    seats_per_row=target.seats_per_row,
+                    expires_at=expires_at
+                )
+                for booking_id, seat_ids in plan.items()
+            }
+            tickets_reissued = 0
+            if tokens:
+                tickets_reissued = Ticket.objects.filter(booking_id__in=moved_ids).update(
+                    qr_data=Case(
+                        *[When(booking_id=booking_id, then=Value(token)) for booking_id, token in tokens.items()],
+                        output_field=TextField()
+                    ),
+                    qr_image=None
+                )
+            if target.departure_time != source.departure_time:
+                TripReminder.objects.filter(booking_id__in=moved_ids).delete()
+                ReminderService.queue_moved_trips([target.id], now)
+            
+            seat_numbers = {seat_id: seat_number for seat_id, seat_number, _, _ in free_seats}
+            notified = NotificationService().queue_seat_transfers(target, [
+                (booking, [seat_numbers[seat_id] for seat_id in plan[booking.id]]) for booking in bookings
+            ])
+            TripCache.invalidate(*[booking.user_id for booking in bookings], *held_by)
+            transaction.on_commit(lambda: [schedule_ticket_render(booking_id) for booking_id in moved_ids])
+        
+        kept = sum(
+            1 for booking_id, seats in old_seats.items()
+            if [seat.seat_number for seat in seats] == [seat_numbers[seat_id] for seat_id in plan[booking_id]]
+        )
+        return {
+            'source_bus_id': str(source.id),
+            'target_bus_id': str(target.id),
+            'bookings_moved': len(bookings),
+            'seats_moved': len(booking_seats),
+            'same_seat_label': kept,
+            'holds_cancelled': len(held_by),
+            'waitlist_moved': waitlist_moved,
+            'tickets_reissued': tickets_reissued,
+            'passengers_notified': len(notified),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
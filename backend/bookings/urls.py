@@ -4,17 +4,27 @@ URL patterns for bookings
 from django.urls import path
 from .views import (
     BookingCreateView,
+    SeatAutoPickView,
+    AsyncCheckoutView,
+    CheckoutStatusView,
     BookingConfirmView,
     BookingCancelView,
     BookingDetailView,
     BookingHistoryView,
-    UpcomingTripsView
+    UpcomingTripsView,
+    WaitlistView,
+    WaitlistLeaveView
 )
 
 urlpatterns = [
     path('create/', BookingCreateView.as_view(), name='booking_create'),
+    path('auto-pick/', SeatAutoPickView.as_view(), name='seat_auto_pick'),
+    path('checkout/', AsyncCheckoutView.as_view(), name='async_checkout'),
+    path('checkout/<uuid:checkout_id>/', CheckoutStatusView.as_view(), name='checkout_status'),
     path('history/', BookingHistoryView.as_view(), name='booking_history'),
     path('upcoming/', UpcomingTripsView.as_view(), name='upcoming_trips'),
+    path('waitlist/', WaitlistView.as_view(), name='waitlist'),
+    path('waitlist/<uuid:entry_id>/leave/', WaitlistLeaveView.as_view(), name='waitlist_leave'),
     path('<uuid:booking_id>/', BookingDetailView.as_view(), name='booking_detail'),
     path('<uuid:booking_id>/confirm/', BookingConfirmView.as_view(), name='booking_confirm'),
     path('<uuid:booking_id>/cancel/', BookingCancelView.as_view(), name='booking_cancel'),
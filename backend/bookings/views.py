@@ -5,14 +5,21 @@ from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Booking, BookingStatus
+from buses.fares import FareEngine
+from .autopick import SeatAutoPickService
+from .cache import TripCache
+from .models import Booking, BookingStatus, CheckoutIntent, WaitlistEntry
 from .serializers import (
+    AutoPickSerializer,
     BookingCreateSerializer,
     BookingSerializer,
     BookingListSerializer,
-    BookingConfirmSerializer
+    BookingConfirmSerializer,
+    CheckoutIntentSerializer,
+    WaitlistJoinSerializer,
+    WaitlistEntrySerializer
 )
-from .services import BookingService
+from .services import BookingService, CheckoutService, WaitlistService
 
 
 class BookingCreateView(APIView):
@@ -31,7 +38,9 @@ class BookingCreateView(APIView):
                 seat_ids=serializer.validated_data['seat_ids'],
                 passenger_name=serializer.validated_data['passenger_name'],
                 passenger_phone=serializer.validated_data['passenger_phone'],
-                passenger_email=serializer.validated_data['passenger_email']
+                passenger_email=serializer.validated_data['passenger_email'],
+                boarding_stop=serializer.validated_data.get('boarding_stop'),
+                alighting_stop=serializer.validated_data.get('alighting_stop')
             )
             
             return Response({
@@ -46,6 +55,86 @@ class BookingCreateView(APIView):
             )
 
 
+class SeatAutoPickView(APIView):
+    """Pick the best block of seats for a group and hold it"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = AutoPickSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            booking, attempts = SeatAutoPickService.hold_best_block(
+                user=request.user,
+                bus_id=serializer.validated_data['bus_id'],
+                seat_count=serializer.validated_data['seat_count'],
+                passenger_name=serializer.validated_data['passenger_name'],
+                passenger_phone=serializer.validated_data['passenger_phone'],
+                passenger_email=serializer.validated_data['passenger_email'],
+                prefer_window=serializer.validated_data['prefer_window']
+            )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'message': 'Seats held successfully',
+            'booking': BookingSerializer(booking).data,
+            'attempts': attempts
+        }, status=status.HTTP_201_CREATED)
+
+
+class AsyncCheckoutView(APIView):
+    """Queue a booking hold and return a checkout ID to poll"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = BookingCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            intent = CheckoutService.enqueue(
+                user=request.user,
+                bus_id=serializer.validated_data['bus_id'],
+                seat_ids=serializer.validated_data['seat_ids'],
+                passenger_name=serializer.validated_data['passenger_name'],
+                passenger_phone=serializer.validated_data['passenger_phone'],
+                passenger_email=serializer.validated_data['passenger_email'],
+                boarding_stop=serializer.validated_data.get('boarding_stop'),
+                alighting_stop=serializer.validated_data.get('alighting_stop')
+            )
+            
+            return Response({
+                'message': 'Checkout queued',
+                'checkout_id': str(intent.id),
+                'status': intent.status
+            }, status=status.HTTP_202_ACCEPTED)
+            
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+
+class CheckoutStatusView(generics.RetrieveAPIView):
+    """Poll the result of a queued checkout"""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = CheckoutIntentSerializer
+    lookup_field = 'id'
+    lookup_url_kwarg = 'checkout_id'
+    
+    def get_queryset(self):
+        return CheckoutIntent.objects.filter(user=self.request.user).select_related(
+            'booking__bus'
+        ).prefetch_related('booking__seats')
+
+
 class BookingConfirmView(APIView):
     """Confirm a booking after payment"""
     
@@ -107,6 +196,16 @@ class BookingDetailView(generics.RetrieveAPIView):
     
     def get_queryset(self):
         return Booking.objects.filter(user=self.request.user).select_related('bus').prefetch_related('seats')
+    
+    def retrieve(self, request, *args, **kwargs):
+        booking = self.get_object()
+        
+        # The bus's fare and free seats both come from one seat count
+        counts = FareEngine.seat_counts([booking.bus])
+        context = self.get_serializer_context()
+        context['fares'] = FareEngine.current_fares([booking.bus], occupancy=FareEngine.occupancy([booking.bus], counts))
+        context['available_seats'] = {bus_id: total - taken for bus_id, (total, taken) in counts.items()}
+        return Response(BookingSerializer(booking, context=context).data)
 
 
 class BookingHistoryView(generics.ListAPIView):
@@ -124,6 +223,23 @@ class BookingHistoryView(generics.ListAPIView):
             queryset = queryset.filter(status=status_filter)
         
         return queryset
+    
+    def list(self, request, *args, **kwargs):
+        # Serve from the per-user cache, one page at a time
+        status_filter = request.query_params.get('status')
+        if status_filter not in BookingStatus.values:
+            status_filter = None
+        page = request.query_params.get(self.paginator.page_query_param, '1')
+        if not page.isdigit():
+            return super().list(request, *args, **kwargs)
+        
+        data = TripCache.get_history_page(
+            request.user,
+            status_filter,
+            page,
+            lambda: super(BookingHistoryView, self).list(request, *args, **kwargs).data
+        )
+        return Response(data)
 
 
 class UpcomingTripsView(generics.ListAPIView):
@@ -139,3 +255,65 @@ class UpcomingTripsView(generics.ListAPIView):
             status=BookingStatus.CONFIRMED,
             bus__departure_time__gte=timezone.now()
         ).select_related('bus').prefetch_related('seats').order_by('bus__departure_time')
+    
+    def list(self, request, *args, **kwargs):
+        # Serve from the per-user cached projection
+        bookings = TripCache.get_upcoming(request.user)
+        
+        page = self.paginate_queryset(bookings)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(bookings)
+
+
+class WaitlistView(APIView):
+    """List the user's waitlist entries or join a bus waitlist"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        entries = WaitlistEntry.objects.filter(user=request.user).order_by('-created_at')
+        return Response({
+            'count': entries.count(),
+            'entries': WaitlistEntrySerializer(entries, many=True).data
+        })
+    
+    def post(self, request):
+        serializer = WaitlistJoinSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            entry = WaitlistService.join(
+                user=request.user,
+                bus_id=serializer.validated_data['bus_id'],
+                seat_count=serializer.validated_data['seat_count'],
+                preferences=serializer.validated_data.get('preferences')
+            )
+            
+            return Response({
+                'message': 'Added to waitlist',
+                'entry': WaitlistEntrySerializer(entry).data
+            }, status=status.HTTP_201_CREATED)
+            
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+
+class WaitlistLeaveView(APIView):
+    """Leave a bus waitlist"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, entry_id):
+        try:
+            WaitlistService.leave(entry_id=entry_id, user=request.user)
+            return Response({'message': 'Removed from waitlist'})
+            
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
@@ -2,14 +2,20 @@
 Admin configuration for Buses app
 """
 from django.contrib import admin
-from .models import Bus, Seat
+from .models import Bus, Seat, BusStop, FareRule
 
 
 class SeatInline(admin.TabularInline):
     model = Seat
     extra = 0
-    readonly_fields = ['seat_number', 'row', 'column']
-    fields = ['seat_number', 'row', 'column', 'is_booked', 'locked_until']
+    readonly_fields = ['seat_number', 'row', 'column', 'segment_mask']
+    fields = ['seat_number', 'row', 'column', 'is_booked', 'segment_mask', 'locked_until']
+
+
+class BusStopInline(admin.TabularInline):
+    model = BusStop
+    extra = 0
+    fields = ['sequence', 'name', 'arrival_time', 'departure_time']
 
 
 @admin.register(Bus)
@@ -19,7 +25,7 @@ class BusAdmin(admin.ModelAdmin):
     list_filter = ['bus_type', 'is_active', 'source', 'destination']
     search_fields = ['name', 'bus_number', 'source', 'destination']
     ordering = ['departure_time']
-    inlines = [SeatInline]
+    inlines = [BusStopInline, SeatInline]
     
     fieldsets = (
         (None, {'fields': ('operator', 'name', 'bus_number', 'bus_type')}),
@@ -43,3 +49,11 @@ class SeatAdmin(admin.ModelAdmin):
     list_display = ['bus', 'seat_number', 'is_booked', 'locked_until', 'locked_by']
     list_filter = ['is_booked', 'bus']
     search_fields = ['bus__name', 'seat_number']
+
+
+@admin.register(FareRule)
+class FareRuleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'operator', 'bus_type', 'source', 'destination',
+                    'min_occupancy', 'max_hours_before', 'min_hours_before', 'multiplier', 'is_active']
+    list_filter = ['is_active', 'bus_type']
+    search_fields = ['name', 'operator__email', 'source', 'destination']
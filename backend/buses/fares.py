@@ -0,0 +1,292 @@
+"""
+Dynamic fares.
+
+A trip's fare follows how full it is and how close departure is, with
+premiums for window seats and lower sleeper berths and any FareRule the
+operator has set up on top. Instead of evaluating all of that per request,
+FareEngine precomputes one small price table per trip - per-seat-class
+prices for every occupancy tier - and caches it until the next lead-time
+boundary. Search results and seat maps then only count occupied seats and
+look the price up. Editing the bus or any of the operator's rules moves
+the table to a new cache key.
+"""
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import BusType, FareRule, Seat
+
+SLEEPER_TYPES = (BusType.AC_SLEEPER, BusType.NON_AC_SLEEPER)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _rules_key(operator_id):
+    return f"fares:rules:{operator_id}"
+
+
+def _table_key(bus, rules_version):
+    return f"fares:{bus.id}:{bus.updated_at.timestamp()}:{rules_version}"
+
+
+def _money(amount: Decimal) -> Decimal:
+    step = Decimal(str(_setting('FARE_ROUNDING', 1)))
+    return (amount / step).quantize(Decimal('1'), rounding=ROUND_HALF_UP) * step
+
+
+def seat_class(bus, row: int, column: int) -> str:
+    """
+    'standard', 'window', 'lower' or 'lower_window'. Sleeper layouts list
+    the lower deck first, so the front half of their rows are lower berths.
+    """
+    window = column in (0, bus.seats_per_row - 1)
+    lower = bus.bus_type in SLEEPER_TYPES and row <= (bus.rows + 1) // 2
+    if lower:
+        return 'lower_window' if window else 'lower'
+    return 'window' if window else 'standard'
+
+
+def _rule_matches(rule, bus, hours_left: float) -> bool:
+    """Whether a rule applies to the trip, occupancy aside"""
+    if rule.bus_type and rule.bus_type != bus.bus_type:
+        return False
+    if rule.source and rule.source.lower() != bus.source.lower():
+        return False
+    if rule.destination and rule.destination.lower() != bus.destination.lower():
+        return False
+    if rule.max_hours_before is not None and hours_left > rule.max_hours_before:
+        return False
+    if rule.min_hours_before is not None and hours_left < rule.min_hours_before:
+        return False
+    return True
+
+
+def build_price_table(bus, rules, now) -> dict:
+    """
+    Price table of one trip as of `now`: a tier per occupancy breakpoint,
+    each with its multiplier and a price per seat class, plus the time the
+    table stops being valid (the next lead-time boundary).
+    """
+    hours_left = max(0.0, (bus.departure_time - now).total_seconds() / 3600)
+    lead_tiers = sorted(_setting('FARE_LEAD_TIME_TIERS', [(6, '1.20'), (24, '1.10')]))
+    occupancy_tiers = sorted(_setting('FARE_OCCUPANCY_TIERS', [(50, '1.10'), (75, '1.25'), (90, '1.40')]))
+    
+    lead_multiplier = next(
+        (Decimal(multiplier) for hours, multiplier in lead_tiers if hours_left <= hours),
+        Decimal('1')
+    )
+    rules = [rule for rule in rules if _rule_matches(rule, bus, hours_left)]
+    
+    # The table holds until departure crosses the next hour threshold below us
+    boundaries = {hours for hours, _ in lead_tiers}
+    for rule in rules:
+        boundaries.update(
+            hours for hours in (rule.max_hours_before, rule.min_hours_before) if hours is not None
+        )
+    next_boundary = max((hours for hours in boundaries if hours < hours_left), default=0)
+    valid_until = bus.departure_time - timezone.timedelta(hours=next_boundary)
+    
+    premiums = {
+        'standard': Decimal('0'),
+        'window': Decimal(str(_setting('FARE_WINDOW_PREMIUM', '0.05'))),
+    }
+    if bus.bus_type in SLEEPER_TYPES:
+        lower = Decimal(str(_setting('FARE_LOWER_BERTH_PREMIUM', '0.10')))
+        premiums['lower'] = lower
+        premiums['lower_window'] = lower + premiums['window']
+    
+    floor = Decimal(str(_setting('FARE_MIN_MULTIPLIER', '0.70')))
+    cap = Decimal(str(_setting('FARE_MAX_MULTIPLIER', '2.00')))
+    breakpoints = sorted(
+        {0} | {percent for percent, _ in occupancy_tiers}
+        | {rule.min_occupancy for rule in rules if rule.min_occupancy is not None}
+    )
+    tiers = []
+    for percent in breakpoints:
+        multiplier = lead_multiplier * next(
+            (Decimal(m) for threshold, m in reversed(occupancy_tiers) if percent >= threshold),
+            Decimal('1')
+        )
+        for rule in rules:
+            if (rule.min_occupancy or 0) <= percent:
+                multiplier *= rule.multiplier
+        multiplier = min(max(multiplier, floor), cap)
+        tiers.append({
+            'min_occupancy': percent,
+            'multiplier': multiplier.quantize(Decimal('0.01')),
+            'prices': {
+                name: _money(bus.price * multiplier * (1 + premium)).quantize(Decimal('0.01'))
+                for name, premium in premiums.items()
+            }
+        })
+    
+    return {
+        'base': Decimal(bus.price).quantize(Decimal('0.01')),
+        'computed_at': now,
+        'valid_until': valid_until,
+        'tiers': tiers
+    }
+
+
+def route_share(boarding_stop: int, alighting_stop: int, last_stop: int) -> Decimal:
+    """
+    Part of the full-route fare a partial trip pays: the share of the
+    route's stop-to-stop segments it rides. Stops carry no distances, so
+    every segment counts the same.
+    """
+    if not last_stop:
+        return Decimal('1')
+    return Decimal(alighting_stop - boarding_stop) / Decimal(last_stop)
+
+
+def prorate(price: Decimal, share: Decimal = None) -> Decimal:
+    """A full-route price scaled to a route share, rounded like table prices"""
+    if share is None or share >= 1:
+        return price
+    return _money(price * share).quantize(Decimal('0.01'))
+
+
+def lookup(table: dict, occupancy: int) -> dict:
+    """The tier that applies at the given occupancy percentage"""
+    tier = table['tiers'][0]
+    for candidate in table['tiers']:
+        if candidate['min_occupancy'] <= occupancy:
+            tier = candidate
+    return tier
+
+
+class FareEngine:
+    """Cached per-trip price tables and fare quotes"""
+    
+    @staticmethod
+    def price_tables(buses) -> dict:
+        """Price table per bus ID: one cache round trip, one rules query for misses"""
+        buses = list(buses)
+        if not buses:
+            return {}
+        
+        operator_ids = {bus.operator_id for bus in buses}
+        versions = cache.get_many([_rules_key(operator_id) for operator_id in operator_ids])
+        keys = {
+            bus.id: _table_key(bus, versions.get(_rules_key(bus.operator_id), 0)) for bus in buses
+        }
+        cached = cache.get_many(list(keys.values()))
+        
+        now = timezone.now()
+        tables = {}
+        missing = []
+        for bus in buses:
+            table = cached.get(keys[bus.id])
+            if table is not None and table['valid_until'] > now:
+                tables[bus.id] = table
+            else:
+                missing.append(bus)
+        
+        if missing:
+            rules_by_operator = {}
+            for rule in FareRule.objects.filter(
+                operator_id__in={bus.operator_id for bus in missing},
+                is_active=True
+            ):
+                rules_by_operator.setdefault(rule.operator_id, []).append(rule)
+            
+            max_age = _setting('FARE_TABLE_CACHE_SECONDS', 900)
+            for bus in missing:
+                table = build_price_table(bus, rules_by_operator.get(bus.operator_id, []), now)
+                seconds_left = int((table['valid_until'] - now).total_seconds())
+                if seconds_left <= 0:
+                    # Departed trips keep their final table
+                    table['valid_until'] = now + timezone.timedelta(seconds=max_age)
+                    seconds_left = max_age
+                cache.set(keys[bus.id], table, max(1, min(max_age, seconds_left)))
+                tables[bus.id] = table
+        
+        return tables
+    
+    @staticmethod
+    def price_table(bus) -> dict:
+        return FareEngine.price_tables([bus])[bus.id]
+    
+    @staticmethod
+    def seat_counts(buses) -> dict:
+        """(total, taken) seats per bus ID, booked or held seats being taken, in one query"""
+        now = timezone.now()
+        counts = Seat.objects.filter(bus_id__in=[bus.id for bus in buses]).values('bus_id').annotate(
+            total=Count('id'),
+            taken=Count('id', filter=Q(is_booked=True) | ~Q(segment_mask=0) | Q(locked_until__gt=now))
+        ).order_by()
+        return {row['bus_id']: (row['total'], row['taken']) for row in counts}
+    
+    @staticmethod
+    def occupancy(buses, counts: dict = None) -> dict:
+        """Percentage of each bus's seats that are booked or held, from seat_counts()"""
+        if counts is None:
+            counts = FareEngine.seat_counts(buses)
+        return {
+            bus_id: taken * 100 // total if total else 0
+            for bus_id, (total, taken) in counts.items()
+        }
+    
+    @staticmethod
+    def current_fares(buses, occupancy: dict = None) -> dict:
+        """Standard-seat fare per bus ID right now, as shown in search results"""
+        buses = list(buses)
+        tables = FareEngine.price_tables(buses)
+        if occupancy is None:
+            occupancy = FareEngine.occupancy(buses)
+        return {
+            bus.id: lookup(tables[bus.id], occupancy.get(bus.id, 0))['prices']['standard']
+            for bus in buses
+        }
+    
+    @staticmethod
+    def seat_prices(bus, seats) -> dict:
+        """Fare per seat ID for a seat map, using the already loaded seats for occupancy"""
+        seats = list(seats)
+        taken = sum(1 for seat in seats if not seat.is_available)
+        tier = lookup(FareEngine.price_table(bus), taken * 100 // len(seats) if seats else 0)
+        return {
+            seat.id: tier['prices'][seat_class(bus, seat.row, seat.column)] for seat in seats
+        }
+    
+    @staticmethod
+    def quote(bus, seats, occupancy: int = None, table: dict = None, share: Decimal = None) -> dict:
+        """
+        Fare for the given seats at the current occupancy. Returns the total,
+        the average price per seat and a JSON-ready breakdown to store on the
+        booking so the quoted fare is locked in. Pass the route_share() of a
+        partial trip to price it pro rata.
+        """
+        if occupancy is None:
+            occupancy = FareEngine.occupancy([bus]).get(bus.id, 0)
+        table = table or FareEngine.price_table(bus)
+        tier = lookup(table, occupancy)
+        
+        prices = {
+            seat.seat_number: prorate(tier['prices'][seat_class(bus, seat.row, seat.column)], share)
+            for seat in seats
+        }
+        total = sum(prices.values(), Decimal('0'))
+        breakdown = {
+            'base_price': str(table['base']),
+            'occupancy_percent': occupancy,
+            'multiplier': str(tier['multiplier']),
+            'seats': {seat_number: str(price) for seat_number, price in prices.items()},
+            'quoted_at': timezone.now().isoformat()
+        }
+        if share is not None:
+            breakdown['route_share'] = str(share.quantize(Decimal('0.0001')))
+        return {
+            'total_amount': total,
+            'price_per_seat': (total / len(prices)).quantize(Decimal('0.01')) if prices else Decimal('0'),
+            'breakdown': breakdown
+        }
+    
+    @staticmethod
+    def invalidate(operator_id):
+        """Retire the cached tables of an operator's trips after a rule change"""
+        cache.set(_rules_key(operator_id), time.time_ns(), None)
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buses', '0003_alter_bus_operator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seat',
+            name='segment_mask',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BusStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('sequence', models.PositiveSmallIntegerField()),
+                ('arrival_time', models.DateTimeField(blank=True, null=True)),
+                ('departure_time', models.DateTimeField(blank=True, null=True)),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='buses.bus')),
+            ],
+            options={
+                'db_table': 'bus_stops',
+                'ordering': ['bus', 'sequence'],
+                'indexes': [models.Index(fields=['name'], name='bus_stops_name_f5c39d_idx')],
+                'unique_together': {('bus', 'sequence')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buses', '0004_bus_stops_segment_mask'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bus',
+            name='departure_time',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
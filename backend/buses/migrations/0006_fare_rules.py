@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:02
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buses', '0005_bus_departure_time_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FareRule',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('bus_type', models.CharField(blank=True, choices=[('ac_sleeper', 'AC Sleeper'), ('ac_seater', 'AC Seater'), ('non_ac_sleeper', 'Non-AC Sleeper'), ('non_ac_seater', 'Non-AC Seater'), ('volvo', 'Volvo Multi-Axle')], max_length=20)),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('destination', models.CharField(blank=True, max_length=255)),
+                ('min_occupancy', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('max_hours_before', models.PositiveIntegerField(blank=True, null=True)),
+                ('min_hours_before', models.PositiveIntegerField(blank=True, null=True)),
+                ('multiplier', models.DecimalField(decimal_places=2, max_digits=4)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('operator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fare_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'fare_rules',
+                'ordering': ['operator', 'name'],
+            },
+        ),
+    ]
@@ -15,6 +15,30 @@ class BusType(models.TextChoices):
     VOLVO = 'volvo', 'Volvo Multi-Axle'
 
 
+def segment_mask(from_stop: int, to_stop: int) -> int:
+    """Bitmask of the segments between two stop sequences (bit i = stop i -> i+1)"""
+    return ((1 << to_stop) - 1) ^ ((1 << from_stop) - 1)
+
+
+def available_seat_counts(masks: dict) -> dict:
+    """
+    Free seats per bus for a segment mask per bus ({bus_id: mask}), counted
+    in one grouped query; the set-based form of Bus.available_seats_for
+    """
+    if not masks:
+        return {}
+    occupied = models.Case(
+        *[models.When(bus_id=bus_id, then=models.F('segment_mask').bitand(mask)) for bus_id, mask in masks.items()],
+        output_field=models.BigIntegerField()
+    )
+    counts = Seat.objects.filter(bus_id__in=list(masks), is_booked=False).exclude(
+        locked_until__gt=timezone.now()
+    ).annotate(occupied=occupied).filter(occupied=0).values('bus_id').annotate(
+        free=models.Count('id')
+    ).order_by()
+    return {row['bus_id']: row['free'] for row in counts}
+
+
 class Bus(models.Model):
     """Bus model representing a specific bus service"""
     
@@ -41,7 +65,7 @@ class Bus(models.Model):
     destination = models.CharField(max_length=255)
     
     # Schedule
-    departure_time = models.DateTimeField()
+    departure_time = models.DateTimeField(db_index=True)
     arrival_time = models.DateTimeField()
     
     # Pricing
@@ -83,10 +107,19 @@ class Bus(models.Model):
     @property
     def available_seats_count(self):
         """Count available seats"""
-        return self.seats.filter(is_booked=False).exclude(
+        return self.seats.filter(is_booked=False, segment_mask=0).exclude(
             locked_until__gt=timezone.now()
         ).count()
     
+    def available_seats_for(self, from_stop: int, to_stop: int):
+        """Seats free on every segment between two stop sequences"""
+        mask = segment_mask(from_stop, to_stop)
+        return self.seats.annotate(
+            occupied=models.F('segment_mask').bitand(mask)
+        ).filter(is_booked=False, occupied=0).exclude(
+            locked_until__gt=timezone.now()
+        )
+    
     def create_seats(self):
         """Create seats for the bus based on configuration"""
         seat_labels = ['A', 'B', 'C', 'D', 'E']
@@ -117,6 +150,9 @@ class Seat(models.Model):
     # Booking status
     is_booked = models.BooleanField(default=False)
     
+    # Occupied segments for multi-stop trips (bit i = stop i -> i+1)
+    segment_mask = models.BigIntegerField(default=0)
+    
     # Temporary lock for checkout
     locked_until = models.DateTimeField(null=True, blank=True)
     locked_by = models.ForeignKey(
@@ -138,7 +174,11 @@ class Seat(models.Model):
     @property
     def is_available(self):
         """Check if seat is available for booking"""
-        if self.is_booked:
+        return self.is_available_for(~0)
+    
+    def is_available_for(self, mask: int) -> bool:
+        """Check if seat is free on the segments in `mask`"""
+        if self.is_booked or self.segment_mask & mask:
             return False
         if self.locked_until and self.locked_until > timezone.now():
             return False
@@ -162,3 +202,77 @@ class Seat(models.Model):
         self.locked_until = None
         self.locked_by = None
         self.save(update_fields=['is_booked', 'locked_until', 'locked_by'])
+
+
+class BusStop(models.Model):
+    """Ordered stop on a bus route; sequence 0 is the origin"""
+    
+    bus = models.ForeignKey(
+        Bus,
+        on_delete=models.CASCADE,
+        related_name='stops'
+    )
+    name = models.CharField(max_length=255)
+    sequence = models.PositiveSmallIntegerField()
+    arrival_time = models.DateTimeField(null=True, blank=True)
+    departure_time = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'bus_stops'
+        ordering = ['bus', 'sequence']
+        unique_together = ['bus', 'sequence']
+        indexes = [
+            models.Index(fields=['name']),
+        ]
+    
+    def __str__(self):
+        return f"{self.bus.name} - Stop {self.sequence}: {self.name}"
+
+
+class FareRule(models.Model):
+    """
+    Operator pricing rule: a fare multiplier applied to the operator's trips
+    while all of its conditions hold. Empty conditions match everything.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    operator = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='fare_rules'
+    )
+    name = models.CharField(max_length=100)
+    
+    # Conditions
+    bus_type = models.CharField(max_length=20, choices=BusType.choices, blank=True)
+    source = models.CharField(max_length=255, blank=True)
+    destination = models.CharField(max_length=255, blank=True)
+    min_occupancy = models.PositiveSmallIntegerField(null=True, blank=True)  # percent of seats taken
+    max_hours_before = models.PositiveIntegerField(null=True, blank=True)  # e.g. last-minute surcharge
+    min_hours_before = models.PositiveIntegerField(null=True, blank=True)  # e.g. early-bird discount
+    
+    multiplier = models.DecimalField(max_digits=4, decimal_places=2)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'fare_rules'
+        ordering = ['operator', 'name']
+    
+    def __str__(self):
+        return f"{self.name} (x{self.multiplier})"
+    
+    def save(self, *args, **kwargs):
+        from .fares import FareEngine
+        
+        super().save(*args, **kwargs)
+        FareEngine.invalidate(self.operator_id)
+    
+    def delete(self, *args, **kwargs):
+        from .fares import FareEngine
+        
+        operator_id = self.operator_id
+        result = super().delete(*args, **kwargs)
+        FareEngine.invalidate(operator_id)
+        return result
@@ -3,26 +3,49 @@ Bus serializers for API responses
 """
 from rest_framework import serializers
 from django.utils import timezone
-from .models import Bus, Seat, BusType
+from .fares import FareEngine
+from .models import Bus, Seat, BusStop, BusType, FareRule
 from users.serializers import UserSerializer
 
 
 class SeatSerializer(serializers.ModelSerializer):
     """Serializer for individual seat"""
     
-    is_available = serializers.ReadOnlyField()
+    is_available = serializers.SerializerMethodField()
+    price = serializers.SerializerMethodField()
     
     class Meta:
         model = Seat
-        fields = ['id', 'seat_number', 'row', 'column', 'is_booked', 'is_available']
+        fields = ['id', 'seat_number', 'row', 'column', 'is_booked', 'is_available', 'price']
+    
+    def get_is_available(self, seat):
+        # Seat maps for a partial route pass the segment mask in context
+        mask = self.context.get('segment_mask')
+        if mask is not None:
+            return seat.is_available_for(mask)
+        return seat.is_available
+    
+    def get_price(self, seat):
+        # Seat maps pass the current fare per seat in context (see FareEngine.seat_prices)
+        price = self.context.get('seat_prices', {}).get(seat.id)
+        return str(price) if price is not None else None
+
+
+class BusStopSerializer(serializers.ModelSerializer):
+    """Serializer for a stop on a multi-stop route"""
+    
+    class Meta:
+        model = BusStop
+        fields = ['sequence', 'name', 'arrival_time', 'departure_time']
 
 
 class BusListSerializer(serializers.ModelSerializer):
     """Serializer for bus list in search results"""
     
     operator_name = serializers.CharField(source='operator.name', read_only=True)
-    available_seats = serializers.IntegerField(source='available_seats_count', read_only=True)
+    available_seats = serializers.SerializerMethodField()
     duration = serializers.ReadOnlyField()
+    current_fare = serializers.SerializerMethodField()
     
     class Meta:
         model = Bus
@@ -30,10 +53,25 @@ class BusListSerializer(serializers.ModelSerializer):
             'id', 'name', 'bus_number', 'bus_type',
             'source', 'destination',
             'departure_time', 'arrival_time', 'duration',
-            'price', 'total_seats', 'available_seats',
+            'price', 'current_fare', 'total_seats', 'available_seats',
             'has_wifi', 'has_charging', 'has_toilet', 'has_water',
             'operator_name'
         ]
+    
+    def get_available_seats(self, bus):
+        # Partial-route results pass per-bus segment availability in context
+        available = self.context.get('available_seats')
+        if available is not None:
+            return available.get(bus.id, 0)
+        return bus.available_seats_count
+    
+    def get_current_fare(self, bus):
+        # Lists pass fares for all their buses in context; single buses are priced here
+        fares = self.context.get('fares')
+        if fares is None:
+            fares = FareEngine.current_fares([bus])
+        price = fares.get(bus.id)
+        return str(price) if price is not None else None
 
 
 class BusDetailSerializer(serializers.ModelSerializer):
@@ -43,6 +81,7 @@ class BusDetailSerializer(serializers.ModelSerializer):
     available_seats = serializers.IntegerField(source='available_seats_count', read_only=True)
     duration = serializers.ReadOnlyField()
     seats = SeatSerializer(many=True, read_only=True)
+    stops = BusStopSerializer(many=True, read_only=True)
     
     class Meta:
         model = Bus
@@ -53,13 +92,15 @@ class BusDetailSerializer(serializers.ModelSerializer):
             'price', 'total_seats', 'available_seats',
             'rows', 'seats_per_row',
             'has_wifi', 'has_charging', 'has_toilet', 'has_water',
-            'operator_name', 'seats'
+            'operator_name', 'stops', 'seats'
         ]
 
 
 class BusCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating a new bus (operator only)"""
     
+    stops = BusStopSerializer(many=True, required=False)
+    
     class Meta:
         model = Bus
         fields = [
@@ -67,9 +108,18 @@ class BusCreateSerializer(serializers.ModelSerializer):
             'source', 'destination',
             'departure_time', 'arrival_time',
             'price', 'total_seats', 'rows', 'seats_per_row',
-            'has_wifi', 'has_charging', 'has_toilet', 'has_water'
+            'has_wifi', 'has_charging', 'has_toilet', 'has_water',
+            'stops'
         ]
     
+    def validate_stops(self, value):
+        sequences = [stop['sequence'] for stop in value]
+        if sorted(sequences) != list(range(len(sequences))):
+            raise serializers.ValidationError('Stop sequences must run 0..n-1 without gaps.')
+        if len(sequences) > 64:
+            raise serializers.ValidationError('A route can have at most 64 stops.')
+        return value
+    
     def validate(self, attrs):
         if attrs['departure_time'] >= attrs['arrival_time']:
             raise serializers.ValidationError({
@@ -84,9 +134,11 @@ class BusCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Set operator from request user
         validated_data['operator'] = self.context['request'].user
+        stops = validated_data.pop('stops', [])
         bus = super().create(validated_data)
         # Auto-create seats
         bus.create_seats()
+        BusStop.objects.bulk_create([BusStop(bus=bus, **stop) for stop in stops])
         return bus
 
 
@@ -99,3 +151,35 @@ class BusSearchSerializer(serializers.Serializer):
     bus_type = serializers.ChoiceField(choices=BusType.choices, required=False)
     min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
     max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+
+class FareRuleSerializer(serializers.ModelSerializer):
+    """Serializer for operator fare rules"""
+    
+    class Meta:
+        model = FareRule
+        fields = [
+            'id', 'name', 'bus_type', 'source', 'destination',
+            'min_occupancy', 'max_hours_before', 'min_hours_before',
+            'multiplier', 'is_active', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate_min_occupancy(self, value):
+        if value is not None and value > 100:
+            raise serializers.ValidationError('Occupancy is a percentage (0-100).')
+        return value
+    
+    def validate_multiplier(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Multiplier must be positive.')
+        return value
+    
+    def validate(self, attrs):
+        min_hours = attrs.get('min_hours_before', getattr(self.instance, 'min_hours_before', None))
+        max_hours = attrs.get('max_hours_before', getattr(self.instance, 'max_hours_before', None))
+        if min_hours is not None and max_hours is not None and min_hours > max_hours:
+            raise serializers.ValidationError({
+                'min_hours_before': 'Cannot be greater than max_hours_before.'
+            })
+        return attrs
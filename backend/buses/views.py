@@ -6,12 +6,16 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.utils import timezone
+from django.db.models import Max
+from django.db.models.functions import Coalesce
 from datetime import datetime, timedelta
-from .models import Bus, Seat
+from .fares import FareEngine, prorate, route_share
+from .models import Bus, Seat, BusStop, available_seat_counts, segment_mask
 from .serializers import (
     BusListSerializer,
     BusDetailSerializer,
     BusSearchSerializer,
+    BusStopSerializer,
     SeatSerializer
 )
 
@@ -48,19 +52,95 @@ class BusSearchView(APIView):
         # Apply optional filters
         if 'bus_type' in data:
             queryset = queryset.filter(bus_type=data['bus_type'])
-        if 'min_price' in data:
-            queryset = queryset.filter(price__gte=data['min_price'])
-        if 'max_price' in data:
-            queryset = queryset.filter(price__lte=data['max_price'])
         
         # Order by departure time
         queryset = queryset.order_by('departure_time')
         
-        serializer = BusListSerializer(queryset, many=True)
+        buses = list(queryset)
+        fares = FareEngine.current_fares(buses)
+        
+        # Price filters apply to the fare shown in the results, not the base price
+        if 'min_price' in data:
+            buses = [bus for bus in buses if fares[bus.id] >= data['min_price']]
+        if 'max_price' in data:
+            buses = [bus for bus in buses if fares[bus.id] <= data['max_price']]
+        
+        serializer = BusListSerializer(buses, many=True, context={'fares': fares})
+        partial_matches = self.get_partial_matches(
+            source, destination, start_datetime, end_datetime,
+            exclude_ids=[bus['id'] for bus in serializer.data],
+            filters=data
+        )
         return Response({
-            'count': queryset.count(),
-            'buses': serializer.data
+            'count': len(buses),
+            'buses': serializer.data,
+            'partial_matches': partial_matches
         })
+    
+    def get_partial_matches(self, source, destination, start_datetime, end_datetime, exclude_ids, filters):
+        """
+        Buses whose intermediate stops cover the searched route, filtered
+        like the main results on the fare for just that part of the route
+        """
+        boarding_stops = BusStop.objects.annotate(
+            boards_at=Coalesce('departure_time', 'bus__departure_time')
+        ).filter(
+            name__icontains=source,
+            boards_at__gte=start_datetime,
+            boards_at__lt=end_datetime,
+            bus__is_active=True
+        ).exclude(bus_id__in=exclude_ids).order_by('sequence')
+        if 'bus_type' in filters:
+            boarding_stops = boarding_stops.filter(bus__bus_type=filters['bus_type'])
+        
+        boarding = {}
+        for stop in boarding_stops:
+            boarding.setdefault(stop.bus_id, stop)
+        if not boarding:
+            return []
+        
+        alighting = {}
+        for stop in BusStop.objects.filter(
+            bus_id__in=boarding.keys(),
+            name__icontains=destination
+        ).order_by('sequence'):
+            if stop.sequence > boarding[stop.bus_id].sequence:
+                alighting.setdefault(stop.bus_id, stop)
+        
+        buses = list(Bus.objects.filter(id__in=alighting.keys()).select_related('operator'))
+        last_stops = dict(
+            BusStop.objects.filter(bus_id__in=alighting.keys()).values('bus_id').annotate(
+                last=Max('sequence')
+            ).order_by().values_list('bus_id', 'last')
+        )
+        full_fares = FareEngine.current_fares(buses)
+        fares = {
+            bus.id: prorate(full_fares[bus.id], route_share(
+                boarding[bus.id].sequence, alighting[bus.id].sequence, last_stops[bus.id]
+            ))
+            for bus in buses
+        }
+        if 'min_price' in filters:
+            buses = [bus for bus in buses if fares[bus.id] >= filters['min_price']]
+        if 'max_price' in filters:
+            buses = [bus for bus in buses if fares[bus.id] <= filters['max_price']]
+        
+        context = {
+            'fares': fares,
+            'available_seats': available_seat_counts({
+                bus.id: segment_mask(boarding[bus.id].sequence, alighting[bus.id].sequence) for bus in buses
+            })
+        }
+        matches = []
+        for bus in buses:
+            from_stop, to_stop = boarding[bus.id], alighting[bus.id]
+            data = BusListSerializer(bus, context=context).data
+            data['boarding_stop'] = BusStopSerializer(from_stop).data
+            data['alighting_stop'] = BusStopSerializer(to_stop).data
+            matches.append(data)
+        
+        matches.sort(key=lambda match: match['boarding_stop']['departure_time'] or match['departure_time'])
+        return matches
 
 
 class BusDetailView(generics.RetrieveAPIView):
@@ -70,6 +150,12 @@ class BusDetailView(generics.RetrieveAPIView):
     queryset = Bus.objects.prefetch_related('seats').select_related('operator')
     serializer_class = BusDetailSerializer
     lookup_field = 'id'
+    
+    def retrieve(self, request, *args, **kwargs):
+        bus = self.get_object()
+        context = self.get_serializer_context()
+        context['seat_prices'] = FareEngine.seat_prices(bus, bus.seats.all())
+        return Response(BusDetailSerializer(bus, context=context).data)
 
 
 class BusSeatListView(APIView):
@@ -87,7 +173,28 @@ class BusSeatListView(APIView):
             )
         
         seats = bus.seats.all()
-        serializer = SeatSerializer(seats, many=True)
+        
+        # Optional ?from=<stop>&to=<stop> for a partial-route seat map
+        context = {'seat_prices': FareEngine.seat_prices(bus, seats)}
+        available_seats = None
+        if 'from' in request.query_params and 'to' in request.query_params:
+            try:
+                from_stop = int(request.query_params['from'])
+                to_stop = int(request.query_params['to'])
+            except ValueError:
+                return Response(
+                    {'error': 'Stop sequences must be integers'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not 0 <= from_stop < to_stop <= 64:
+                return Response(
+                    {'error': 'Invalid stop range'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            context['segment_mask'] = segment_mask(from_stop, to_stop)
+            available_seats = sum(1 for seat in seats if seat.is_available_for(context['segment_mask']))
+        
+        serializer = SeatSerializer(seats, many=True, context=context)
         
         return Response({
             'bus_id': str(bus.id),
@@ -95,7 +202,7 @@ class BusSeatListView(APIView):
             'rows': bus.rows,
             'seats_per_row': bus.seats_per_row,
             'total_seats': bus.total_seats,
-            'available_seats': bus.available_seats_count,
+            'available_seats': bus.available_seats_count if available_seats is None else available_seats,
             'seats': serializer.data
         })
 
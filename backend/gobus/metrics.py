@@ -0,0 +1,80 @@
+"""
+In-process metrics registry.
+
+Counters and latency histograms are kept per worker process and exposed
+through the admin metrics endpoint (see gobus.views.MetricsView).
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_histograms = {}
+
+
+def increment(name: str, amount: int = 1):
+    """Increase a named counter"""
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name: str, value: float, buckets: tuple = LATENCY_BUCKETS):
+    """Record a value (seconds, for latencies) in a named histogram"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {
+                'buckets': buckets,
+                'counts': [0] * (len(buckets) + 1),
+                'count': 0,
+                'sum': 0.0,
+            }
+        histogram['counts'][bisect.bisect_left(histogram['buckets'], value)] += 1
+        histogram['count'] += 1
+        histogram['sum'] += value
+
+
+@contextmanager
+def timer(name: str):
+    """Observe the wall-clock duration of a block"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def snapshot() -> dict:
+    """Current value of every counter"""
+    with _lock:
+        return dict(_counters)
+
+
+def histograms() -> dict:
+    """Cumulative bucket counts, total and sum of every histogram"""
+    with _lock:
+        result = {}
+        for name, histogram in _histograms.items():
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(list(histogram['buckets']) + ['+Inf'], histogram['counts']):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            result[name] = {
+                'buckets': buckets,
+                'count': histogram['count'],
+                'sum': round(histogram['sum'], 6),
+            }
+        return result
+
+
+def reset():
+    """Clear all counters and histograms"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
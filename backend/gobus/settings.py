@@ -97,6 +97,17 @@ TIME_ZONE = 'Asia/Kolkata'
 USE_I18N = True
 USE_TZ = True
 
+# Cache (use a shared backend such as Redis when running several workers)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Per-user My Trips cache lifetime (in seconds)
+MY_TRIPS_CACHE_TIMEOUT = int(os.getenv('MY_TRIPS_CACHE_TIMEOUT', 300))
+
 # Static files
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -137,10 +148,71 @@ CORS_ALLOW_ALL_ORIGINS = DEBUG
 RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID', '')
 RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET', '')
 RAZORPAY_MOCK_MODE = os.getenv('RAZORPAY_MOCK_MODE', 'True').lower() == 'true'
+RAZORPAY_WEBHOOK_SECRET = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')
+PAYMENT_WEBHOOK_BATCH_SIZE = int(os.getenv('PAYMENT_WEBHOOK_BATCH_SIZE', 100))
+
+# Razorpay gateway client (one pooled client per process, see payments.gateway)
+RAZORPAY_BASE_URL = os.getenv('RAZORPAY_BASE_URL', '')  # empty = live API; stand-in: http://127.0.0.1:8787
+RAZORPAY_CONNECT_TIMEOUT = float(os.getenv('RAZORPAY_CONNECT_TIMEOUT', 3.05))
+RAZORPAY_READ_TIMEOUT = float(os.getenv('RAZORPAY_READ_TIMEOUT', 10))
+RAZORPAY_MAX_RETRIES = int(os.getenv('RAZORPAY_MAX_RETRIES', 2))
+RAZORPAY_POOL_SIZE = int(os.getenv('RAZORPAY_POOL_SIZE', 10))
+RAZORPAY_BREAKER_THRESHOLD = int(os.getenv('RAZORPAY_BREAKER_THRESHOLD', 5))
+RAZORPAY_BREAKER_RESET_SECONDS = int(os.getenv('RAZORPAY_BREAKER_RESET_SECONDS', 30))
+
+# Refund worker (manage.py process_refunds)
+REFUND_BATCH_SIZE = int(os.getenv('REFUND_BATCH_SIZE', 100))
+REFUND_WORKERS = int(os.getenv('REFUND_WORKERS', 4))
+REFUND_RATE_PER_SECOND = float(os.getenv('REFUND_RATE_PER_SECOND', 10))
+REFUND_MAX_ATTEMPTS = int(os.getenv('REFUND_MAX_ATTEMPTS', 8))
+REFUND_RETRY_BASE_SECONDS = int(os.getenv('REFUND_RETRY_BASE_SECONDS', 60))
 
 # Firebase Settings
 FIREBASE_MOCK_MODE = os.getenv('FIREBASE_MOCK_MODE', 'True').lower() == 'true'
 FIREBASE_CREDENTIALS_PATH = os.getenv('FIREBASE_CREDENTIALS_PATH', '')
+FCM_TRANSPORT = os.getenv('FCM_TRANSPORT', '')  # dotted path, e.g. notifications.transports.FakeTransport
+FCM_MULTICAST_WORKERS = int(os.getenv('FCM_MULTICAST_WORKERS', 4))
+
+# Notification outbox dispatcher (manage.py dispatch_notifications)
+NOTIFICATION_DISPATCH_BATCH_SIZE = int(os.getenv('NOTIFICATION_DISPATCH_BATCH_SIZE', 200))
+NOTIFICATION_DISPATCH_WORKERS = int(os.getenv('NOTIFICATION_DISPATCH_WORKERS', 4))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', 5))
+NOTIFICATION_RETRY_BASE_SECONDS = int(os.getenv('NOTIFICATION_RETRY_BASE_SECONDS', 30))
+
+# Trip reminders (manage.py send_trip_reminders)
+TRIP_REMINDER_HOURS = [int(h) for h in os.getenv('TRIP_REMINDER_HOURS', '24,2').split(',')]
+TRIP_REMINDER_WINDOW_MINUTES = int(os.getenv('TRIP_REMINDER_WINDOW_MINUTES', 15))
+
+# Ticket QR tokens (HMAC key defaults to SECRET_KEY; validity runs until arrival + grace)
+TICKET_SIGNING_KEY = os.getenv('TICKET_SIGNING_KEY', '')
+TICKET_TOKEN_GRACE_HOURS = int(os.getenv('TICKET_TOKEN_GRACE_HOURS', 6))
+TICKET_LEGACY_QR_UNTIL = os.getenv('TICKET_LEGACY_QR_UNTIL', '')  # ISO datetime; unsigned pre-token QR codes are refused after it (empty = always)
+
+# Ticket rendering (0 workers renders inline on confirmation)
+TICKET_RENDER_WORKERS = int(os.getenv('TICKET_RENDER_WORKERS', 2))
+TICKET_RENDER_INLINE_LIMIT = int(os.getenv('TICKET_RENDER_INLINE_LIMIT', 4))
+TICKET_BULK_CHUNK_SIZE = int(os.getenv('TICKET_BULK_CHUNK_SIZE', 25))
+
+# In-process LRU of encoded QR images (bytes, per worker)
+QR_CACHE_MAX_BYTES = int(os.getenv('QR_CACHE_MAX_BYTES', 8 * 1024 * 1024))
 
 # Seat Lock Timeout (in minutes)
 SEAT_LOCK_TIMEOUT = 10
+
+# Group seat auto-pick: blocks tried before giving up when seats are taken concurrently
+AUTO_PICK_MAX_ATTEMPTS = int(os.getenv('AUTO_PICK_MAX_ATTEMPTS', 3))
+
+# Dynamic fares (see buses.fares): (threshold, multiplier) tiers on top of Bus.price
+FARE_OCCUPANCY_TIERS = [(50, '1.10'), (75, '1.25'), (90, '1.40')]  # percent of seats taken
+FARE_LEAD_TIME_TIERS = [(6, '1.20'), (24, '1.10')]  # hours left before departure
+FARE_WINDOW_PREMIUM = os.getenv('FARE_WINDOW_PREMIUM', '0.05')
+FARE_LOWER_BERTH_PREMIUM = os.getenv('FARE_LOWER_BERTH_PREMIUM', '0.10')
+FARE_MIN_MULTIPLIER = os.getenv('FARE_MIN_MULTIPLIER', '0.70')
+FARE_MAX_MULTIPLIER = os.getenv('FARE_MAX_MULTIPLIER', '2.00')
+FARE_ROUNDING = int(os.getenv('FARE_ROUNDING', 1))  # fares are rounded to this many rupees
+FARE_TABLE_CACHE_SECONDS = int(os.getenv('FARE_TABLE_CACHE_SECONDS', 900))
+
+# Async checkout queue
+CHECKOUT_QUEUE_BACKEND = os.getenv('CHECKOUT_QUEUE_BACKEND', 'bookings.queue.DatabaseCheckoutQueue')
+CHECKOUT_QUEUE_BATCH_SIZE = int(os.getenv('CHECKOUT_QUEUE_BATCH_SIZE', 50))
+CHECKOUT_QUEUE_LEASE_SECONDS = int(os.getenv('CHECKOUT_QUEUE_LEASE_SECONDS', 60))  # claimed intents return to the queue after this
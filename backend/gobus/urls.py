@@ -6,6 +6,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -16,6 +17,7 @@ urlpatterns = [
     path('api/tickets/', include('tickets.urls')),
     path('api/notifications/', include('notifications.urls')),
     path('operator/', include('operator_dashboard.urls')),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,28 @@
+"""
+Project-level views
+"""
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from tickets.qr_cache import qr_cache
+from . import metrics
+
+
+class MetricsView(APIView):
+    """In-process metrics for this worker (admins only)"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response(
+                {'error': 'Only admins can view metrics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        return Response({
+            'counters': metrics.snapshot(),
+            'histograms': metrics.histograms(),
+            'qr_cache': qr_cache.stats()
+        })
@@ -0,0 +1,21 @@
+"""
+Admin configuration for Notifications app
+"""
+from django.contrib import admin
+from .models import NotificationOutbox, TripReminder
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'kind', 'status', 'attempts', 'next_attempt_at', 'created_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['user__email', 'title']
+    ordering = ['-created_at']
+    readonly_fields = ['id', 'created_at', 'sent_at']
+
+
+@admin.register(TripReminder)
+class TripReminderAdmin(admin.ModelAdmin):
+    list_display = ['booking', 'hours_before', 'created_at']
+    list_filter = ['hours_before', 'created_at']
+    ordering = ['-created_at']
@@ -0,0 +1,28 @@
+"""
+Dispatcher for the notification outbox
+"""
+import time
+from django.core.management.base import BaseCommand
+from notifications.outbox import OutboxService
+
+
+class Command(BaseCommand):
+    help = 'Send queued push notifications from the outbox'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox')
+        parser.add_argument('--interval', type=float, default=1.0, help='Poll interval in seconds')
+    
+    def handle(self, *args, **options):
+        while True:
+            counts = OutboxService.dispatch_batch(options['batch_size'])
+            if counts:
+                summary = ', '.join(f"{count} {outcome}" for outcome, count in sorted(counts.items()))
+                self.stdout.write(f"Dispatched {sum(counts.values())} notifications ({summary})")
+            if not options['loop']:
+                if not counts:
+                    break
+                continue
+            if not counts:
+                time.sleep(options['interval'])
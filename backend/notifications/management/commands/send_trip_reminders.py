@@ -0,0 +1,28 @@
+"""
+Scheduler for trip reminder notifications
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from notifications.reminders import ReminderService
+
+
+class Command(BaseCommand):
+    help = 'Queue reminders for confirmed bookings departing soon'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--hours-before', type=int, action='append', dest='hours_before',
+                            help='Reminder lead time in hours (repeatable)')
+        parser.add_argument('--loop', action='store_true', help='Keep scheduling')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between runs')
+    
+    def handle(self, *args, **options):
+        lead_times = options['hours_before'] or getattr(settings, 'TRIP_REMINDER_HOURS', [2])
+        while True:
+            for hours_before in lead_times:
+                queued = ReminderService.run(hours_before)
+                if queued:
+                    self.stdout.write(f"Queued {queued} {hours_before}h trip reminders")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
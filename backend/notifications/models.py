@@ -0,0 +1,91 @@
+"""
+Notification models for GoBus
+"""
+import uuid
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from bookings.models import Booking
+
+
+class NotificationStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    SENT = 'sent', 'Sent'
+    SKIPPED = 'skipped', 'Skipped'
+    FAILED = 'failed', 'Failed'
+
+
+class NotificationOutbox(models.Model):
+    """
+    Push notification written in the same transaction as the state change
+    that triggers it, and delivered later by the outbox dispatcher
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='outbox_notifications'
+    )
+    
+    # Message
+    kind = models.CharField(max_length=50)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    
+    # Delivery
+    status = models.CharField(
+        max_length=20,
+        choices=NotificationStatus.choices,
+        default=NotificationStatus.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'notification_outbox'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} to {self.user_id} ({self.status})"
+
+
+class TripReminder(models.Model):
+    """Record of a reminder queued for a booking, so it is never sent twice"""
+    
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE,
+        related_name='reminders'
+    )
+    hours_before = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'trip_reminders'
+        unique_together = ['booking', 'hours_before']
+    
+    def __str__(self):
+        return f"{self.hours_before}h reminder for {self.booking_id}"
+
+
+class ReminderCursor(models.Model):
+    """How far ahead the reminder scheduler has processed departures"""
+    
+    hours_before = models.PositiveSmallIntegerField(unique=True)
+    window_end = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'reminder_cursors'
+    
+    def __str__(self):
+        return f"{self.hours_before}h reminders up to {self.window_end}"
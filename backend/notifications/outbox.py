@@ -0,0 +1,174 @@
+"""
+Transactional notification outbox.
+
+Request code only inserts NotificationOutbox rows, inside the transaction
+that changes booking or payment state, so a push is queued exactly when
+the change commits and request latency never includes the push provider.
+The dispatcher (manage.py dispatch_notifications) claims due rows in
+batches, sends identical messages as one multicast, and records outcomes.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from users.models import User
+from .models import NotificationOutbox, NotificationStatus
+from .transports import MULTICAST_LIMIT, get_transport
+
+_batch = threading.local()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class OutboxService:
+    """Service for queueing and dispatching outbox notifications"""
+    
+    @staticmethod
+    def enqueue(user, kind: str, title: str, body: str, data: dict = None) -> NotificationOutbox:
+        """Queue a push notification (call inside the state-changing transaction)"""
+        notification = NotificationOutbox(
+            user=user,
+            kind=kind,
+            title=title,
+            body=body,
+            data=data or {}
+        )
+        buffer = getattr(_batch, 'rows', None)
+        if buffer is not None:
+            buffer.append(notification)
+        else:
+            notification.save()
+        return notification
+    
+    @staticmethod
+    @contextmanager
+    def batch():
+        """Collect enqueue() calls made inside the block into one bulk insert"""
+        if getattr(_batch, 'rows', None) is not None:
+            yield
+            return
+        _batch.rows = []
+        try:
+            yield
+            rows = _batch.rows
+        finally:
+            _batch.rows = None
+        if rows:
+            NotificationOutbox.objects.bulk_create(rows)
+    
+    @staticmethod
+    def enqueue_many(notifications: list) -> list:
+        """Queue many unsaved NotificationOutbox rows with one insert"""
+        return NotificationOutbox.objects.bulk_create(notifications)
+    
+    @staticmethod
+    def claim_batch(limit: int = None) -> list:
+        """
+        Claim due rows. Claiming pushes next_attempt_at out by a lease, so
+        concurrent dispatchers skip them and a crashed one's rows come back.
+        """
+        limit = limit or _setting('NOTIFICATION_DISPATCH_BATCH_SIZE', 200)
+        now = timezone.now()
+        lease_until = now + timezone.timedelta(seconds=_setting('NOTIFICATION_DISPATCH_LEASE_SECONDS', 60))
+        
+        with transaction.atomic():
+            rows = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('user')
+                .filter(status=NotificationStatus.PENDING, next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:limit]
+            )
+            for row in rows:
+                row.attempts += 1
+                row.next_attempt_at = lease_until
+            NotificationOutbox.objects.bulk_update(rows, ['attempts', 'next_attempt_at'])
+        return rows
+    
+    @staticmethod
+    def dispatch_batch(limit: int = None) -> dict:
+        """Claim, send and record one batch; returns counts per outcome"""
+        rows = OutboxService.claim_batch(limit)
+        if not rows:
+            return {}
+        
+        # Rows with the same message share one multicast call
+        groups = {}
+        skipped = []
+        for row in rows:
+            if not row.user.fcm_token:
+                skipped.append(row)
+                continue
+            key = (row.title, row.body, json.dumps(row.data, sort_keys=True))
+            groups.setdefault(key, []).append(row)
+        
+        jobs = [
+            (key, group[i:i + MULTICAST_LIMIT])
+            for key, group in groups.items()
+            for i in range(0, len(group), MULTICAST_LIMIT)
+        ]
+        transport = get_transport()
+        
+        def send(job):
+            (title, body, _), group = job
+            try:
+                return transport.send_multicast(
+                    [row.user.fcm_token for row in group], title, body, group[0].data
+                ), None
+            except Exception as e:
+                return None, str(e)
+        
+        workers = max(1, min(len(jobs), _setting('NOTIFICATION_DISPATCH_WORKERS', 4)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(send, jobs)) if jobs else []
+        
+        now = timezone.now()
+        invalid_tokens = []
+        for row in skipped:
+            row.status = NotificationStatus.SKIPPED
+            row.last_error = 'No FCM token registered'
+        
+        for (_, group), (result, error) in zip(jobs, results):
+            failed = set(result.failed_tokens) if result else set()
+            invalid = set(result.invalid_tokens) if result else set()
+            invalid_tokens.extend(invalid)
+            for row in group:
+                token = row.user.fcm_token
+                if result and token not in failed:
+                    row.status = NotificationStatus.SENT
+                    row.sent_at = now
+                    row.last_error = None
+                elif token in invalid:
+                    row.status = NotificationStatus.SKIPPED
+                    row.last_error = 'FCM token is no longer registered'
+                else:
+                    OutboxService._schedule_retry(row, error or 'Push provider rejected the message', now)
+        
+        NotificationOutbox.objects.bulk_update(
+            rows, ['status', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+        if invalid_tokens:
+            User.objects.filter(fcm_token__in=invalid_tokens).update(fcm_token=None)
+        
+        counts = {}
+        for row in rows:
+            status = str(row.status)
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+    
+    @staticmethod
+    def _schedule_retry(row, error: str, now):
+        """Exponential backoff; give up after NOTIFICATION_MAX_ATTEMPTS"""
+        row.last_error = error
+        if row.attempts >= _setting('NOTIFICATION_MAX_ATTEMPTS', 5):
+            row.status = NotificationStatus.FAILED
+            return
+        delay = min(
+            _setting('NOTIFICATION_RETRY_BASE_SECONDS', 30) * 2 ** (row.attempts - 1),
+            _setting('NOTIFICATION_RETRY_MAX_SECONDS', 3600)
+        )
+        row.next_attempt_at = now + timezone.timedelta(seconds=delay)
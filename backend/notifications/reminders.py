@@ -0,0 +1,107 @@
+"""
+Trip reminder scheduler.
+
+For each reminder lead time (e.g. 24h and 2h before departure) a cursor
+records how far ahead departures have been handled. Every run walks the
+departure-time index forward from the cursor in fixed windows up to
+now + lead time, so each departure is looked at once rather than
+rescanning all bookings, and TripReminder rows guard against duplicates.
+
+Trips moved behind a cursor (brought forward, or delayed but still before
+the processed horizon) would never be reached again, so the code that
+moves them calls queue_moved_trips in the same transaction.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from bookings.models import Booking, BookingStatus
+from buses.models import Bus
+from .models import ReminderCursor, TripReminder
+from .services import NotificationService
+
+
+class ReminderService:
+    """Service for scheduling trip reminders"""
+    
+    @staticmethod
+    def run(hours_before: int, now=None) -> int:
+        """Queue reminders for departures up to now + hours_before; returns reminders queued"""
+        now = now or timezone.now()
+        target_end = now + timezone.timedelta(hours=hours_before)
+        window = timezone.timedelta(minutes=getattr(settings, 'TRIP_REMINDER_WINDOW_MINUTES', 15))
+        
+        # A fresh cursor starts at now: trips already departed get no reminder
+        ReminderCursor.objects.get_or_create(hours_before=hours_before, defaults={'window_end': now})
+        
+        queued = 0
+        while True:
+            with transaction.atomic():
+                cursor = ReminderCursor.objects.select_for_update().get(hours_before=hours_before)
+                start = max(cursor.window_end, now)
+                if start >= target_end:
+                    break
+                end = min(start + window, target_end)
+                queued += len(ReminderService._process_window(hours_before, start, end))
+                cursor.window_end = end
+                cursor.save(update_fields=['window_end', 'updated_at'])
+        return queued
+    
+    @staticmethod
+    def queue_moved_trips(bus_ids, now=None) -> int:
+        """
+        Queue the reminders that are already due for trips that were just
+        moved and whose old reminders were cleared. Only the nearest lead time
+        is sent; longer ones that have also passed are recorded as handled.
+        Returns reminders queued.
+        """
+        now = now or timezone.now()
+        handled = set()
+        queued = 0
+        for cursor in ReminderCursor.objects.filter(window_end__gt=now).order_by('hours_before'):
+            booking_ids = ReminderService._process_window(
+                cursor.hours_before, now, cursor.window_end, bus_ids=bus_ids, record_only=handled
+            )
+            queued += len(set(booking_ids) - handled)
+            handled.update(booking_ids)
+        return queued
+    
+    @staticmethod
+    def _process_window(hours_before: int, start, end, bus_ids=None, record_only=frozenset()) -> list:
+        """
+        Record and queue reminders for confirmed bookings departing in
+        [start, end), optionally of some buses only; bookings in record_only
+        are recorded without a message. Returns the booking IDs recorded.
+        """
+        bookings = Booking.objects.filter(
+            status=BookingStatus.CONFIRMED,
+            bus__departure_time__gte=start,
+            bus__departure_time__lt=end,
+            bus__is_active=True
+        )
+        if bus_ids is not None:
+            bookings = bookings.filter(bus_id__in=list(bus_ids))
+        rows = list(
+            bookings.filter(
+                ~Exists(TripReminder.objects.filter(booking=OuterRef('pk'), hours_before=hours_before))
+            ).values_list('id', 'bus_id', 'user_id', 'user__fcm_token')
+        )
+        if not rows:
+            return []
+        
+        TripReminder.objects.bulk_create([
+            TripReminder(booking_id=booking_id, hours_before=hours_before)
+            for booking_id, _, _, _ in rows
+        ])
+        
+        # Users without a device token are recorded but not queued
+        recipients = {}
+        for booking_id, bus_id, user_id, fcm_token in rows:
+            if fcm_token and booking_id not in record_only:
+                recipients.setdefault(bus_id, set()).add(user_id)
+        
+        notification_service = NotificationService()
+        for bus in Bus.objects.filter(id__in=list(recipients)).only('id', 'name', 'source', 'departure_time'):
+            notification_service.queue_trip_reminders(bus, sorted(recipients[bus.id], key=str), hours_before)
+        
+        return [booking_id for booking_id, _, _, _ in rows]
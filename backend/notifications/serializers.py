@@ -0,0 +1,24 @@
+"""
+Notification serializers
+"""
+from rest_framework import serializers
+
+BROADCAST_KINDS = ['delay', 'platform_change', 'cancellation', 'general']
+
+
+class BroadcastSerializer(serializers.Serializer):
+    """Operator message to all passengers of a bus"""
+    
+    kind = serializers.ChoiceField(choices=BROADCAST_KINDS, default='general')
+    title = serializers.CharField(max_length=100)
+    body = serializers.CharField(max_length=500)
+
+
+class FleetBroadcastSerializer(BroadcastSerializer):
+    """Operator message to all passengers of several buses"""
+    
+    bus_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=1000
+    )
@@ -2,35 +2,21 @@
 Firebase Cloud Messaging notification service
 Supports both real FCM and mock mode for development
 """
-import json
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from django.utils import timezone
 from users.models import User
+from .models import NotificationOutbox
+from .outbox import OutboxService
+from .transports import MULTICAST_LIMIT, BaseTransport, MockTransport, MulticastResult, get_transport
 
 
 class FCMService:
     """Service for sending Firebase Cloud Messaging notifications"""
     
-    def __init__(self):
-        self.mock_mode = getattr(settings, 'FIREBASE_MOCK_MODE', True)
-        self._initialized = False
-        
-        if not self.mock_mode:
-            self._initialize_firebase()
-    
-    def _initialize_firebase(self):
-        """Initialize Firebase Admin SDK"""
-        try:
-            import firebase_admin
-            from firebase_admin import credentials
-            
-            cred_path = getattr(settings, 'FIREBASE_CREDENTIALS_PATH', '')
-            if cred_path:
-                cred = credentials.Certificate(cred_path)
-                firebase_admin.initialize_app(cred)
-                self._initialized = True
-        except Exception as e:
-            print(f"Firebase initialization failed: {e}")
-            self.mock_mode = True
+    def __init__(self, transport: BaseTransport = None):
+        self.transport = transport or get_transport()
+        self.mock_mode = isinstance(self.transport, MockTransport)
     
     def send_notification(self, user: User, title: str, body: str, data: dict = None) -> bool:
         """Send push notification to a user"""
@@ -38,53 +24,52 @@ class FCMService:
         if not user.fcm_token:
             return False
         
-        if self.mock_mode:
-            # Log notification in mock mode
-            print(f"[MOCK FCM] To: {user.email}")
-            print(f"[MOCK FCM] Title: {title}")
-            print(f"[MOCK FCM] Body: {body}")
-            print(f"[MOCK FCM] Data: {json.dumps(data) if data else 'None'}")
-            return True
-        
-        try:
-            from firebase_admin import messaging
-            
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=title,
-                    body=body
-                ),
-                data=data or {},
-                token=user.fcm_token
-            )
-            
-            response = messaging.send(message)
-            print(f"FCM sent successfully: {response}")
-            return True
-            
-        except Exception as e:
-            print(f"FCM send failed: {e}")
-            return False
+        return self.transport.send(user.fcm_token, title, body, data)
     
     def send_to_multiple(self, users: list, title: str, body: str, data: dict = None) -> int:
-        """Send notification to multiple users"""
+        """
+        Send notification to multiple users as multicast batches of up to
+        500 devices, dispatched concurrently. Tokens FCM reports as invalid
+        are cleared.
+        """
+        tokens = list(dict.fromkeys(user.fcm_token for user in users if user.fcm_token))
+        batches = [tokens[i:i + MULTICAST_LIMIT] for i in range(0, len(tokens), MULTICAST_LIMIT)]
+        if not batches:
+            return 0
+        
+        def send_batch(batch):
+            try:
+                return self.transport.send_multicast(batch, title, body, data)
+            except Exception as e:
+                print(f"FCM multicast failed: {e}")
+                return MulticastResult(failure_count=len(batch), failed_tokens=list(batch))
         
-        success_count = 0
-        for user in users:
-            if self.send_notification(user, title, body, data):
-                success_count += 1
+        if len(batches) == 1:
+            results = [send_batch(batches[0])]
+        else:
+            workers = min(len(batches), getattr(settings, 'FCM_MULTICAST_WORKERS', 4))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(send_batch, batches))
         
-        return success_count
+        invalid_tokens = [token for result in results for token in result.invalid_tokens]
+        if invalid_tokens:
+            User.objects.filter(fcm_token__in=invalid_tokens).update(fcm_token=None)
+        
+        return sum(result.success_count for result in results)
 
 
 class NotificationService:
-    """High-level notification service for booking events"""
+    """
+    High-level notification service for booking events.
+    Messages go through the outbox; call these inside the transaction
+    that makes the corresponding state change.
+    """
     
     def __init__(self):
         self.fcm = FCMService()
     
     def send_booking_confirmation(self, booking):
-        """Send booking confirmation notification"""
+        """Queue booking confirmation notification"""
         
         title = "Booking Confirmed! 🎉"
         body = f"Your booking for {booking.bus.name} ({booking.bus.source} → {booking.bus.destination}) is confirmed. Seats: {', '.join(booking.seat_numbers)}"
@@ -94,23 +79,45 @@ class NotificationService:
             'booking_id': str(booking.id)
         }
         
-        return self.fcm.send_notification(booking.user, title, body, data)
+        return OutboxService.enqueue(booking.user, data['type'], title, body, data)
+    
+    @staticmethod
+    def _trip_reminder_text(bus, hours_before: int):
+        title = f"Trip Reminder - {hours_before}h to go! ⏰"
+        departure = timezone.localtime(bus.departure_time).strftime('%I:%M %p')
+        body = f"Your bus {bus.name} departs at {departure} from {bus.source}"
+        return title, body
     
     def send_trip_reminder(self, booking, hours_before: int = 2):
-        """Send trip reminder notification"""
+        """Queue trip reminder notification"""
         
-        title = f"Trip Reminder - {hours_before}h to go! ⏰"
-        body = f"Your bus {booking.bus.name} departs at {booking.bus.departure_time.strftime('%I:%M %p')} from {booking.bus.source}"
+        title, body = self._trip_reminder_text(booking.bus, hours_before)
         
         data = {
             'type': 'trip_reminder',
             'booking_id': str(booking.id)
         }
         
-        return self.fcm.send_notification(booking.user, title, body, data)
+        return OutboxService.enqueue(booking.user, data['type'], title, body, data)
+    
+    def queue_trip_reminders(self, bus, user_ids, hours_before: int) -> list:
+        """
+        Queue one bus's reminders with a single insert. The message is the
+        same for every passenger, so the dispatcher sends it as one multicast.
+        """
+        title, body = self._trip_reminder_text(bus, hours_before)
+        data = {
+            'type': 'trip_reminder',
+            'bus_id': str(bus.id)
+        }
+        
+        return OutboxService.enqueue_many([
+            NotificationOutbox(user_id=user_id, kind=data['type'], title=title, body=body, data=data)
+            for user_id in user_ids
+        ])
     
     def send_cancellation_alert(self, booking):
-        """Send booking cancellation notification"""
+        """Queue booking cancellation notification"""
         
         title = "Booking Cancelled"
         body = f"Your booking for {booking.bus.name} has been cancelled. Refund will be processed shortly."
@@ -120,10 +127,81 @@ class NotificationService:
             'booking_id': str(booking.id)
         }
         
-        return self.fcm.send_notification(booking.user, title, body, data)
+        return OutboxService.enqueue(booking.user, data['type'], title, body, data)
+    
+    def queue_trip_cancellations(self, user_ids_by_bus: dict, reason: str = '') -> list:
+        """Queue the operator's cancellation notice for the passengers of many trips with a single insert"""
+        
+        notifications = []
+        for bus, user_ids in user_ids_by_bus.items():
+            title = "Trip Cancelled"
+            departure = timezone.localtime(bus.departure_time).strftime('%d %b, %I:%M %p')
+            body = f"Your trip on {bus.name} ({bus.source} → {bus.destination}, {departure}) has been cancelled by the operator."
+            if reason:
+                body += f" Reason: {reason}."
+            body += " A full refund has been initiated."
+            
+            data = {
+                'type': 'trip_cancelled',
+                'bus_id': str(bus.id)
+            }
+            notifications.extend(
+                NotificationOutbox(user_id=user_id, kind=data['type'], title=title, body=body, data=data)
+                for user_id in set(user_ids)
+            )
+        
+        return OutboxService.enqueue_many(notifications)
+    
+    def queue_trip_reschedules(self, user_ids_by_bus: dict, shift, reason: str = '') -> list:
+        """Queue the new departure time for the passengers of many trips with a single insert (buses already moved)"""
+        
+        minutes = int(abs(shift.total_seconds()) // 60)
+        change = f"{'delayed' if shift.total_seconds() > 0 else 'brought forward'} by {minutes // 60}h {minutes % 60:02d}m"
+        
+        notifications = []
+        for bus, user_ids in user_ids_by_bus.items():
+            title = "Trip Rescheduled 🕒"
+            departure = timezone.localtime(bus.departure_time).strftime('%d %b, %I:%M %p')
+            body = f"Your bus {bus.name} ({bus.source} → {bus.destination}) has been {change} and now departs at {departure}."
+            if reason:
+                body += f" Reason: {reason}."
+            
+            data = {
+                'type': 'trip_rescheduled',
+                'bus_id': str(bus.id)
+            }
+            notifications.extend(
+                NotificationOutbox(user_id=user_id, kind=data['type'], title=title, body=body, data=data)
+                for user_id in set(user_ids)
+            )
+        
+        return OutboxService.enqueue_many(notifications)
+    
+    def queue_seat_transfers(self, bus, moves: list) -> list:
+        """Queue each passenger's new bus and seats after a vehicle swap with a single insert"""
+        
+        title = "Bus Changed 🚌"
+        departure = timezone.localtime(bus.departure_time).strftime('%d %b, %I:%M %p')
+        
+        notifications = []
+        for booking, seat_numbers in moves:
+            body = (
+                f"Your trip {bus.source} → {bus.destination} ({departure}) now runs on {bus.name} ({bus.bus_number}). "
+                f"New seats: {', '.join(seat_numbers)}. Your e-ticket has been updated."
+            )
+            data = {
+                'type': 'seat_transfer',
+                'booking_id': str(booking.id),
+                'bus_id': str(bus.id)
+            }
+            notifications.append(
+                NotificationOutbox(user_id=booking.user_id, kind=data['type'], title=title, body=body, data=data)
+            )
+        
+        return OutboxService.enqueue_many(notifications)
     
     def send_payment_success(self, booking, amount):
-        """Send payment success notification"""
+        """Queue payment success notification"""
         
         title = "Payment Successful ✓"
         body = f"₹{amount} paid successfully for your {booking.bus.source} → {booking.bus.destination} trip"
@@ -133,4 +211,62 @@ class NotificationService:
             'booking_id': str(booking.id)
         }
         
-        return self.fcm.send_notification(booking.user, title, body, data)
+        return OutboxService.enqueue(booking.user, data['type'], title, body, data)
+    
+    def send_refund_processed(self, booking, amount):
+        """Queue refund notification"""
+        
+        title = "Refund Processed"
+        body = f"₹{amount} for your {booking.bus.source} → {booking.bus.destination} trip has been refunded to your original payment method"
+        
+        data = {
+            'type': 'refund_processed',
+            'booking_id': str(booking.id)
+        }
+        
+        return OutboxService.enqueue(booking.user, data['type'], title, body, data)
+    
+    def send_waitlist_offer(self, booking):
+        """Queue notification that waitlisted seats are on hold"""
+        
+        title = "Seats Available! 🎟️"
+        body = f"Seats {', '.join(booking.seat_numbers)} on {booking.bus.name} are on hold for you. Complete payment before the hold expires."
+        
+        data = {
+            'type': 'waitlist_offer',
+            'booking_id': str(booking.id)
+        }
+        
+        return OutboxService.enqueue(booking.user, data['type'], title, body, data)
+    
+    def broadcast_to_buses(self, bus_ids, title: str, body: str, kind: str = 'general') -> dict:
+        """
+        Queue an operator message for every confirmed passenger of the given
+        buses who has a device registered, with a single outbox insert. Recipients come from one query of
+        distinct (bus, user) pairs, so a passenger with several bookings on
+        a bus gets one push; the dispatcher sends each bus's copy as one
+        multicast.
+        """
+        from bookings.models import Booking, BookingStatus
+        
+        notifications = [
+            NotificationOutbox(
+                user_id=user_id,
+                kind=f'bus_{kind}',
+                title=title,
+                body=body,
+                data={'type': f'bus_{kind}', 'bus_id': str(bus_id)}
+            )
+            for bus_id, user_id in Booking.objects.filter(
+                bus_id__in=list(bus_ids),
+                status=BookingStatus.CONFIRMED,
+                user__fcm_token__isnull=False
+            ).exclude(user__fcm_token='').order_by().values_list('bus_id', 'user_id').distinct()
+        ]
+        OutboxService.enqueue_many(notifications)
+        
+        return {
+            'buses': len({row.data['bus_id'] for row in notifications}),
+            'recipients': len({row.user_id for row in notifications}),
+            'queued': len(notifications)
+        }
@@ -0,0 +1,175 @@
+"""
+Push notification transports.
+
+FCMService talks to a transport rather than to Firebase directly so the
+real provider can be swapped for the console mock (development) or the
+in-memory fake (tests). Set FCM_TRANSPORT to a dotted class path to force
+a specific transport.
+"""
+import json
+import threading
+from dataclasses import dataclass, field
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# FCM accepts at most 500 tokens per multicast call
+MULTICAST_LIMIT = 500
+
+
+@dataclass
+class MulticastResult:
+    success_count: int = 0
+    failure_count: int = 0
+    failed_tokens: list = field(default_factory=list)
+    invalid_tokens: list = field(default_factory=list)
+
+
+class BaseTransport:
+    """Interface for push notification providers"""
+    
+    def send(self, token: str, title: str, body: str, data: dict = None) -> bool:
+        raise NotImplementedError
+    
+    def send_multicast(self, tokens: list, title: str, body: str, data: dict = None) -> MulticastResult:
+        raise NotImplementedError
+
+
+class FirebaseTransport(BaseTransport):
+    """Firebase Admin SDK transport"""
+    
+    def __init__(self):
+        import firebase_admin
+        from firebase_admin import credentials
+        
+        cred_path = getattr(settings, 'FIREBASE_CREDENTIALS_PATH', '')
+        if not cred_path:
+            raise ValueError("FIREBASE_CREDENTIALS_PATH is not set")
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            firebase_admin.initialize_app(credentials.Certificate(cred_path))
+    
+    def send(self, token, title, body, data=None):
+        from firebase_admin import messaging
+        
+        try:
+            response = messaging.send(messaging.Message(
+                notification=messaging.Notification(title=title, body=body),
+                data=data or {},
+                token=token
+            ))
+            print(f"FCM sent successfully: {response}")
+            return True
+        except Exception as e:
+            print(f"FCM send failed: {e}")
+            return False
+    
+    def send_multicast(self, tokens, title, body, data=None):
+        from firebase_admin import messaging
+        
+        batch = messaging.send_each_for_multicast(messaging.MulticastMessage(
+            notification=messaging.Notification(title=title, body=body),
+            data=data or {},
+            tokens=tokens
+        ))
+        
+        # Tokens that are no longer registered or belong to another sender can be dropped
+        invalid_errors = (
+            messaging.UnregisteredError,
+            messaging.SenderIdMismatchError,
+        )
+        failed = [
+            (token, response.exception)
+            for token, response in zip(tokens, batch.responses)
+            if not response.success
+        ]
+        return MulticastResult(
+            success_count=batch.success_count,
+            failure_count=batch.failure_count,
+            failed_tokens=[token for token, _ in failed],
+            invalid_tokens=[token for token, error in failed if isinstance(error, invalid_errors)]
+        )
+
+
+class MockTransport(BaseTransport):
+    """Logs notifications to the console (development)"""
+    
+    def send(self, token, title, body, data=None):
+        print(f"[MOCK FCM] To: {token[:12]}...")
+        print(f"[MOCK FCM] Title: {title}")
+        print(f"[MOCK FCM] Body: {body}")
+        print(f"[MOCK FCM] Data: {json.dumps(data) if data else 'None'}")
+        return True
+    
+    def send_multicast(self, tokens, title, body, data=None):
+        print(f"[MOCK FCM] Multicast to {len(tokens)} devices: {title}")
+        return MulticastResult(success_count=len(tokens))
+
+
+class FakeTransport(BaseTransport):
+    """
+    In-memory transport for tests. Records every message; tokens listed in
+    invalid_tokens are reported as unregistered, and tokens listed in
+    failing_tokens fail with a retryable error.
+    """
+    
+    def __init__(self, invalid_tokens=(), failing_tokens=()):
+        self.invalid_tokens = set(invalid_tokens)
+        self.failing_tokens = set(failing_tokens)
+        self.sent = []
+        self.multicast_calls = 0
+        self._lock = threading.Lock()
+    
+    def send(self, token, title, body, data=None):
+        return self.send_multicast([token], title, body, data).success_count == 1
+    
+    def send_multicast(self, tokens, title, body, data=None):
+        invalid = [token for token in tokens if token in self.invalid_tokens]
+        failed = invalid + [token for token in tokens if token in self.failing_tokens]
+        with self._lock:
+            self.multicast_calls += 1
+            self.sent.extend(
+                {'token': token, 'title': title, 'body': body, 'data': data or {}}
+                for token in tokens if token not in failed
+            )
+        return MulticastResult(
+            success_count=len(tokens) - len(failed),
+            failure_count=len(failed),
+            failed_tokens=failed,
+            invalid_tokens=invalid
+        )
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> BaseTransport:
+    """Process-wide transport chosen from settings"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = _build_transport()
+        return _transport
+
+
+def set_transport(transport: BaseTransport):
+    """Replace the process-wide transport (e.g. with a FakeTransport in tests)"""
+    global _transport
+    with _transport_lock:
+        _transport = transport
+
+
+def _build_transport() -> BaseTransport:
+    transport_path = getattr(settings, 'FCM_TRANSPORT', '')
+    if transport_path:
+        return import_string(transport_path)()
+    
+    if getattr(settings, 'FIREBASE_MOCK_MODE', True):
+        return MockTransport()
+    
+    try:
+        return FirebaseTransport()
+    except Exception as e:
+        print(f"Firebase initialization failed: {e}")
+        return MockTransport()
@@ -7,7 +7,17 @@ from .views import (
     OperatorBusListView,
     OperatorBusDetailView,
     OperatorBookingsView,
-    OperatorBusPassengersView
+    OperatorBusPassengersView,
+    OperatorBusManifestView,
+    OperatorValidationLogView,
+    OperatorBusBroadcastView,
+    OperatorFleetBroadcastView,
+    OperatorTripCancelView,
+    OperatorBulkTripCancelView,
+    OperatorTripRescheduleView,
+    OperatorSeatTransferView,
+    OperatorFareRuleListView,
+    OperatorFareRuleDetailView
 )
 
 urlpatterns = [
@@ -15,5 +25,15 @@ urlpatterns = [
     path('buses/', OperatorBusListView.as_view(), name='operator_buses'),
     path('buses/<uuid:id>/', OperatorBusDetailView.as_view(), name='operator_bus_detail'),
     path('buses/<uuid:bus_id>/passengers/', OperatorBusPassengersView.as_view(), name='operator_bus_passengers'),
+    path('buses/<uuid:bus_id>/manifest/', OperatorBusManifestView.as_view(), name='operator_bus_manifest'),
+    path('buses/<uuid:bus_id>/validation-log/', OperatorValidationLogView.as_view(), name='operator_validation_log'),
+    path('buses/<uuid:bus_id>/broadcast/', OperatorBusBroadcastView.as_view(), name='operator_bus_broadcast'),
+    path('buses/<uuid:bus_id>/cancel/', OperatorTripCancelView.as_view(), name='operator_trip_cancel'),
+    path('buses/<uuid:bus_id>/transfer/', OperatorSeatTransferView.as_view(), name='operator_seat_transfer'),
+    path('fare-rules/', OperatorFareRuleListView.as_view(), name='operator_fare_rules'),
+    path('fare-rules/<uuid:id>/', OperatorFareRuleDetailView.as_view(), name='operator_fare_rule_detail'),
+    path('trips/cancel/', OperatorBulkTripCancelView.as_view(), name='operator_trips_cancel'),
+    path('trips/reschedule/', OperatorTripRescheduleView.as_view(), name='operator_trips_reschedule'),
+    path('broadcast/', OperatorFleetBroadcastView.as_view(), name='operator_fleet_broadcast'),
     path('bookings/', OperatorBookingsView.as_view(), name='operator_bookings'),
 ]
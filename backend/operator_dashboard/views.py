@@ -8,10 +8,24 @@ from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from django.db.models import Count, Sum
 from datetime import timedelta
-from buses.models import Bus
-from buses.serializers import BusListSerializer, BusCreateSerializer, BusDetailSerializer
+from buses.fares import FareEngine
+from buses.models import Bus, FareRule
+from buses.serializers import BusListSerializer, BusCreateSerializer, BusDetailSerializer, FareRuleSerializer
+from bookings.cache import TripCache
 from bookings.models import Booking, BookingStatus
-from bookings.serializers import BookingListSerializer
+from bookings.serializers import (
+    BookingListSerializer,
+    TripBulkCancelSerializer,
+    TripCancelSerializer,
+    SeatTransferSerializer,
+    TripRescheduleSerializer
+)
+from bookings.services import BookingService
+from bookings.transfer import SeatTransferService
+from notifications.serializers import BroadcastSerializer, FleetBroadcastSerializer
+from notifications.services import NotificationService
+from tickets.manifest import ManifestService
+from tickets.serializers import ValidationLogSerializer
 
 
 class OperatorPermission:
@@ -76,7 +90,9 @@ class OperatorDashboardView(APIView, OperatorPermission):
                 'week_bookings': week_bookings.count(),
                 'week_revenue': float(week_revenue)
             },
-            'upcoming_departures': BusListSerializer(upcoming_buses, many=True).data
+            'upcoming_departures': BusListSerializer(
+                upcoming_buses, many=True, context={'fares': FareEngine.current_fares(upcoming_buses)}
+            ).data
         })
 
 
@@ -91,7 +107,7 @@ class OperatorBusListView(generics.ListCreateAPIView, OperatorPermission):
         return BusListSerializer
     
     def get_queryset(self):
-        return Bus.objects.filter(operator=self.request.user).order_by('-created_at')
+        return Bus.objects.filter(operator=self.request.user).select_related('operator').order_by('-created_at')
     
     def list(self, request, *args, **kwargs):
         if not self.check_operator(request):
@@ -99,7 +115,18 @@ class OperatorBusListView(generics.ListCreateAPIView, OperatorPermission):
                 {'error': 'Operator access required'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        return super().list(request, *args, **kwargs)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        buses = list(page if page is not None else queryset)
+        
+        # Price the whole page at once instead of per bus
+        context = self.get_serializer_context()
+        context['fares'] = FareEngine.current_fares(buses)
+        data = BusListSerializer(buses, many=True, context=context).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
     
     def create(self, request, *args, **kwargs):
         if not self.check_operator(request):
@@ -134,7 +161,10 @@ class OperatorBusDetailView(generics.RetrieveUpdateDestroyAPIView, OperatorPermi
                 {'error': 'Operator access required'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        return super().update(request, *args, **kwargs)
+        response = super().update(request, *args, **kwargs)
+        # Passengers' cached trips show the bus's name and times
+        TripCache.invalidate(*Booking.objects.filter(bus_id=kwargs['id']).values_list('user_id', flat=True))
+        return response
     
     def destroy(self, request, *args, **kwargs):
         if not self.check_operator(request):
@@ -142,13 +172,81 @@ class OperatorBusDetailView(generics.RetrieveUpdateDestroyAPIView, OperatorPermi
                 {'error': 'Operator access required'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        # Soft delete - just mark as inactive
+        # Soft delete; an upcoming trip is cancelled so its passengers are released and refunded
         bus = self.get_object()
+        if bus.is_active and bus.departure_time > timezone.now():
+            result = BookingService.cancel_trips([bus.id], reason='Trip withdrawn by the operator')
+            return Response({'message': 'Bus deactivated successfully', **result})
+        
         bus.is_active = False
         bus.save(update_fields=['is_active'])
         return Response({'message': 'Bus deactivated successfully'})
 
 
+class OperatorFareRuleListView(generics.ListCreateAPIView, OperatorPermission):
+    """List and create the operator's fare rules"""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = FareRuleSerializer
+    
+    def get_queryset(self):
+        return FareRule.objects.filter(operator=self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(operator=self.request.user)
+    
+    def list(self, request, *args, **kwargs):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return super().list(request, *args, **kwargs)
+    
+    def create(self, request, *args, **kwargs):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return super().create(request, *args, **kwargs)
+
+
+class OperatorFareRuleDetailView(generics.RetrieveUpdateDestroyAPIView, OperatorPermission):
+    """Manage a fare rule; changes reprice the operator's trips on the next read"""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = FareRuleSerializer
+    lookup_field = 'id'
+    
+    def get_queryset(self):
+        return FareRule.objects.filter(operator=self.request.user)
+    
+    def retrieve(self, request, *args, **kwargs):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return super().retrieve(request, *args, **kwargs)
+    
+    def update(self, request, *args, **kwargs):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return super().update(request, *args, **kwargs)
+    
+    def destroy(self, request, *args, **kwargs):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return super().destroy(request, *args, **kwargs)
+
+
 class OperatorBookingsView(generics.ListAPIView, OperatorPermission):
     """List bookings for operator's buses"""
     
@@ -158,7 +256,7 @@ class OperatorBookingsView(generics.ListAPIView, OperatorPermission):
     def get_queryset(self):
         queryset = Booking.objects.filter(
             bus__operator=self.request.user
-        ).select_related('bus', 'user').order_by('-created_at')
+        ).select_related('bus', 'user').prefetch_related('seats').order_by('-created_at')
         
         # Optional filters
         bus_id = self.request.query_params.get('bus_id')
@@ -217,7 +315,284 @@ class OperatorBusPassengersView(APIView, OperatorPermission):
             })
         
         return Response({
-            'bus': BusListSerializer(bus).data,
+            'bus': BusListSerializer(bus, context={'fares': FareEngine.current_fares([bus])}).data,
             'total_passengers': len(passengers),
             'passengers': passengers
         })
+
+
+class OperatorBusManifestView(APIView, OperatorPermission):
+    """Download the offline validation manifest for a bus"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, bus_id):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            bus = Bus.objects.get(id=bus_id, operator=request.user)
+        except Bus.DoesNotExist:
+            return Response(
+                {'error': 'Bus not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        manifest = ManifestService.build_manifest(bus)
+        etag = f'"{manifest["version"]}"'
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        return Response(manifest, headers={'ETag': etag})
+
+
+class OperatorValidationLogView(APIView, OperatorPermission):
+    """Upload the offline scan log for a bus in one batch"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, bus_id):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            bus = Bus.objects.get(id=bus_id, operator=request.user)
+        except Bus.DoesNotExist:
+            return Response(
+                {'error': 'Bus not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = ValidationLogSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        result = ManifestService.ingest_validation_log(
+            bus,
+            serializer.validated_data['scans'],
+            uploaded_by=request.user.name
+        )
+        return Response(result)
+
+
+class OperatorBusBroadcastView(APIView, OperatorPermission):
+    """Push a message (delay, platform change, ...) to all passengers of a bus"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, bus_id):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        if not Bus.objects.filter(id=bus_id, operator=request.user).exists():
+            return Response(
+                {'error': 'Bus not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = BroadcastSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        result = NotificationService().broadcast_to_buses(
+            [bus_id],
+            title=serializer.validated_data['title'],
+            body=serializer.validated_data['body'],
+            kind=serializer.validated_data['kind']
+        )
+        return Response(result)
+
+
+class OperatorBulkTripMixin(OperatorPermission):
+    """Shared checks for operations on many of the operator's trips"""
+    
+    def check_ownership(self, request, bus_ids):
+        """404 response naming the buses the operator does not own, or None"""
+        bus_ids = set(bus_ids)
+        owned_ids = set(Bus.objects.filter(
+            id__in=bus_ids,
+            operator=request.user
+        ).values_list('id', flat=True))
+        if owned_ids != bus_ids:
+            return Response(
+                {'error': 'Bus not found', 'bus_ids': [str(bus_id) for bus_id in bus_ids - owned_ids]},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return None
+
+
+class OperatorFleetBroadcastView(APIView, OperatorBulkTripMixin):
+    """Push one message to the passengers of several buses"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = FleetBroadcastSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        bus_ids = serializer.validated_data['bus_ids']
+        error = self.check_ownership(request, bus_ids)
+        if error:
+            return error
+        
+        result = NotificationService().broadcast_to_buses(
+            bus_ids,
+            title=serializer.validated_data['title'],
+            body=serializer.validated_data['body'],
+            kind=serializer.validated_data['kind']
+        )
+        return Response(result)
+
+
+class OperatorTripCancelView(APIView, OperatorPermission):
+    """Cancel a whole trip: all bookings are cancelled and paid ones refunded"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, bus_id):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        bus = Bus.objects.filter(id=bus_id, operator=request.user).first()
+        if bus is None:
+            return Response(
+                {'error': 'Bus not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = TripCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            result = BookingService.cancel_trip(bus, reason=serializer.validated_data['reason'])
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'message': 'Trip cancelled',
+            **result
+        })
+
+
+class OperatorBulkTripCancelView(APIView, OperatorBulkTripMixin):
+    """Cancel many trips at once (e.g. a weather-affected corridor)"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = TripBulkCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        bus_ids = serializer.validated_data['bus_ids']
+        error = self.check_ownership(request, bus_ids)
+        if error:
+            return error
+        
+        result = BookingService.cancel_trips(bus_ids, reason=serializer.validated_data['reason'])
+        return Response({
+            'message': f"{result['buses']} trips cancelled",
+            **result
+        })
+
+
+class OperatorTripRescheduleView(APIView, OperatorBulkTripMixin):
+    """Move many trips by the same offset"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = TripRescheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        bus_ids = serializer.validated_data['bus_ids']
+        error = self.check_ownership(request, bus_ids)
+        if error:
+            return error
+        
+        result = BookingService.reschedule_trips(
+            bus_ids,
+            timedelta(minutes=serializer.validated_data['shift_minutes']),
+            reason=serializer.validated_data['reason']
+        )
+        return Response({
+            'message': f"{result['buses']} trips rescheduled",
+            **result
+        })
+
+
+class OperatorSeatTransferView(APIView, OperatorPermission):
+    """Move all confirmed bookings of a bus to a replacement bus (vehicle swap)"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, bus_id):
+        if not self.check_operator(request):
+            return Response(
+                {'error': 'Operator access required'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = SeatTransferSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        buses = {
+            bus.id: bus for bus in Bus.objects.filter(
+                id__in=[bus_id, serializer.validated_data['target_bus_id']],
+                operator=request.user
+            )
+        }
+        source = buses.get(bus_id)
+        target = buses.get(serializer.validated_data['target_bus_id'])
+        if source is None or target is None:
+            return Response(
+                {'error': 'Bus not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            result = SeatTransferService.transfer_trip(
+                source,
+                target,
+                strategy=serializer.validated_data['strategy']
+            )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'message': f"{result['bookings_moved']} bookings moved to {target.bus_number}",
+            **result
+        })
@@ -2,7 +2,7 @@
 Admin configuration for Payments app
 """
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, PaymentWebhookEvent, Refund
 
 
 @admin.register(Payment)
@@ -12,3 +12,21 @@ class PaymentAdmin(admin.ModelAdmin):
     search_fields = ['razorpay_order_id', 'razorpay_payment_id', 'booking__id']
     ordering = ['-created_at']
     readonly_fields = ['id', 'created_at', 'updated_at']
+
+
+@admin.register(PaymentWebhookEvent)
+class PaymentWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'event', 'status', 'received_at', 'processed_at']
+    list_filter = ['status', 'event', 'received_at']
+    search_fields = ['event_id']
+    ordering = ['-received_at']
+    readonly_fields = ['id', 'received_at', 'processed_at']
+
+
+@admin.register(Refund)
+class RefundAdmin(admin.ModelAdmin):
+    list_display = ['id', 'payment', 'amount', 'reason', 'status', 'attempts', 'created_at', 'processed_at']
+    list_filter = ['status', 'reason', 'created_at']
+    search_fields = ['idempotency_key', 'razorpay_refund_id', 'payment__razorpay_payment_id']
+    ordering = ['-created_at']
+    readonly_fields = ['id', 'idempotency_key', 'created_at', 'processed_at']
@@ -0,0 +1,225 @@
+"""
+Process-wide Razorpay gateway client.
+
+One razorpay.Client per worker process, sharing a keep-alive connection
+pool, so requests no longer pay for a fresh TLS handshake. Every call
+has a connect/read timeout, idempotent reads are retried on connection
+errors and 502/503/504, and a circuit breaker fails fast while the
+gateway is down. Call latencies are recorded in the gobus.metrics
+histograms as razorpay.<operation>.seconds.
+"""
+import threading
+import time
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from gobus import metrics
+
+_lock = threading.Lock()
+_gateway = None
+
+
+class GatewayUnavailable(ValueError):
+    """Raised when the payment gateway is failing or its circuit is open"""
+
+
+class GatewayRateLimited(GatewayUnavailable):
+    """Raised when the gateway answers 429; retry_after is in seconds"""
+    
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__("Payment gateway rate limit reached")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Open after consecutive failures, then let a single trial call through
+    once the reset timeout has passed (half-open). The trial's outcome
+    closes or re-opens the circuit.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Whether a call may go through now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.increment('razorpay.circuit_opened')
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class GatewaySession(requests.Session):
+    """
+    requests.Session that applies a default timeout to every request and
+    turns 429 responses into GatewayRateLimited (the razorpay client would
+    otherwise report them as bad requests)
+    """
+    
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+    
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        response = super().request(method, url, **kwargs)
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get('Retry-After', 1))
+            except ValueError:
+                retry_after = 1.0
+            raise GatewayRateLimited(retry_after)
+        return response
+
+
+def build_session() -> GatewaySession:
+    """Pooled HTTP session configured from settings"""
+    session = GatewaySession((
+        getattr(settings, 'RAZORPAY_CONNECT_TIMEOUT', 3.05),
+        getattr(settings, 'RAZORPAY_READ_TIMEOUT', 10.0)
+    ))
+    retries = Retry(
+        total=getattr(settings, 'RAZORPAY_MAX_RETRIES', 2),
+        connect=getattr(settings, 'RAZORPAY_MAX_RETRIES', 2),
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'GET'}),  # order creation is not idempotent
+        raise_on_status=False
+    )
+    pool_size = getattr(settings, 'RAZORPAY_POOL_SIZE', 10)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class RazorpayGateway:
+    """Thread-safe wrapper around a pooled razorpay.Client"""
+    
+    def __init__(self, key_id: str = None, key_secret: str = None, base_url: str = None):
+        import razorpay
+        
+        options = {}
+        base_url = base_url if base_url is not None else getattr(settings, 'RAZORPAY_BASE_URL', '')
+        if base_url:
+            options['base_url'] = base_url
+        
+        self.session = build_session()
+        self.client = razorpay.Client(
+            session=self.session,
+            auth=(
+                key_id if key_id is not None else getattr(settings, 'RAZORPAY_KEY_ID', ''),
+                key_secret if key_secret is not None else getattr(settings, 'RAZORPAY_KEY_SECRET', '')
+            ),
+            **options
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=getattr(settings, 'RAZORPAY_BREAKER_THRESHOLD', 5),
+            reset_timeout=getattr(settings, 'RAZORPAY_BREAKER_RESET_SECONDS', 30)
+        )
+    
+    def call(self, operation: str, func, *args, **kwargs):
+        """Run one gateway call through the circuit breaker and latency histogram"""
+        from razorpay.errors import BadRequestError, GatewayError, ServerError
+        
+        if not self.breaker.allow():
+            metrics.increment('razorpay.short_circuited')
+            raise GatewayUnavailable("Payment gateway is temporarily unavailable")
+        
+        start = time.perf_counter()
+        answered = False
+        try:
+            result = func(*args, **kwargs)
+            answered = True
+        except GatewayRateLimited:
+            # The gateway is up, just throttling us; callers back off
+            answered = True
+            metrics.increment('razorpay.rate_limited')
+            raise
+        except BadRequestError as e:
+            # The gateway answered; the request itself was wrong
+            answered = True
+            raise ValueError(str(e) or "Payment gateway rejected the request")
+        except (requests.RequestException, GatewayError, ServerError) as e:
+            metrics.increment('razorpay.errors')
+            raise GatewayUnavailable("Payment gateway is temporarily unavailable") from e
+        finally:
+            metrics.observe(f'razorpay.{operation}.seconds', time.perf_counter() - start)
+            # Every call settles the breaker, so a half-open trial always ends
+            if answered:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+        
+        return result
+    
+    def create_order(self, data: dict) -> dict:
+        return self.call('create_order', self.client.order.create, data=data)
+    
+    def fetch_payment(self, payment_id: str) -> dict:
+        return self.call('fetch_payment', self.client.payment.fetch, payment_id)
+    
+    def list_payments(self, params: dict) -> dict:
+        return self.call('list_payments', self.client.payment.all, data=params)
+    
+    def refund_payment(self, payment_id: str, amount: int, receipt: str, notes: dict = None) -> dict:
+        """Refund `amount` paise of a captured payment; receipt carries our idempotency key"""
+        return self.call('refund_payment', self.client.payment.refund, payment_id, {
+            'amount': amount,
+            'speed': 'normal',
+            'receipt': receipt,
+            'notes': notes or {}
+        })
+    
+    def find_refund(self, payment_id: str, receipt: str):
+        """An existing refund of the payment with the given receipt, if any"""
+        page = self.call('list_refunds', self.client.payment.fetch_multiple_refund, payment_id, {'count': 100})
+        return next((refund for refund in page.get('items', []) if refund.get('receipt') == receipt), None)
+    
+    def close(self):
+        self.session.close()
+
+
+def get_gateway() -> RazorpayGateway:
+    """The process-wide gateway client, created on first use"""
+    global _gateway
+    with _lock:
+        if _gateway is None:
+            _gateway = RazorpayGateway()
+        return _gateway
+
+
+def set_gateway(gateway):
+    """Replace the process-wide gateway (e.g. to point at a local stand-in)"""
+    global _gateway
+    with _lock:
+        if _gateway is not None and _gateway is not gateway:
+            _gateway.close()
+        _gateway = gateway
@@ -0,0 +1,219 @@
+"""
+Local HTTP stand-in for the Razorpay orders and payments API.
+
+Serves just enough of /v1/orders and /v1/payments to exercise the pooled
+gateway client without network access: keep-alive HTTP/1.1, optional
+artificial latency, injected 503s for circuit breaker checks and 429s
+for rate limit handling. Refunds are deduplicated by receipt. Point
+the gateway at it with RAZORPAY_BASE_URL=http://127.0.0.1:<port>.
+"""
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _send(self, status_code: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def _read_json(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+    
+    def _handle(self, method: str):
+        stub = self.server.stub
+        stub.record_request(self.client_address)
+        body = self._read_json() if method == 'POST' else {}
+        
+        if stub.latency:
+            threading.Event().wait(stub.latency)
+        if stub.take_failure():
+            return self._send(503, {'error': {'code': 'SERVER_ERROR', 'description': 'Service unavailable'}})
+        retry_after = stub.take_rate_limit()
+        if retry_after is not None:
+            self.send_response(429)
+            self.send_header('Retry-After', str(retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        if parts[:1] != ['v1'] or len(parts) < 2:
+            return self._send(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+        
+        resource, object_id = parts[1], (parts[2] if len(parts) > 2 else None)
+        if resource == 'orders' and method == 'POST' and object_id is None:
+            return self._send(200, stub.create_order(body))
+        if resource == 'payments' and object_id is not None and len(parts) == 4:
+            if object_id not in stub.payments:
+                return self._send(400, {'error': {
+                    'code': 'BAD_REQUEST_ERROR',
+                    'description': 'The id provided does not exist'
+                }})
+            if parts[3] == 'refund' and method == 'POST':
+                return self._send(200, stub.create_refund(object_id, body))
+            if parts[3] == 'refunds' and method == 'GET':
+                items = stub.refunds_of(object_id)
+                return self._send(200, {'entity': 'collection', 'count': len(items), 'items': items})
+        if resource == 'payments' and method == 'GET' and len(parts) <= 3:
+            if object_id is None:
+                query = parse_qs(url.query)
+                count = int(query.get('count', ['10'])[0])
+                skip = int(query.get('skip', ['0'])[0])
+                items = stub.payments_page(count, skip)
+                return self._send(200, {'entity': 'collection', 'count': len(items), 'items': items})
+            payment = stub.payments.get(object_id)
+            if payment is None:
+                return self._send(400, {'error': {
+                    'code': 'BAD_REQUEST_ERROR',
+                    'description': 'The id provided does not exist'
+                }})
+            return self._send(200, payment)
+        
+        return self._send(400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Unsupported request'}})
+    
+    def do_GET(self):
+        self._handle('GET')
+    
+    def do_POST(self):
+        self._handle('POST')
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here
+        pass
+
+
+class GatewayStub:
+    """In-memory Razorpay stand-in running on a background thread"""
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.orders = {}
+        self.payments = {}
+        self.refunds = {}
+        self.requests = 0
+        self.connections = set()
+        self._failures = 0
+        self._rate_limited = 0
+        self._retry_after = 1
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self._thread = None
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> 'GatewayStub':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def serve_forever(self):
+        self._server.serve_forever()
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def fail_next(self, count: int = 1):
+        """Answer the next `count` requests with 503"""
+        with self._lock:
+            self._failures += count
+    
+    def take_failure(self) -> bool:
+        with self._lock:
+            if self._failures:
+                self._failures -= 1
+                return True
+            return False
+    
+    def rate_limit_next(self, count: int = 1, retry_after: int = 1):
+        """Answer the next `count` requests with 429"""
+        with self._lock:
+            self._rate_limited += count
+            self._retry_after = retry_after
+    
+    def take_rate_limit(self):
+        with self._lock:
+            if self._rate_limited:
+                self._rate_limited -= 1
+                return self._retry_after
+            return None
+    
+    def record_request(self, client_address):
+        with self._lock:
+            self.requests += 1
+            self.connections.add(client_address)
+    
+    def create_order(self, data: dict) -> dict:
+        order = {
+            'id': f"order_{uuid.uuid4().hex[:14]}",
+            'entity': 'order',
+            'amount': data.get('amount'),
+            'currency': data.get('currency', 'INR'),
+            'receipt': data.get('receipt'),
+            'notes': data.get('notes', {}),
+            'status': 'created',
+        }
+        with self._lock:
+            self.orders[order['id']] = order
+        return order
+    
+    def add_payment(self, order_id: str, amount: int, status: str = 'captured', method: str = 'upi') -> dict:
+        payment = {
+            'id': f"pay_{uuid.uuid4().hex[:14]}",
+            'entity': 'payment',
+            'order_id': order_id,
+            'amount': amount,
+            'currency': 'INR',
+            'status': status,
+            'method': method,
+        }
+        with self._lock:
+            self.payments[payment['id']] = payment
+        return payment
+    
+    def create_refund(self, payment_id: str, data: dict) -> dict:
+        with self._lock:
+            for refund in self.refunds.values():
+                if refund['payment_id'] == payment_id and refund['receipt'] == data.get('receipt'):
+                    return refund
+            refund = {
+                'id': f"rfnd_{uuid.uuid4().hex[:14]}",
+                'entity': 'refund',
+                'payment_id': payment_id,
+                'amount': data.get('amount'),
+                'receipt': data.get('receipt'),
+                'notes': data.get('notes', {}),
+                'status': 'processed',
+            }
+            self.refunds[refund['id']] = refund
+            return refund
+    
+    def refunds_of(self, payment_id: str) -> list:
+        with self._lock:
+            return [refund for refund in self.refunds.values() if refund['payment_id'] == payment_id]
+    
+    def payments_page(self, count: int, skip: int) -> list:
+        with self._lock:
+            return list(self.payments.values())[skip:skip + count]
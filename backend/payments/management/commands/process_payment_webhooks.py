@@ -0,0 +1,26 @@
+"""
+Worker for the payment webhook inbox
+"""
+import time
+from django.core.management.base import BaseCommand
+from payments.webhooks import WebhookService
+
+
+class Command(BaseCommand):
+    help = 'Apply received payment webhooks in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the inbox')
+        parser.add_argument('--interval', type=float, default=1.0, help='Poll interval in seconds')
+    
+    def handle(self, *args, **options):
+        while True:
+            counts = WebhookService.process_pending(options['batch_size'])
+            if counts:
+                summary = ', '.join(f"{count} {outcome}" for outcome, count in sorted(counts.items()))
+                self.stdout.write(f"Applied {sum(counts.values())} webhook events ({summary})")
+            elif not options['loop']:
+                break
+            if not counts:
+                time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+"""
+Worker for the refund queue
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from payments.refunds import RateLimiter, RefundService
+
+
+class Command(BaseCommand):
+    help = 'Send queued refunds to the payment gateway'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the refund queue')
+        parser.add_argument('--interval', type=float, default=5.0, help='Poll interval in seconds')
+    
+    def handle(self, *args, **options):
+        # One limiter across batches so the rate holds between them too
+        limiter = RateLimiter(getattr(settings, 'REFUND_RATE_PER_SECOND', 10))
+        while True:
+            counts = RefundService.process_batch(options['batch_size'], limiter=limiter)
+            if counts:
+                summary = ', '.join(f"{count} {outcome}" for outcome, count in sorted(counts.items()))
+                self.stdout.write(f"Processed {sum(counts.values())} refunds ({summary})")
+            if not options['loop']:
+                if not counts:
+                    break
+                continue
+            if not counts:
+                time.sleep(options['interval'])
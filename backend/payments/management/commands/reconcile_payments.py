@@ -0,0 +1,64 @@
+"""
+Reconcile gateway settlements against local payments
+"""
+import csv
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from payments.reconciliation import (
+    DISCREPANCY_FIELDS,
+    FakeGatewayClient,
+    ReconciliationService,
+    iter_api,
+    iter_csv
+)
+
+
+class Command(BaseCommand):
+    help = 'Join a settlement export against payments, report discrepancies and repair safe cases'
+    
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--csv', help='Settlement CSV export')
+        source.add_argument('--fake-api', help='JSON-lines file served through the local fake gateway API')
+        source.add_argument('--api', action='store_true', help='Page through the Razorpay payments API')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Settlement rows per hash join')
+        parser.add_argument('--output', help='Discrepancy CSV (defaults to stdout)')
+        parser.add_argument('--dry-run', action='store_true', help='Report only, do not repair')
+        parser.add_argument('--stale-hours', type=int, default=None,
+                            help='Also report payments pending longer than this')
+    
+    def handle(self, *args, **options):
+        if options['csv']:
+            records = iter_csv(options['csv'])
+        elif options['fake_api']:
+            records = iter_api(FakeGatewayClient(options['fake_api']).payment.all, options['page_size'])
+        else:
+            from django.conf import settings
+            from payments.gateway import get_gateway
+            
+            if getattr(settings, 'RAZORPAY_MOCK_MODE', True):
+                raise CommandError("--api needs RAZORPAY_MOCK_MODE=False; use --fake-api locally")
+            records = iter_api(get_gateway().list_payments, options['page_size'])
+        
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            writer = csv.DictWriter(output, fieldnames=DISCREPANCY_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            
+            counts = ReconciliationService.reconcile(
+                records,
+                emit=writer.writerow,
+                chunk_size=options['chunk_size'],
+                repair=not options['dry_run']
+            )
+            if options['stale_hours'] is not None:
+                for discrepancy in ReconciliationService.stale_pending(options['stale_hours']):
+                    counts['stale_pending'] = counts.get('stale_pending', 0) + 1
+                    writer.writerow(discrepancy)
+        finally:
+            if options['output']:
+                output.close()
+        
+        summary = ', '.join(f"{kind}={count}" for kind, count in sorted(counts.items()))
+        self.stderr.write(f"Reconciliation finished: {summary}")
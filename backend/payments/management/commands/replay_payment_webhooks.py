@@ -0,0 +1,52 @@
+"""
+Replay recorded Razorpay webhook fixtures against the local webhook endpoint
+"""
+import json
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from payments.webhooks import WebhookService, sign_payload
+
+
+class Command(BaseCommand):
+    help = 'Sign and POST recorded webhook events to /api/payments/webhook/, then optionally process them'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('fixture', help='JSON file with a list of webhook events')
+        parser.add_argument('--order-id', help='Replace the order ID in every event (to target a local payment)')
+        parser.add_argument('--fresh-ids', action='store_true',
+                            help='Send new event IDs instead of the recorded ones')
+        parser.add_argument('--process', action='store_true', help='Apply the events right away')
+    
+    def handle(self, *args, **options):
+        try:
+            with open(options['fixture']) as f:
+                events = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read fixture: {e}")
+        
+        client = Client(SERVER_NAME='localhost')
+        url = reverse('payment_webhook')
+        for recorded in events:
+            payload = recorded['body']
+            if options['order_id']:
+                payload['payload']['payment']['entity']['order_id'] = options['order_id']
+            body = json.dumps(payload).encode()
+            event_id = uuid.uuid4().hex if options['fresh_ids'] else recorded['event_id']
+            
+            response = client.post(
+                url,
+                data=body,
+                content_type='application/json',
+                HTTP_X_RAZORPAY_SIGNATURE=sign_payload(body),
+                HTTP_X_RAZORPAY_EVENT_ID=event_id
+            )
+            self.stdout.write(f"{payload['event']} {event_id}: {response.status_code} {response.json()}")
+        
+        if options['process']:
+            while True:
+                counts = WebhookService.process_pending()
+                if not counts:
+                    break
+                self.stdout.write(f"Applied: {counts}")
@@ -0,0 +1,24 @@
+"""
+Serve the local Razorpay stand-in for development and load checks
+"""
+from django.core.management.base import BaseCommand
+from payments.gateway_stub import GatewayStub
+
+
+class Command(BaseCommand):
+    help = 'Run a local HTTP stand-in for the Razorpay orders/payments API'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8787)
+        parser.add_argument('--latency', type=float, default=0.0, help='Artificial delay per request in seconds')
+    
+    def handle(self, *args, **options):
+        stub = GatewayStub(options['host'], options['port'], latency=options['latency'])
+        self.stdout.write(f"Gateway stand-in listening; set RAZORPAY_BASE_URL={stub.base_url}")
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.stop()
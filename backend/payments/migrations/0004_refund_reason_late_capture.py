@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_refunds'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='refund',
+            name='reason',
+            field=models.CharField(choices=[('booking_cancelled', 'Booking cancelled'), ('trip_cancelled', 'Trip cancelled'), ('late_capture', 'Paid after booking lapsed')], max_length=30),
+        ),
+    ]
@@ -3,6 +3,7 @@ Payment model for GoBus
 """
 import uuid
 from django.db import models
+from django.utils import timezone
 from bookings.models import Booking
 
 
@@ -65,3 +66,91 @@ class Payment(models.Model):
         self.status = PaymentStatus.FAILED
         self.error_message = error_message
         self.save(update_fields=['status', 'error_message', 'updated_at'])
+
+
+class WebhookEventStatus(models.TextChoices):
+    RECEIVED = 'received', 'Received'
+    PROCESSED = 'processed', 'Processed'
+    IGNORED = 'ignored', 'Ignored'
+    FAILED = 'failed', 'Failed'
+
+
+class PaymentWebhookEvent(models.Model):
+    """Raw payment gateway webhook, stored on receipt and applied by a worker"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    event_id = models.CharField(max_length=255, unique=True)
+    event = models.CharField(max_length=100)
+    payload = models.JSONField()
+    
+    status = models.CharField(
+        max_length=20,
+        choices=WebhookEventStatus.choices,
+        default=WebhookEventStatus.RECEIVED
+    )
+    error_message = models.TextField(blank=True, null=True)
+    
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'payment_webhook_events'
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event} {self.event_id} ({self.status})"
+
+
+class RefundStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    PROCESSED = 'processed', 'Processed'
+    FAILED = 'failed', 'Failed'
+
+
+class RefundReason(models.TextChoices):
+    BOOKING_CANCELLED = 'booking_cancelled', 'Booking cancelled'
+    TRIP_CANCELLED = 'trip_cancelled', 'Trip cancelled'
+    LATE_CAPTURE = 'late_capture', 'Paid after booking lapsed'
+
+
+class Refund(models.Model):
+    """Queued refund of a completed payment, sent to the gateway by the refund worker"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name='refund'
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    reason = models.CharField(max_length=30, choices=RefundReason.choices)
+    
+    # Sent to the gateway as the refund receipt, so a retried call can be matched
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    razorpay_refund_id = models.CharField(max_length=255, blank=True, null=True)
+    
+    # Processing
+    status = models.CharField(
+        max_length=20,
+        choices=RefundStatus.choices,
+        default=RefundStatus.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'refunds'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"Refund {self.id} - {self.amount} - {self.status}"
@@ -0,0 +1,283 @@
+"""
+Reconciliation of gateway settlements against Payment rows.
+
+Settlement records are streamed from a source (a CSV export, the Razorpay
+payments API or a local fake of it) and joined against `payments` a chunk
+at a time: each chunk becomes an in-memory hash table keyed by order ID,
+probed with one query. Memory therefore stays bounded by the chunk size
+no matter how long the export is.
+
+An order can have several payment attempts, typically failed ones before
+the capture. Within a chunk the captured or refunded attempt wins; across
+chunks, failure records are only held against the local payment when they
+are for the attempt it recorded (razorpay_payment_id), and a capture seen
+later still completes a payment an earlier chunk marked failed.
+
+Safe cases are repaired in place (captured payments still pending, failed
+payments still pending, refunds not recorded); anything else is only
+reported.
+"""
+import csv
+import json
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+from bookings.models import BookingStatus
+from bookings.services import BookingService
+from .models import Payment, PaymentStatus, RefundReason
+from .refunds import RefundService
+
+# Which attempt of an order counts when a chunk has several (anything else ranks 0)
+ATTEMPT_PRIORITY = {'captured': 1, 'refunded': 2}
+
+DISCREPANCY_FIELDS = ['kind', 'order_id', 'payment_id', 'gateway_status', 'gateway_amount',
+                      'local_status', 'local_amount', 'repaired', 'detail']
+
+
+def iter_csv(path):
+    """Settlement records from a CSV export (order_id, payment_id, amount in paise, status, method)"""
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield {
+                'order_id': row['order_id'],
+                'payment_id': row.get('payment_id') or None,
+                'amount': int(row['amount']),
+                'status': row['status'],
+                'method': row.get('method') or None,
+            }
+
+
+def iter_api(list_payments, page_size: int = 100):
+    """Settlement records paged from a Razorpay-style payments API (e.g. RazorpayGateway.list_payments)"""
+    skip = 0
+    while True:
+        page = list_payments({'count': page_size, 'skip': skip})
+        items = page.get('items', [])
+        for item in items:
+            yield {
+                'order_id': item.get('order_id'),
+                'payment_id': item.get('id'),
+                'amount': int(item['amount']),
+                'status': item['status'],
+                'method': item.get('method'),
+            }
+        if len(items) < page_size:
+            return
+        skip += page_size
+
+
+class FakeGatewayClient:
+    """
+    Local stand-in for the Razorpay client's payments API, serving records
+    from a JSON-lines file one page at a time. Sequential pages continue
+    from the current file position instead of re-reading from the start.
+    """
+    
+    def __init__(self, path):
+        self.payment = self
+        self.path = path
+        self._file = None
+        self._line = 0
+    
+    def all(self, params):
+        skip, count = params.get('skip', 0), params.get('count', 100)
+        if self._file is None or skip != self._line:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.path)
+            self._line = 0
+            while self._line < skip and self._file.readline():
+                self._line += 1
+        
+        items = []
+        while len(items) < count:
+            line = self._file.readline()
+            if not line:
+                break
+            items.append(json.loads(line))
+            self._line += 1
+        return {'entity': 'collection', 'count': len(items), 'items': items}
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ReconciliationService:
+    """Service for reconciling gateway settlements with local payments"""
+    
+    @staticmethod
+    def reconcile(records, emit, chunk_size: int = 5000, repair: bool = True) -> dict:
+        """
+        Join settlement records against payments chunk by chunk.
+        emit(discrepancy) is called for every mismatch; returns counts per kind.
+        """
+        counts = {'records': 0}
+        for chunk in _chunks(records, chunk_size):
+            counts['records'] += len(chunk)
+            for discrepancy in ReconciliationService._reconcile_chunk(chunk, repair):
+                counts[discrepancy['kind']] = counts.get(discrepancy['kind'], 0) + 1
+                emit(discrepancy)
+        return counts
+    
+    @staticmethod
+    def stale_pending(older_than_hours: int):
+        """Payments still pending after the cutoff (streamed, not held in memory)"""
+        cutoff = timezone.now() - timezone.timedelta(hours=older_than_hours)
+        for order_id, status, amount in Payment.objects.filter(
+            status=PaymentStatus.PENDING,
+            created_at__lt=cutoff
+        ).order_by().values_list('razorpay_order_id', 'status', 'amount').iterator(chunk_size=2000):
+            yield {
+                'kind': 'stale_pending',
+                'order_id': order_id,
+                'local_status': status,
+                'local_amount': amount,
+                'repaired': False,
+                'detail': f'Pending for more than {older_than_hours}h with no settlement'
+            }
+    
+    @staticmethod
+    def _reconcile_chunk(chunk, repair: bool) -> list:
+        # Build side: one settlement record per order, captured/refunded attempts first
+        settlements = {}
+        for record in chunk:
+            current = settlements.get(record['order_id'])
+            if record['order_id'] and (
+                current is None
+                or ATTEMPT_PRIORITY.get(record['status'], 0) > ATTEMPT_PRIORITY.get(current['status'], 0)
+            ):
+                settlements[record['order_id']] = record
+        
+        # Probe side: one query for the chunk
+        payments = {
+            payment.razorpay_order_id: payment
+            for payment in Payment.objects.filter(
+                razorpay_order_id__in=list(settlements)
+            ).select_related('booking').only(
+                'id', 'razorpay_order_id', 'razorpay_payment_id', 'amount', 'status',
+                'booking__id', 'booking__status'
+            )
+        }
+        
+        discrepancies = []
+        to_complete = {}
+        late_captures = {}
+        to_fail = []
+        to_refund = []
+        
+        def report(kind, record, payment=None, detail='', repaired=False):
+            discrepancies.append({
+                'kind': kind,
+                'order_id': record['order_id'],
+                'payment_id': record['payment_id'],
+                'gateway_status': record['status'],
+                'gateway_amount': Decimal(record['amount']) / 100,
+                'local_status': payment.status if payment else None,
+                'local_amount': payment.amount if payment else None,
+                'repaired': repaired,
+                'detail': detail
+            })
+        
+        for order_id, record in settlements.items():
+            payment = payments.get(order_id)
+            if payment is None:
+                report('unknown_order', record, detail='No local payment for this order')
+                continue
+            
+            if int(payment.amount * 100) != record['amount']:
+                report('amount_mismatch', record, payment, detail='Gateway and local amounts differ')
+                continue
+            
+            gateway_status = record['status']
+            # Other attempts of the order (e.g. failed ones before the capture) say
+            # nothing about the attempt the local payment recorded
+            same_attempt = payment.razorpay_payment_id in (None, record['payment_id'])
+            if gateway_status == 'captured':
+                if payment.status in (PaymentStatus.PENDING, PaymentStatus.FAILED):
+                    if payment.booking.status in (BookingStatus.PENDING, BookingStatus.CONFIRMED):
+                        to_complete[payment.id] = (payment, record)
+                        report('captured_not_recorded', record, payment, repaired=repair)
+                    else:
+                        late_captures[payment.id] = (payment, record)
+                        report('captured_for_cancelled_booking', record, payment, repaired=repair,
+                               detail=f"Booking is {payment.booking.status}; "
+                                      f"{'refund queued' if repair else 'refund needed'}")
+            elif gateway_status == 'failed':
+                if payment.status == PaymentStatus.PENDING:
+                    to_fail.append(payment.id)
+                    report('failed_not_recorded', record, payment, repaired=repair)
+                elif payment.status == PaymentStatus.COMPLETED and same_attempt:
+                    report('completed_but_failed_at_gateway', record, payment,
+                           detail='Local payment completed but gateway reports failure')
+            elif gateway_status == 'refunded':
+                if payment.status == PaymentStatus.COMPLETED and same_attempt:
+                    to_refund.append(payment.id)
+                    report('refund_not_recorded', record, payment, repaired=repair)
+        
+        if repair and (to_complete or late_captures or to_fail or to_refund):
+            ReconciliationService._repair(to_complete, to_fail, to_refund, late_captures)
+        
+        return discrepancies
+    
+    @staticmethod
+    def _repair(to_complete, to_fail, to_refund, late_captures=None):
+        """
+        Apply the safe repairs of one chunk with set-based updates. Captures
+        for bookings that are no longer open are recorded and refunded.
+        """
+        now = timezone.now()
+        late_captures = late_captures or {}
+        captured = {**to_complete, **late_captures}
+        with transaction.atomic():
+            if captured:
+                # Payments verified or refunded since the probe are left alone
+                Payment.objects.filter(
+                    id__in=list(captured),
+                    status__in=[PaymentStatus.PENDING, PaymentStatus.FAILED]
+                ).update(
+                    status=PaymentStatus.COMPLETED,
+                    razorpay_payment_id=Case(
+                        *[
+                            When(id=payment_id, then=Value(record['payment_id']))
+                            for payment_id, (_, record) in captured.items()
+                        ],
+                        output_field=CharField()
+                    ),
+                    error_message=None,
+                    updated_at=now
+                )
+            if late_captures:
+                RefundService.enqueue_for_bookings(
+                    [payment.booking_id for payment, _ in late_captures.values()],
+                    RefundReason.LATE_CAPTURE
+                )
+            if to_complete:
+                pending = [
+                    payment.booking_id for payment, _ in to_complete.values()
+                    if payment.booking.status == BookingStatus.PENDING
+                ]
+                confirmed = {booking.id for booking in BookingService.confirm_bookings(pending)}
+                # Holds that lapsed before the capture was recorded are refunded
+                lapsed = [booking_id for booking_id in pending if booking_id not in confirmed]
+                if lapsed:
+                    RefundService.enqueue_for_bookings(lapsed, RefundReason.LATE_CAPTURE)
+            if to_fail:
+                Payment.objects.filter(id__in=to_fail, status=PaymentStatus.PENDING).update(
+                    status=PaymentStatus.FAILED,
+                    error_message='Failed at gateway (reconciliation)',
+                    updated_at=now
+                )
+            if to_refund:
+                Payment.objects.filter(id__in=to_refund, status=PaymentStatus.COMPLETED).update(
+                    status=PaymentStatus.REFUNDED,
+                    updated_at=now
+                )
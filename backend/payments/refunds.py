@@ -0,0 +1,192 @@
+"""
+Refund queue.
+
+Cancelling a confirmed booking (or a whole trip) inserts Refund rows in
+the same transaction, one per completed payment. The refund worker
+(manage.py process_refunds) claims due rows in batches and calls the
+gateway from a small thread pool, paced by a shared rate limiter that
+also backs off when the gateway answers 429. Each refund carries an
+idempotency key, sent as the gateway receipt; a retried refund first
+looks for an existing gateway refund with that receipt so a timed-out
+call is never refunded twice.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .gateway import GatewayRateLimited, GatewayUnavailable, get_gateway
+from .models import Payment, PaymentStatus, Refund, RefundStatus
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RateLimiter:
+    """Spaces calls evenly across threads; pause() holds everyone back after a 429"""
+    
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+    
+    def pause(self, seconds: float):
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+class RefundService:
+    """Service for queueing and processing refunds"""
+    
+    @staticmethod
+    def enqueue_for_bookings(booking_ids, reason: str) -> int:
+        """
+        Queue a full refund for every completed payment of the given bookings
+        with one insert (call inside the cancelling transaction). Payments
+        that already have a refund are skipped. Returns the number queued.
+        """
+        payments = list(
+            Payment.objects.filter(
+                booking_id__in=list(booking_ids),
+                status=PaymentStatus.COMPLETED,
+                refund__isnull=True
+            ).values_list('id', 'amount')
+        )
+        Refund.objects.bulk_create([
+            Refund(
+                payment_id=payment_id,
+                amount=amount,
+                reason=reason,
+                idempotency_key=f"refund_{payment_id.hex}"
+            )
+            for payment_id, amount in payments
+        ], ignore_conflicts=True)
+        return len(payments)
+    
+    @staticmethod
+    def claim_batch(limit: int = None) -> list:
+        """Claim due refunds under a lease, like OutboxService.claim_batch"""
+        limit = limit or _setting('REFUND_BATCH_SIZE', 100)
+        now = timezone.now()
+        lease_until = now + timezone.timedelta(seconds=_setting('REFUND_LEASE_SECONDS', 120))
+        
+        with transaction.atomic():
+            rows = list(
+                Refund.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('payment', 'payment__booking', 'payment__booking__bus', 'payment__booking__user')
+                .filter(status=RefundStatus.PENDING, next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:limit]
+            )
+            for row in rows:
+                row.attempts += 1
+                row.next_attempt_at = lease_until
+            Refund.objects.bulk_update(rows, ['attempts', 'next_attempt_at'])
+        return rows
+    
+    @staticmethod
+    def process_batch(limit: int = None, limiter: RateLimiter = None) -> dict:
+        """Claim one batch, send it to the gateway and record outcomes; returns counts per outcome"""
+        from notifications.outbox import OutboxService
+        from notifications.services import NotificationService
+        
+        rows = RefundService.claim_batch(limit)
+        if not rows:
+            return {}
+        
+        if _setting('RAZORPAY_MOCK_MODE', True):
+            results = [({'id': f"rfnd_mock_{uuid.uuid4().hex[:14]}"}, None) for _ in rows]
+        else:
+            gateway = get_gateway()
+            limiter = limiter or RateLimiter(_setting('REFUND_RATE_PER_SECOND', 10))
+            
+            def send(row):
+                payment_id = row.payment.razorpay_payment_id
+                try:
+                    if row.attempts > 1:
+                        # An earlier attempt may have reached the gateway before failing
+                        limiter.acquire()
+                        existing = gateway.find_refund(payment_id, row.idempotency_key)
+                        if existing:
+                            return existing, None
+                    limiter.acquire()
+                    return gateway.refund_payment(
+                        payment_id,
+                        int(row.amount * 100),
+                        receipt=row.idempotency_key,
+                        notes={'booking_id': str(row.payment.booking_id), 'reason': row.reason}
+                    ), None
+                except GatewayRateLimited as e:
+                    limiter.pause(e.retry_after)
+                    return None, e
+                except ValueError as e:
+                    return None, e
+            
+            workers = max(1, min(len(rows), _setting('REFUND_WORKERS', 4)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(send, rows))
+        
+        now = timezone.now()
+        refunded = []
+        for row, (refund, error) in zip(rows, results):
+            if refund is not None:
+                row.status = RefundStatus.PROCESSED
+                row.razorpay_refund_id = refund['id']
+                row.processed_at = now
+                row.last_error = None
+                refunded.append(row)
+            elif isinstance(error, GatewayRateLimited):
+                # Throttling is not the refund's fault; retry without spending an attempt
+                row.attempts -= 1
+                row.last_error = str(error)
+                row.next_attempt_at = now + timezone.timedelta(seconds=error.retry_after)
+            elif isinstance(error, GatewayUnavailable):
+                RefundService._schedule_retry(row, str(error), now)
+            else:
+                # Rejected by the gateway (e.g. already refunded elsewhere); needs a human
+                row.status = RefundStatus.FAILED
+                row.last_error = str(error)
+        
+        with transaction.atomic():
+            Refund.objects.bulk_update(
+                rows, ['status', 'attempts', 'razorpay_refund_id', 'processed_at', 'last_error', 'next_attempt_at']
+            )
+            if refunded:
+                Payment.objects.filter(
+                    id__in=[row.payment_id for row in refunded],
+                    status=PaymentStatus.COMPLETED
+                ).update(status=PaymentStatus.REFUNDED, updated_at=now)
+                
+                notification_service = NotificationService()
+                with OutboxService.batch():
+                    for row in refunded:
+                        notification_service.send_refund_processed(row.payment.booking, row.amount)
+        
+        counts = {}
+        for row in rows:
+            status = str(row.status)
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+    
+    @staticmethod
+    def _schedule_retry(row, error: str, now):
+        """Exponential backoff; give up after REFUND_MAX_ATTEMPTS"""
+        row.last_error = error
+        if row.attempts >= _setting('REFUND_MAX_ATTEMPTS', 8):
+            row.status = RefundStatus.FAILED
+            return
+        delay = min(
+            _setting('REFUND_RETRY_BASE_SECONDS', 60) * 2 ** (row.attempts - 1),
+            _setting('REFUND_RETRY_MAX_SECONDS', 3600)
+        )
+        row.next_attempt_at = now + timezone.timedelta(seconds=delay)
@@ -0,0 +1,113 @@
+"""
+Gateway client tests against the local Razorpay stand-in
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.test import SimpleTestCase, override_settings
+from .gateway import CircuitBreaker, GatewayRateLimited, GatewayUnavailable, RazorpayGateway
+from .gateway_stub import GatewayStub
+
+
+@override_settings(
+    RAZORPAY_MAX_RETRIES=0,
+    RAZORPAY_POOL_SIZE=4,
+    RAZORPAY_BREAKER_THRESHOLD=2,
+    RAZORPAY_BREAKER_RESET_SECONDS=0.2,
+    RAZORPAY_READ_TIMEOUT=2
+)
+class RazorpayGatewayTests(SimpleTestCase):
+    """Pooling, retries, circuit breaker and throttling of the shared gateway client"""
+    
+    def setUp(self):
+        self.stub = GatewayStub().start()
+        self.addCleanup(self.stub.stop)
+        self.gateway = self.make_gateway()
+        self.payment = self.stub.add_payment('order_test', 50000)
+    
+    def make_gateway(self):
+        gateway = RazorpayGateway(key_id='rzp_test', key_secret='secret', base_url=self.stub.base_url)
+        self.addCleanup(gateway.close)
+        return gateway
+    
+    def test_sequential_calls_reuse_one_connection(self):
+        for _ in range(20):
+            self.assertEqual(self.gateway.fetch_payment(self.payment['id'])['id'], self.payment['id'])
+        self.assertEqual(self.stub.requests, 20)
+        self.assertEqual(len(self.stub.connections), 1)
+    
+    def test_concurrent_calls_stay_within_pool(self):
+        # As many threads as pooled connections: every call borrows one of them
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: self.gateway.fetch_payment(self.payment['id']), range(100)))
+        self.assertEqual(len(results), 100)
+        self.assertEqual(self.stub.requests, 100)
+        self.assertLessEqual(len(self.stub.connections), 4)
+    
+    def test_failures_open_circuit_then_half_open_trial_closes_it(self):
+        self.stub.fail_next(2)
+        for _ in range(2):
+            with self.assertRaises(GatewayUnavailable):
+                self.gateway.create_order({'amount': 50000, 'currency': 'INR', 'receipt': 'r1'})
+        self.assertEqual(self.gateway.breaker.state, CircuitBreaker.OPEN)
+        
+        # Open: fail fast without reaching the gateway
+        requests_before = self.stub.requests
+        with self.assertRaises(GatewayUnavailable):
+            self.gateway.fetch_payment(self.payment['id'])
+        self.assertEqual(self.stub.requests, requests_before)
+        
+        # After the reset timeout one trial call goes through and closes the circuit
+        time.sleep(0.25)
+        self.assertEqual(self.gateway.fetch_payment(self.payment['id'])['id'], self.payment['id'])
+        self.assertEqual(self.gateway.breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_failed_half_open_trial_reopens_circuit(self):
+        self.stub.fail_next(3)
+        for _ in range(2):
+            with self.assertRaises(GatewayUnavailable):
+                self.gateway.create_order({'amount': 50000, 'currency': 'INR', 'receipt': 'r1'})
+        
+        time.sleep(0.25)
+        with self.assertRaises(GatewayUnavailable):
+            self.gateway.create_order({'amount': 50000, 'currency': 'INR', 'receipt': 'r1'})
+        self.assertEqual(self.gateway.breaker.state, CircuitBreaker.OPEN)
+    
+    def test_rate_limited_half_open_trial_closes_circuit(self):
+        self.stub.fail_next(2)
+        for _ in range(2):
+            with self.assertRaises(GatewayUnavailable):
+                self.gateway.create_order({'amount': 50000, 'currency': 'INR', 'receipt': 'r1'})
+        
+        # A throttled trial still means the gateway is answering
+        time.sleep(0.25)
+        self.stub.rate_limit_next(1)
+        with self.assertRaises(GatewayRateLimited):
+            self.gateway.fetch_payment(self.payment['id'])
+        self.assertEqual(self.gateway.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.gateway.fetch_payment(self.payment['id'])['id'], self.payment['id'])
+    
+    @override_settings(RAZORPAY_MAX_RETRIES=2)
+    def test_reads_are_retried_on_503(self):
+        gateway = self.make_gateway()
+        self.stub.fail_next(1)
+        self.assertEqual(gateway.fetch_payment(self.payment['id'])['id'], self.payment['id'])
+        self.assertEqual(self.stub.requests, 2)
+        self.assertEqual(gateway.breaker.failures, 0)
+    
+    def test_rate_limit_raises_with_retry_after_and_keeps_circuit_closed(self):
+        self.stub.rate_limit_next(1, retry_after=3)
+        with self.assertRaises(GatewayRateLimited) as raised:
+            self.gateway.refund_payment(self.payment['id'], 50000, receipt='refund_1')
+        self.assertEqual(raised.exception.retry_after, 3.0)
+        self.assertEqual(self.gateway.breaker.state, CircuitBreaker.CLOSED)
+        
+        refund = self.gateway.refund_payment(self.payment['id'], 50000, receipt='refund_1')
+        self.assertEqual(self.gateway.find_refund(self.payment['id'], 'refund_1')['id'], refund['id'])
+    
+    @override_settings(RAZORPAY_READ_TIMEOUT=0.1)
+    def test_read_timeout_counts_as_failure(self):
+        gateway = self.make_gateway()
+        self.stub.latency = 0.5
+        with self.assertRaises(GatewayUnavailable):
+            gateway.fetch_payment(self.payment['id'])
+        self.assertEqual(gateway.breaker.failures, 1)
@@ -2,9 +2,10 @@
 URL patterns for payments
 """
 from django.urls import path
-from .views import PaymentCreateView, PaymentVerifyView
+from .views import PaymentCreateView, PaymentVerifyView, PaymentWebhookView
 
 urlpatterns = [
     path('create/', PaymentCreateView.as_view(), name='payment_create'),
     path('verify/', PaymentVerifyView.as_view(), name='payment_verify'),
+    path('webhook/', PaymentWebhookView.as_view(), name='payment_webhook'),
 ]
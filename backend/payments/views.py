@@ -4,9 +4,11 @@ Payment views
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from .serializers import PaymentCreateSerializer, PaymentVerifySerializer, PaymentSerializer
+from .gateway import GatewayUnavailable
 from .services import PaymentService
+from .webhooks import WebhookService, verify_signature
 
 
 class PaymentCreateView(APIView):
@@ -29,7 +31,12 @@ class PaymentCreateView(APIView):
                 'message': 'Payment initiated',
                 **result
             })
-            
+        
+        except GatewayUnavailable as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except ValueError as e:
             return Response(
                 {'error': str(e)},
@@ -60,9 +67,34 @@ class PaymentVerifyView(APIView):
                 'booking_id': str(booking.id),
                 'booking_status': booking.status
             })
-            
+        
         except ValueError as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+
+class PaymentWebhookView(APIView):
+    """Receive Razorpay webhooks; events are applied later by the webhook worker"""
+    
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    def post(self, request):
+        body = request.body
+        if not verify_signature(body, request.headers.get('X-Razorpay-Signature')):
+            return Response(
+                {'error': 'Invalid webhook signature'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            created = WebhookService.record(body, event_id=request.headers.get('X-Razorpay-Event-Id'))
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({'status': 'accepted' if created else 'duplicate'})
@@ -0,0 +1,218 @@
+"""
+Razorpay webhook ingestion.
+
+The webhook view only verifies the signature and appends the raw event to
+the PaymentWebhookEvent inbox, so the gateway gets an immediate 200. A
+worker (manage.py process_payment_webhooks) then applies events in
+batches: duplicates are dropped by event ID, payments are marked completed
+or failed with set-based updates, and paid bookings are confirmed through
+BookingService.confirm_bookings.
+"""
+import hashlib
+import hmac
+import json
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+from bookings.models import BookingStatus
+from bookings.services import BookingService
+from notifications.outbox import OutboxService
+from notifications.services import NotificationService
+from .models import Payment, PaymentStatus, PaymentWebhookEvent, RefundReason, WebhookEventStatus
+from .refunds import RefundService
+
+CAPTURE_EVENTS = ('payment.captured', 'order.paid')
+FAILURE_EVENTS = ('payment.failed',)
+
+
+def verify_signature(body: bytes, signature: str) -> bool:
+    """Check the X-Razorpay-Signature header (hex HMAC-SHA256 of the raw body)"""
+    secret = getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', '')
+    if not secret:
+        # Unsigned webhooks are only accepted in mock mode
+        return getattr(settings, 'RAZORPAY_MOCK_MODE', True)
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or '')
+
+
+def sign_payload(body: bytes) -> str:
+    """Signature the gateway would send for a body (used when replaying fixtures)"""
+    secret = getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', '')
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def _payment_entity(payload: dict) -> dict:
+    return ((payload.get('payload') or {}).get('payment') or {}).get('entity') or {}
+
+
+class WebhookService:
+    """Service for storing and applying payment webhooks"""
+    
+    @staticmethod
+    def record(body: bytes, event_id: str = None) -> bool:
+        """Append a verified webhook to the inbox. Returns False for a duplicate delivery."""
+        payload = json.loads(body)
+        if not isinstance(payload, dict) or not payload.get('event'):
+            raise ValueError("Invalid webhook payload")
+        
+        event_id = event_id or hashlib.sha256(body).hexdigest()
+        try:
+            with transaction.atomic():
+                PaymentWebhookEvent.objects.create(
+                    event_id=event_id,
+                    event=payload['event'],
+                    payload=payload
+                )
+        except IntegrityError:
+            return False
+        return True
+    
+    @staticmethod
+    def process_pending(limit: int = None) -> dict:
+        """Apply one batch of received events; returns counts per outcome"""
+        limit = limit or getattr(settings, 'PAYMENT_WEBHOOK_BATCH_SIZE', 100)
+        
+        with transaction.atomic():
+            events = list(
+                PaymentWebhookEvent.objects.select_for_update(skip_locked=True)
+                .filter(status=WebhookEventStatus.RECEIVED)
+                .order_by('received_at')[:limit]
+            )
+            if not events:
+                return {}
+            
+            outcomes = WebhookService._apply(events)
+            
+            now = timezone.now()
+            for status, errors in outcomes.items():
+                if not errors:
+                    continue
+                PaymentWebhookEvent.objects.filter(id__in=list(errors)).update(
+                    status=status,
+                    processed_at=now,
+                    error_message=Case(
+                        *[When(id=event_id, then=Value(error)) for event_id, error in errors.items()],
+                        default=Value(None),
+                        output_field=CharField()
+                    )
+                )
+        
+        return {str(status): len(errors) for status, errors in outcomes.items() if errors}
+    
+    @staticmethod
+    def _apply(events) -> dict:
+        """Set-based application of a batch; maps status -> {event id: error or None}"""
+        outcomes = {
+            WebhookEventStatus.PROCESSED: {},
+            WebhookEventStatus.IGNORED: {},
+            WebhookEventStatus.FAILED: {},
+        }
+        
+        # Latest capture / failure per order; captures win over failures
+        captures = {}
+        failures = {}
+        for event in events:
+            entity = _payment_entity(event.payload)
+            order_id = entity.get('order_id')
+            if event.event in CAPTURE_EVENTS and order_id:
+                target = captures
+            elif event.event in FAILURE_EVENTS and order_id:
+                target = failures
+            else:
+                outcomes[WebhookEventStatus.IGNORED][event.id] = 'Unhandled event type'
+                continue
+            if order_id in target:
+                outcomes[WebhookEventStatus.IGNORED][target[order_id][0].id] = 'Superseded by a later event'
+            target[order_id] = (event, entity)
+        
+        for order_id in captures:
+            event, _ = failures.pop(order_id, (None, None))
+            if event is not None:
+                outcomes[WebhookEventStatus.IGNORED][event.id] = 'Superseded by capture'
+        
+        payments = {
+            payment.razorpay_order_id: payment
+            for payment in Payment.objects.select_for_update(of=('self',)).select_related('booking').filter(
+                razorpay_order_id__in=list(captures) + list(failures)
+            )
+        }
+        
+        # Captured payments
+        to_complete = {}
+        for order_id, (event, entity) in captures.items():
+            payment = payments.get(order_id)
+            if payment is None:
+                outcomes[WebhookEventStatus.FAILED][event.id] = 'Unknown order'
+            elif payment.status not in (PaymentStatus.PENDING, PaymentStatus.FAILED):
+                # order.paid and payment.captured both arrive, possibly after a refund
+                outcomes[WebhookEventStatus.IGNORED][event.id] = f"Payment already {payment.status}"
+            else:
+                to_complete[payment.id] = (payment, event, entity)
+        
+        if to_complete:
+            Payment.objects.filter(id__in=list(to_complete)).update(
+                status=PaymentStatus.COMPLETED,
+                razorpay_payment_id=Case(
+                    *[When(id=payment_id, then=Value(entity.get('id'))) for payment_id, (_, _, entity) in to_complete.items()],
+                    output_field=CharField()
+                ),
+                payment_method=Case(
+                    *[When(id=payment_id, then=Value(entity.get('method'))) for payment_id, (_, _, entity) in to_complete.items()],
+                    output_field=CharField()
+                ),
+                error_message=None,
+                updated_at=timezone.now()
+            )
+            
+            notification_service = NotificationService()
+            confirmed = {
+                booking.id
+                for booking in BookingService.confirm_bookings(
+                    [payment.booking_id for payment, _, _ in to_complete.values()]
+                )
+            }
+            with OutboxService.batch():
+                for payment, _, _ in to_complete.values():
+                    if payment.booking_id in confirmed:
+                        notification_service.send_payment_success(payment.booking, payment.amount)
+            
+            late = []
+            for payment, event, _ in to_complete.values():
+                if payment.booking_id in confirmed or payment.booking.status == BookingStatus.CONFIRMED:
+                    outcomes[WebhookEventStatus.PROCESSED][event.id] = None
+                else:
+                    # Paid after the seat hold lapsed or the booking was cancelled
+                    late.append(payment.booking_id)
+                    outcomes[WebhookEventStatus.PROCESSED][event.id] = (
+                        "Payment captured but the booking can no longer be confirmed; refund queued"
+                    )
+            if late:
+                RefundService.enqueue_for_bookings(late, RefundReason.LATE_CAPTURE)
+        
+        # Failed payments (only pending ones; a later capture wins)
+        to_fail = {}
+        for order_id, (event, entity) in failures.items():
+            payment = payments.get(order_id)
+            if payment is None:
+                outcomes[WebhookEventStatus.FAILED][event.id] = 'Unknown order'
+            elif payment.status != PaymentStatus.PENDING:
+                outcomes[WebhookEventStatus.IGNORED][event.id] = f"Payment already {payment.status}"
+            else:
+                to_fail[payment.id] = (event, entity)
+                outcomes[WebhookEventStatus.PROCESSED][event.id] = None
+        
+        if to_fail:
+            Payment.objects.filter(id__in=list(to_fail)).update(
+                status=PaymentStatus.FAILED,
+                error_message=Case(
+                    *[
+                        When(id=payment_id, then=Value(entity.get('error_description') or 'Payment failed'))
+                        for payment_id, (_, entity) in to_fail.items()
+                    ],
+                    output_field=CharField()
+                ),
+                updated_at=timezone.now()
+            )
+        
+        return outcomes
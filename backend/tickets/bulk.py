@@ -0,0 +1,107 @@
+"""
+Bulk e-ticket export for group and corporate bookings.
+
+Ticket data is loaded with a fixed number of queries, then pages (or PNGs)
+are rendered in the ticket render pool a chunk at a time and streamed out,
+so memory stays bounded by the chunk size rather than the group size.
+"""
+import io
+import zipfile
+from django.conf import settings
+from django.utils import timezone
+from bookings.models import Booking, BookingStatus
+from .models import Ticket
+from .pdf import PDFStreamWriter, ticket_page_content
+from .qr import render_qr_png
+from .rendering import render_map
+from .services import TicketService
+
+
+def _chunk_size():
+    return getattr(settings, 'TICKET_BULK_CHUNK_SIZE', 25)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _format_time(value) -> str:
+    return timezone.localtime(value).strftime('%d %b %Y, %H:%M')
+
+
+def collect_ticket_fields(user, booking_ids) -> list:
+    """Plain ticket data for the user's confirmed bookings, issuing missing tickets"""
+    bookings = list(
+        Booking.objects.filter(
+            id__in=booking_ids,
+            user=user,
+            status=BookingStatus.CONFIRMED
+        ).select_related('bus').prefetch_related('seats').order_by('bus__departure_time', 'created_at')
+    )
+    tickets = {
+        ticket.booking_id: ticket
+        for ticket in Ticket.objects.filter(booking__in=bookings)
+    }
+    
+    fields = []
+    for booking in bookings:
+        ticket = tickets.get(booking.id) or TicketService.generate_ticket(booking)
+        bus = booking.bus
+        fields.append({
+            'ticket_id': str(ticket.id),
+            'booking_id': str(booking.id),
+            'bus_name': bus.name,
+            'bus_number': bus.bus_number,
+            'source': bus.source,
+            'destination': bus.destination,
+            'departure_time': _format_time(bus.departure_time),
+            'arrival_time': _format_time(bus.arrival_time),
+            'seat_numbers': booking.seat_numbers,
+            'passenger_name': booking.passenger_name,
+            'total_amount': str(booking.total_amount),
+            'qr_data': ticket.qr_data
+        })
+    return fields
+
+
+def stream_pdf(ticket_fields):
+    """Yield a multi-page PDF, one ticket per page"""
+    writer = PDFStreamWriter()
+    yield writer.begin()
+    for chunk in _chunks(ticket_fields, _chunk_size()):
+        for content in render_map(ticket_page_content, chunk):
+            yield writer.add_page(content)
+    yield writer.finish()
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Unseekable sink that hands written bytes back to a generator"""
+    
+    def __init__(self):
+        self._parts = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_zip(ticket_fields):
+    """Yield a ZIP archive with one QR PNG per ticket"""
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for chunk in _chunks(ticket_fields, _chunk_size()):
+            pngs = render_map(render_qr_png, [fields['qr_data'] for fields in chunk])
+            for fields, png in zip(chunk, pngs):
+                seats = '-'.join(fields['seat_numbers'])
+                archive.writestr(f"ticket_{fields['booking_id']}_{seats}.png", png)
+                yield buffer.drain()
+    yield buffer.drain()
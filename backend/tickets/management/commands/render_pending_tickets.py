@@ -0,0 +1,27 @@
+"""
+Issue and render tickets that the background renderer has not finished
+(e.g. after a worker restart)
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from bookings.models import Booking, BookingStatus
+from tickets.rendering import issue_ticket
+
+
+class Command(BaseCommand):
+    help = 'Issue and render QR images for confirmed bookings that are missing them'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        booking_ids = list(
+            Booking.objects.filter(status=BookingStatus.CONFIRMED)
+            .filter(Q(ticket__isnull=True) | Q(ticket__qr_image='') | Q(ticket__qr_image__isnull=True))
+            .values_list('id', flat=True)[:options['limit']]
+        )
+        
+        for booking_id in booking_ids:
+            issue_ticket(booking_id)
+        
+        self.stdout.write(f"Rendered {len(booking_ids)} tickets")
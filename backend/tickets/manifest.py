@@ -0,0 +1,136 @@
+"""
+Offline boarding manifests and validation log ingestion.
+
+Conductors download a manifest per bus before departure, check scans
+locally against it (plus the token signature), and upload the
+accumulated scan log once they are back online.
+"""
+import hashlib
+import json
+from django.db.models import Case, CharField, DateTimeField, Value, When
+from django.utils import timezone
+from bookings.cache import TripCache
+from bookings.models import BookingSeat, BookingStatus
+from .models import Ticket
+
+MANIFEST_VERSION = 1
+MANIFEST_FIELDS = ['ticket_id', 'booking_id', 'seats', 'validated']
+
+
+class ManifestService:
+    """Service for per-trip validation manifests"""
+    
+    @staticmethod
+    def build_manifest(bus) -> dict:
+        """Compact manifest of valid and revoked tickets for a bus (two queries)"""
+        seats_by_booking = {}
+        for booking_id, seat_number in BookingSeat.objects.filter(
+            booking__bus=bus,
+            booking__ticket__isnull=False
+        ).order_by('seat__row', 'seat__column').values_list('booking_id', 'seat__seat_number'):
+            seats_by_booking.setdefault(booking_id, []).append(seat_number)
+        
+        tickets = []
+        revoked = []
+        for ticket_id, booking_id, booking_status, is_validated in Ticket.objects.filter(
+            booking__bus=bus
+        ).order_by('id').values_list('id', 'booking_id', 'booking__status', 'is_validated'):
+            if booking_status == BookingStatus.CONFIRMED:
+                tickets.append([
+                    str(ticket_id),
+                    str(booking_id),
+                    seats_by_booking.get(booking_id, []),
+                    is_validated
+                ])
+            else:
+                revoked.append(str(ticket_id))
+        
+        content = {'fields': MANIFEST_FIELDS, 'tickets': tickets, 'revoked': revoked}
+        digest = hashlib.sha256(
+            json.dumps(content, separators=(',', ':')).encode()
+        ).hexdigest()[:16]
+        
+        return {
+            'manifest_version': MANIFEST_VERSION,
+            'version': digest,
+            'bus_id': str(bus.id),
+            'departure_time': bus.departure_time.isoformat(),
+            'generated_at': timezone.now().isoformat(),
+            **content
+        }
+    
+    @staticmethod
+    def ingest_validation_log(bus, scans, uploaded_by: str = None) -> dict:
+        """
+        Apply an offline scan log with set-based updates.
+        
+        Duplicate scans of a ticket are resolved deterministically: the
+        earliest scan wins, ties broken by device ID. A ticket already
+        validated online keeps whichever validation happened first.
+        """
+        winners = {}
+        duplicates = 0
+        for scan in sorted(scans, key=lambda s: (s['scanned_at'], s.get('device_id') or '')):
+            ticket_id = str(scan['ticket_id'])
+            if ticket_id in winners:
+                duplicates += 1
+                continue
+            winners[ticket_id] = scan
+        
+        known = {
+            str(ticket_id): (booking_status, user_id)
+            for ticket_id, booking_status, user_id in Ticket.objects.filter(
+                id__in=list(winners),
+                booking__bus=bus
+            ).values_list('id', 'booking__status', 'booking__user_id')
+        }
+        
+        unknown = [ticket_id for ticket_id in winners if ticket_id not in known]
+        revoked = [
+            ticket_id for ticket_id, (booking_status, _) in known.items()
+            if booking_status != BookingStatus.CONFIRMED
+        ]
+        valid_ids = [ticket_id for ticket_id in known if ticket_id not in revoked]
+        
+        validated_at = Case(
+            *[When(id=ticket_id, then=Value(winners[ticket_id]['scanned_at'])) for ticket_id in valid_ids],
+            output_field=DateTimeField()
+        )
+        validated_by = Case(
+            *[
+                When(id=ticket_id, then=Value(winners[ticket_id].get('device_id') or uploaded_by))
+                for ticket_id in valid_ids
+            ],
+            output_field=CharField()
+        )
+        
+        applied = corrected = 0
+        if valid_ids:
+            # Tickets never validated before
+            applied = Ticket.objects.filter(id__in=valid_ids, is_validated=False).update(
+                is_validated=True,
+                validated_at=validated_at,
+                validated_by=validated_by
+            )
+            
+            # Tickets validated later elsewhere: keep the earliest scan
+            corrected = Ticket.objects.filter(
+                id__in=valid_ids,
+                is_validated=True,
+                validated_at__gt=validated_at
+            ).update(
+                validated_at=validated_at,
+                validated_by=validated_by
+            )
+        
+        TripCache.invalidate(*[known[ticket_id][1] for ticket_id in valid_ids])
+        
+        return {
+            'received': len(scans),
+            'applied': applied,
+            'already_validated': len(valid_ids) - applied,
+            'corrected': corrected,
+            'duplicates': duplicates,
+            'revoked': revoked,
+            'unknown': unknown
+        }
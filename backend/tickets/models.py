@@ -39,7 +39,9 @@ class Ticket(models.Model):
     def validate(self, validated_by: str = None):
         """Mark ticket as validated"""
         from django.utils import timezone
+        from bookings.cache import TripCache
         self.is_validated = True
         self.validated_at = timezone.now()
         self.validated_by = validated_by
         self.save(update_fields=['is_validated', 'validated_at', 'validated_by'])
+        TripCache.invalidate(self.booking.user_id)
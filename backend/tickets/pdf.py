@@ -0,0 +1,128 @@
+"""
+Minimal streaming PDF writer for e-tickets.
+
+Pages are emitted one at a time and only their byte offsets are kept, so
+a document of any length is written with flat memory. QR codes are drawn
+as vector rectangles straight from the module matrix.
+
+Like tickets.qr, this module imports nothing from Django so page content
+can be built inside worker processes of the ticket render pool.
+"""
+from .qr import QUIET_ZONE, qr_matrix
+
+PAGE_WIDTH = 298   # A6 portrait, in points
+PAGE_HEIGHT = 420
+MARGIN = 24
+QR_SIZE = 170
+
+_CATALOG, _PAGES, _FONT, _FONT_BOLD = 1, 2, 3, 4
+
+
+def _escape(text) -> str:
+    text = str(text).encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _text(x, y, size, text, font='F1') -> str:
+    return f"BT /{font} {size} Tf {x} {y} Td ({_escape(text)}) Tj ET\n"
+
+
+def ticket_page_content(fields: dict) -> bytes:
+    """Content stream for one ticket page"""
+    parts = [_text(MARGIN, PAGE_HEIGHT - 40, 18, 'GoBus e-Ticket', font='F2')]
+    
+    y = PAGE_HEIGHT - 70
+    for label, value in (
+        ('Bus', f"{fields['bus_name']} ({fields['bus_number']})"),
+        ('Route', f"{fields['source']} - {fields['destination']}"),
+        ('Departs', fields['departure_time']),
+        ('Arrives', fields['arrival_time']),
+        ('Seats', ', '.join(fields['seat_numbers'])),
+        ('Passenger', fields['passenger_name']),
+        ('Amount', f"INR {fields['total_amount']}"),
+    ):
+        parts.append(_text(MARGIN, y, 9, label, font='F2'))
+        parts.append(_text(MARGIN + 62, y, 9, value))
+        y -= 15
+    
+    # QR code, one filled rectangle per run of dark modules
+    rows = qr_matrix(fields['qr_data'])
+    module = QR_SIZE / (len(rows) + 2 * QUIET_ZONE)
+    left = (PAGE_WIDTH - QR_SIZE) / 2 + QUIET_ZONE * module
+    top = MARGIN + 20 + QR_SIZE - QUIET_ZONE * module
+    for row_index, row in enumerate(rows):
+        x = 0
+        while x < len(row):
+            if row[x] != '1':
+                x += 1
+                continue
+            run = 1
+            while x + run < len(row) and row[x + run] == '1':
+                run += 1
+            parts.append(
+                f"{left + x * module:.2f} {top - (row_index + 1) * module:.2f} "
+                f"{run * module:.2f} {module:.2f} re\n"
+            )
+            x += run
+    parts.append("f\n")
+    
+    parts.append(_text(MARGIN, MARGIN, 7, f"Ticket {fields['ticket_id']}"))
+    return ''.join(parts).encode('latin-1')
+
+
+class PDFStreamWriter:
+    """Writes a PDF incrementally; each method returns the bytes to send"""
+    
+    def __init__(self):
+        self._offsets = {}
+        self._position = 0
+        self._next_object = _FONT_BOLD + 1
+        self._page_objects = []
+    
+    def _object(self, number: int, body: bytes) -> bytes:
+        self._offsets[number] = self._position
+        data = f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        self._position += len(data)
+        return data
+    
+    def begin(self) -> bytes:
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self._position = len(header)
+        return b''.join([
+            header,
+            self._object(_CATALOG, f"<< /Type /Catalog /Pages {_PAGES} 0 R >>".encode()),
+            self._object(_FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"),
+            self._object(_FONT_BOLD, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold >>"),
+        ])
+    
+    def add_page(self, content: bytes) -> bytes:
+        content_object = self._next_object
+        page_object = self._next_object + 1
+        self._next_object += 2
+        self._page_objects.append(page_object)
+        
+        return self._object(
+            content_object,
+            f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream"
+        ) + self._object(
+            page_object,
+            (
+                f"<< /Type /Page /Parent {_PAGES} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 {_FONT} 0 R /F2 {_FONT_BOLD} 0 R >> >> "
+                f"/Contents {content_object} 0 R >>"
+            ).encode()
+        )
+    
+    def finish(self) -> bytes:
+        kids = ' '.join(f"{number} 0 R" for number in self._page_objects)
+        pages = self._object(
+            _PAGES,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_objects)} >>".encode()
+        )
+        
+        xref_offset = self._position
+        size = self._next_object
+        xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        xref.extend(f"{self._offsets[number]:010d} 00000 n \n" for number in range(1, size))
+        xref.append(f"trailer\n<< /Size {size} /Root {_CATALOG} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        return pages + ''.join(xref).encode()
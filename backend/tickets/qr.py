@@ -0,0 +1,69 @@
+"""
+Pure QR rendering helpers.
+
+This module deliberately imports nothing from Django so its functions can
+run inside worker processes of the ticket render pool.
+"""
+import io
+import qrcode
+
+QUIET_ZONE = 4
+
+
+def build_qr(data: str) -> qrcode.QRCode:
+    """Build a QR code at the smallest version that fits the data"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=QUIET_ZONE,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def render_qr_png(data: str) -> bytes:
+    """Render a QR code as PNG bytes"""
+    img = build_qr(data).make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def qr_matrix(data: str) -> list:
+    """Module rows as '0'/'1' strings, without the quiet zone"""
+    return [''.join('1' if module else '0' for module in row) for row in build_qr(data).modules]
+
+
+def render_qr_svg(data: str, border: int = QUIET_ZONE) -> str:
+    """
+    Render a QR code as a compact SVG with one unit per module. Each run of
+    dark modules is one stroked segment of a single path; no Pillow needed.
+    """
+    rows = qr_matrix(data)
+    size = len(rows) + 2 * border
+    
+    commands = []
+    for y, row in enumerate(rows):
+        pen = None
+        x = 0
+        while x < len(row):
+            if row[x] != '1':
+                x += 1
+                continue
+            run = 1
+            while x + run < len(row) and row[x + run] == '1':
+                run += 1
+            if pen is None:
+                commands.append(f"M{x + border} {y + border}.5h{run}")
+            else:
+                commands.append(f"m{x - pen} 0h{run}")
+            pen = x + run
+            x += run
+    
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+        f'shape-rendering="crispEdges"><rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path d="{"".join(commands)}" stroke="#000"/></svg>'
+    )
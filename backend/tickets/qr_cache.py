@@ -0,0 +1,106 @@
+"""
+Content-addressed QR image cache.
+
+QR images are keyed by a SHA-256 hash of the payload and format, so an
+identical payload is rendered and stored once. Encoded (base64) images are
+kept in a size-capped in-process LRU, and the PNG files on disk are shared
+between tickets under tickets/qr/<hash[:2]>/<hash>.png.
+"""
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from gobus import metrics
+
+
+def content_key(payload: str, image_format: str = 'png') -> str:
+    """Content hash identifying a rendered QR image"""
+    return hashlib.sha256(f"{image_format}:{payload}".encode()).hexdigest()
+
+
+def storage_name(key: str, image_format: str = 'png') -> str:
+    """Deduplicated storage path for a content key"""
+    return f"tickets/qr/{key[:2]}/{key}.{image_format}"
+
+
+class QRImageCache:
+    """Thread-safe LRU of base64-encoded QR images, capped by total size"""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        metrics.increment('qr_cache.hits' if value is not None else 'qr_cache.misses')
+        return value
+    
+    def put(self, key: str, value: str):
+        if len(value) > self.max_bytes:
+            return
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self._size -= len(oldest)
+                evicted += 1
+        if evicted:
+            metrics.increment('qr_cache.evictions', evicted)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+    
+    def stats(self) -> dict:
+        counters = metrics.snapshot()
+        hits = counters.get('qr_cache.hits', 0)
+        misses = counters.get('qr_cache.misses', 0)
+        with self._lock:
+            entries, size = len(self._entries), self._size
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get('qr_cache.evictions', 0),
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None
+        }
+
+
+qr_cache = QRImageCache(getattr(settings, 'QR_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+
+
+def get_or_render(key: str, render) -> str:
+    """Return a cached text rendering, producing and caching it on a miss"""
+    value = qr_cache.get(key)
+    if value is None:
+        value = render()
+        qr_cache.put(key, value)
+    return value
+
+
+def store_png(key: str, png: bytes) -> str:
+    """Write a PNG to its content-addressed path unless it already exists"""
+    name = storage_name(key)
+    if not default_storage.exists(name):
+        saved_name = default_storage.save(name, ContentFile(png))
+        if saved_name != name:
+            # Lost a race with another writer; keep the canonical file
+            default_storage.delete(saved_name)
+    qr_cache.put(key, base64.b64encode(png).decode('utf-8'))
+    return name
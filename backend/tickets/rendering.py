@@ -0,0 +1,118 @@
+"""
+Off-request ticket rendering.
+
+Confirming a booking schedules ticket issuance on a small thread pool; the
+CPU-bound PNG rendering itself runs in a process pool so it never competes
+with request threads for the GIL. Views fall back to rendering on demand,
+bounded by a semaphore, and report a pending status when all slots are busy.
+"""
+import base64
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from .qr import render_qr_png
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_render_pool = None
+_dispatch_pool = None
+_inline_slots = threading.BoundedSemaphore(getattr(settings, 'TICKET_RENDER_INLINE_LIMIT', 4))
+
+
+def _render_workers() -> int:
+    return getattr(settings, 'TICKET_RENDER_WORKERS', 2)
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound QR rendering"""
+    global _render_pool
+    with _lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=_render_workers(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _render_pool
+
+
+def _get_dispatch_pool() -> ThreadPoolExecutor:
+    global _dispatch_pool
+    with _lock:
+        if _dispatch_pool is None:
+            _dispatch_pool = ThreadPoolExecutor(
+                max_workers=_render_workers(),
+                thread_name_prefix='ticket-render'
+            )
+        return _dispatch_pool
+
+
+def render_png(qr_data: str) -> bytes:
+    """Render in the process pool, or inline when background rendering is disabled"""
+    if _render_workers() <= 0:
+        return render_qr_png(qr_data)
+    return get_render_pool().submit(render_qr_png, qr_data).result()
+
+
+def render_map(func, items) -> list:
+    """Map a pure render function over items in the process pool"""
+    if _render_workers() <= 0:
+        return [func(item) for item in items]
+    return list(get_render_pool().map(func, items))
+
+
+def issue_ticket(booking_id):
+    """Create the ticket for a confirmed booking and store its QR image"""
+    from bookings.models import Booking, BookingStatus
+    from .services import TicketService
+    
+    booking = Booking.objects.select_related('bus').prefetch_related('seats').filter(
+        id=booking_id,
+        status=BookingStatus.CONFIRMED
+    ).first()
+    if booking is None:
+        return None
+    
+    ticket = TicketService.generate_ticket(booking)
+    if not ticket.qr_image:
+        TicketService.store_qr_image(ticket, render_png(ticket.qr_data))
+    return ticket
+
+
+def _issue_ticket_in_background(booking_id):
+    close_old_connections()
+    try:
+        issue_ticket(booking_id)
+    except Exception:
+        logger.exception("Ticket rendering failed for booking %s", booking_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_ticket_render(booking_id):
+    """Issue and render a ticket off the request path"""
+    if _render_workers() <= 0:
+        issue_ticket(booking_id)
+        return
+    _get_dispatch_pool().submit(_issue_ticket_in_background, booking_id)
+
+
+def render_on_demand(ticket):
+    """
+    Fallback for a ticket viewed before its background render finished.
+    Returns the base64 PNG, or None when all inline render slots are busy.
+    """
+    from .services import TicketService
+    
+    if not _inline_slots.acquire(blocking=False):
+        return None
+    try:
+        png = render_qr_png(ticket.qr_data)
+    finally:
+        _inline_slots.release()
+    
+    TicketService.store_qr_image(ticket, png)
+    return base64.b64encode(png).decode('utf-8')
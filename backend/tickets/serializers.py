@@ -40,3 +40,39 @@ class TicketValidateSerializer(serializers.Serializer):
     
     qr_data = serializers.CharField()
     validated_by = serializers.CharField(max_length=255, required=False)
+
+
+class TicketBatchValidateSerializer(serializers.Serializer):
+    """Serializer for validating many scanned tickets at once"""
+    
+    qr_data = serializers.ListField(
+        child=serializers.CharField(),
+        min_length=1,
+        max_length=500
+    )
+    validated_by = serializers.CharField(max_length=255, required=False)
+
+
+class TicketBulkExportSerializer(serializers.Serializer):
+    """Serializer for exporting many tickets as one PDF or ZIP"""
+    
+    booking_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=500
+    )
+    format = serializers.ChoiceField(choices=['pdf', 'zip'], default='pdf')
+
+
+class ScanLogEntrySerializer(serializers.Serializer):
+    """Single offline scan recorded by a conductor device"""
+    
+    ticket_id = serializers.UUIDField()
+    scanned_at = serializers.DateTimeField()
+    device_id = serializers.CharField(max_length=255, required=False)
+
+
+class ValidationLogSerializer(serializers.Serializer):
+    """Batch upload of offline scans"""
+    
+    scans = ScanLogEntrySerializer(many=True, allow_empty=False)
@@ -2,13 +2,26 @@
 Ticket generation and QR code services
 """
 import json
-import io
 import base64
-import qrcode
+import uuid
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from bookings.cache import TripCache
 from bookings.models import Booking, BookingStatus
 from .models import Ticket
+from .qr import QUIET_ZONE, qr_matrix, render_qr_png, render_qr_svg
+from .qr_cache import content_key, get_or_render, qr_cache, store_png
+from .tokens import TOKEN_PREFIX, InvalidTicketToken, decode_token, encode_token, seat_index
+
+
+def _legacy_cutoff():
+    value = getattr(settings, 'TICKET_LEGACY_QR_UNTIL', '')
+    cutoff = parse_datetime(value) if value else None
+    if cutoff is not None and timezone.is_naive(cutoff):
+        cutoff = timezone.make_aware(cutoff)
+    return cutoff
 
 
 class TicketService:
@@ -26,88 +39,120 @@ class TicketService:
         if existing_ticket:
             return existing_ticket
         
-        # Create QR data
-        qr_data = {
-            'ticket_type': 'gobus_v1',
-            'booking_id': str(booking.id),
-            'bus_id': str(booking.bus.id),
-            'bus_name': booking.bus.name,
-            'bus_number': booking.bus.bus_number,
-            'source': booking.bus.source,
-            'destination': booking.bus.destination,
-            'departure_time': booking.bus.departure_time.isoformat(),
-            'seats': booking.seat_numbers,
-            'passenger_name': booking.passenger_name,
-            'passenger_phone': booking.passenger_phone,
-            'total_amount': str(booking.total_amount),
-            'booking_date': booking.created_at.isoformat()
-        }
-        
-        # Create ticket
-        ticket = Ticket.objects.create(
-            booking=booking,
-            qr_data=json.dumps(qr_data)
+        # Create compact signed QR token
+        bus = booking.bus
+        grace_hours = getattr(settings, 'TICKET_TOKEN_GRACE_HOURS', 6)
+        qr_data = encode_token(
+            booking_id=booking.id,
+            bus_id=bus.id,
+            seat_indices=[seat_index(seat.row, seat.column, bus.seats_per_row) for seat in booking.seats.all()],
+            seats_per_row=bus.seats_per_row,
+            expires_at=bus.arrival_time + timezone.timedelta(hours=grace_hours)
         )
         
-        # Generate QR image
-        TicketService.generate_qr_image(ticket)
+        # Create ticket (the QR image is rendered separately, see tickets.rendering)
+        try:
+            with transaction.atomic():
+                ticket = Ticket.objects.create(
+                    booking=booking,
+                    qr_data=qr_data
+                )
+        except IntegrityError:
+            # Issued concurrently by the background renderer
+            return Ticket.objects.get(booking=booking)
+        TripCache.invalidate(booking.user_id)
         
         return ticket
     
+    @staticmethod
+    def store_qr_image(ticket: Ticket, png: bytes):
+        """Point the ticket at the shared, content-addressed copy of its QR PNG"""
+        name = store_png(content_key(ticket.qr_data), png)
+        Ticket.objects.filter(id=ticket.id).update(qr_image=name)
+        ticket.qr_image = name
+    
     @staticmethod
     def generate_qr_image(ticket: Ticket) -> str:
         """Generate QR code image and return base64 string"""
-        
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(ticket.qr_data)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save to bytes
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        # Save to ticket model
-        ticket.qr_image.save(
-            f'ticket_{ticket.id}.png',
-            ContentFile(buffer.read()),
-            save=True
-        )
-        
-        # Return base64 encoded string
-        buffer.seek(0)
-        return base64.b64encode(buffer.read()).decode('utf-8')
+        png = render_qr_png(ticket.qr_data)
+        TicketService.store_qr_image(ticket, png)
+        return base64.b64encode(png).decode('utf-8')
     
     @staticmethod
-    def get_qr_base64(ticket: Ticket) -> str:
-        """Get QR code as base64 string"""
+    def get_qr_base64(ticket: Ticket):
+        """Get QR code as base64 string, or None if it has not been rendered yet"""
+        key = content_key(ticket.qr_data)
+        cached = qr_cache.get(key)
+        if cached is not None:
+            return cached
         
         if ticket.qr_image:
             with ticket.qr_image.open('rb') as f:
-                return base64.b64encode(f.read()).decode('utf-8')
+                encoded = base64.b64encode(f.read()).decode('utf-8')
+            qr_cache.put(key, encoded)
+            return encoded
         
-        # Generate on-demand if not exists
-        return TicketService.generate_qr_image(ticket)
+        return None
     
     @staticmethod
-    def validate_ticket(qr_data: str, validated_by: str = None) -> dict:
-        """Validate a ticket from QR code data"""
+    def get_qr_svg(ticket: Ticket) -> str:
+        """Get QR code as an SVG document"""
+        return get_or_render(
+            content_key(ticket.qr_data, 'svg'),
+            lambda: render_qr_svg(ticket.qr_data)
+        )
+    
+    @staticmethod
+    def get_qr_matrix(ticket: Ticket) -> dict:
+        """
+        Get QR code as raw modules for clients that draw it natively.
+        Each row is a hex number whose bits, most significant first, are the
+        modules left to right (1 = dark); the quiet zone is not included.
+        """
+        rows = get_or_render(
+            content_key(ticket.qr_data, 'matrix'),
+            lambda: ' '.join(
+                format(int(row, 2), f'0{(len(row) + 3) // 4}x') for row in qr_matrix(ticket.qr_data)
+            )
+        ).split(' ')
+        return {'size': len(rows), 'quiet_zone': QUIET_ZONE, 'rows': rows}
+    
+    @staticmethod
+    def verify_offline(qr_data: str) -> dict:
+        """
+        Check a ticket token by signature and expiry alone (no database access).
+        This is the check conductors run while offline.
+        """
+        try:
+            token = decode_token(qr_data)
+        except InvalidTicketToken as e:
+            return {'valid': False, 'error': str(e)}
+        
+        return {
+            'valid': True,
+            'booking_id': str(token.booking_id),
+            'bus_id': str(token.bus_id),
+            'seats': token.seat_numbers,
+            'expires_at': token.expires_at.isoformat()
+        }
+    
+    @staticmethod
+    def _parse_booking_id(qr_data: str) -> dict:
+        """Extract the booking ID from a compact token or a legacy JSON payload"""
+        if qr_data.startswith(TOKEN_PREFIX):
+            return TicketService.verify_offline(qr_data)
+        
+        # Unsigned codes from before signed tokens are only honoured until the cutoff
+        cutoff = _legacy_cutoff()
+        if cutoff is None or timezone.now() >= cutoff:
+            return {'valid': False, 'error': 'Ticket must be reissued'}
         
         try:
             data = json.loads(qr_data)
         except json.JSONDecodeError:
             return {'valid': False, 'error': 'Invalid QR code format'}
         
-        if data.get('ticket_type') != 'gobus_v1':
+        if not isinstance(data, dict) or data.get('ticket_type') != 'gobus_v1':
             return {'valid': False, 'error': 'Invalid ticket type'}
         
         booking_id = data.get('booking_id')
@@ -115,27 +160,128 @@ class TicketService:
             return {'valid': False, 'error': 'Missing booking ID'}
         
         try:
-            ticket = Ticket.objects.select_related('booking', 'booking__bus').get(
-                booking__id=booking_id
-            )
-        except Ticket.DoesNotExist:
+            booking_id = uuid.UUID(str(booking_id))
+        except ValueError:
             return {'valid': False, 'error': 'Ticket not found'}
         
-        if ticket.is_validated:
-            return {
-                'valid': False,
-                'error': 'Ticket already validated',
-                'validated_at': ticket.validated_at.isoformat() if ticket.validated_at else None
+        return {'valid': True, 'booking_id': str(booking_id)}
+    
+    @staticmethod
+    def validate_ticket(qr_data: str, validated_by: str = None) -> dict:
+        """Validate a ticket from QR code data"""
+        return TicketService.validate_tickets([qr_data], validated_by)[0]
+    
+    @staticmethod
+    def validate_tickets(qr_payloads: list, validated_by: str = None) -> list:
+        """
+        Validate many scanned QR payloads at once with strict single-use semantics.
+        Returns one result dict per payload, in input order.
+        """
+        # Forged, expired or malformed codes are rejected before any query
+        parsed = [TicketService._parse_booking_id(qr_data) for qr_data in qr_payloads]
+        booking_ids = {result['booking_id'] for result in parsed if result['valid']}
+        
+        tickets = {}
+        if booking_ids:
+            tickets = {
+                str(ticket.booking_id): ticket
+                for ticket in Ticket.objects.filter(booking__id__in=booking_ids)
+                .select_related('booking', 'booking__bus')
+                .prefetch_related('booking__seats')
             }
         
-        # Validate the ticket
-        ticket.validate(validated_by)
+        # Only a ticket's current code is accepted: reissuing it (reschedule,
+        # transfer) retires the old one, and legacy codes must match exactly
+        for index, (qr_data, result) in enumerate(zip(qr_payloads, parsed)):
+            ticket = tickets.get(result.get('booking_id')) if result['valid'] else None
+            if ticket is not None and ticket.qr_data != qr_data:
+                parsed[index] = {'valid': False, 'error': 'Invalid ticket code'}
+        scanned = {result['booking_id'] for result in parsed if result['valid']}
         
-        return {
-            'valid': True,
-            'ticket_id': str(ticket.id),
-            'booking_id': str(ticket.booking.id),
-            'bus_name': ticket.booking.bus.name,
-            'seats': ticket.booking.seat_numbers,
-            'passenger_name': ticket.booking.passenger_name
-        }
+        # Mark every eligible ticket used in one conditional UPDATE
+        eligible = [
+            ticket.id for booking_id, ticket in tickets.items()
+            if booking_id in scanned
+            and ticket.booking.status == BookingStatus.CONFIRMED
+            and not ticket.is_validated
+        ]
+        now = timezone.now()
+        claimed = TicketService._claim_unvalidated(eligible, validated_by, now)
+        TripCache.invalidate(*[
+            ticket.booking.user_id for ticket in tickets.values() if ticket.id in claimed
+        ])
+        
+        results = []
+        for result in parsed:
+            if not result['valid']:
+                results.append(result)
+                continue
+            
+            ticket = tickets.get(str(result['booking_id']))
+            if ticket is None:
+                results.append({'valid': False, 'error': 'Ticket not found'})
+            elif ticket.booking.status != BookingStatus.CONFIRMED:
+                results.append({'valid': False, 'error': 'Booking is not confirmed'})
+            elif ticket.id in claimed:
+                # First scan of this ticket in the batch wins
+                claimed.discard(ticket.id)
+                results.append({
+                    'valid': True,
+                    'ticket_id': str(ticket.id),
+                    'booking_id': str(ticket.booking.id),
+                    'bus_name': ticket.booking.bus.name,
+                    'seats': ticket.booking.seat_numbers,
+                    'passenger_name': ticket.booking.passenger_name
+                })
+            else:
+                validated_at = ticket.validated_at if ticket.is_validated else now
+                results.append({
+                    'valid': False,
+                    'error': 'Ticket already validated',
+                    'validated_at': validated_at.isoformat() if validated_at else None
+                })
+        
+        return results
+    
+    @staticmethod
+    def _claim_unvalidated(ticket_ids, validated_by, now) -> set:
+        """
+        UPDATE ... WHERE is_validated = false RETURNING id.
+        Only one concurrent scan can flip a ticket, so each ticket is used once.
+        """
+        if not ticket_ids:
+            return set()
+        
+        pk = Ticket._meta.pk
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            # No RETURNING support: lock the rows, then flip them
+            with transaction.atomic():
+                claimed = set(
+                    Ticket.objects.select_for_update()
+                    .filter(id__in=ticket_ids, is_validated=False)
+                    .values_list('id', flat=True)
+                )
+                Ticket.objects.filter(id__in=claimed).update(
+                    is_validated=True,
+                    validated_at=now,
+                    validated_by=validated_by
+                )
+            return claimed
+        
+        qn = connection.ops.quote_name
+        sql = (
+            f"UPDATE {qn(Ticket._meta.db_table)} "
+            f"SET {qn('is_validated')} = %s, {qn('validated_at')} = %s, {qn('validated_by')} = %s "
+            f"WHERE {qn('is_validated')} = %s AND {qn('id')} IN ({', '.join(['%s'] * len(ticket_ids))}) "
+            f"RETURNING {qn('id')}"
+        )
+        params = [
+            True,
+            Ticket._meta.get_field('validated_at').get_db_prep_value(now, connection),
+            validated_by,
+            False,
+            *[pk.get_db_prep_value(ticket_id, connection) for ticket_id in ticket_ids]
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {pk.to_python(row[0]) for row in cursor.fetchall()}
@@ -0,0 +1,127 @@
+"""
+Compact signed ticket tokens for QR codes.
+
+A token packs the booking ID, trip (bus) ID, a seat bitmap and an expiry
+into a few dozen bytes, signs them with HMAC-SHA256 and encodes the result
+in base32. Base32 only uses characters from the QR alphanumeric set, so
+the code stays at a small QR version and scans quickly. A token can be
+checked by signature alone, without a database round trip.
+
+Layout (big-endian):
+    version (1) | booking id (16) | bus id (16) | expiry epoch (4)
+    | seats per row (1) | bitmap length (1) | seat bitmap (n) | hmac (16)
+"""
+import base64
+import hashlib
+import hmac
+import struct
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+
+TOKEN_PREFIX = 'GB1.'
+TOKEN_VERSION = 1
+SIGNATURE_LENGTH = 16
+SEAT_LABELS = 'ABCDE'
+
+_HEADER = struct.Struct('>B16s16sIBB')
+
+
+class InvalidTicketToken(ValueError):
+    """Raised when a ticket token is malformed, forged or expired"""
+
+
+@dataclass(frozen=True)
+class TicketToken:
+    booking_id: uuid.UUID
+    bus_id: uuid.UUID
+    seat_indices: tuple
+    seats_per_row: int
+    expires_at: datetime
+    
+    @property
+    def seat_numbers(self) -> list:
+        """Seat labels in the same "1A" format Bus.create_seats uses"""
+        return [
+            f"{index // self.seats_per_row + 1}{SEAT_LABELS[index % self.seats_per_row]}"
+            for index in self.seat_indices
+        ]
+
+
+def _signing_key() -> bytes:
+    key = getattr(settings, 'TICKET_SIGNING_KEY', '') or settings.SECRET_KEY
+    return key.encode()
+
+
+def _sign(body: bytes) -> bytes:
+    return hmac.new(_signing_key(), body, hashlib.sha256).digest()[:SIGNATURE_LENGTH]
+
+
+def seat_index(row: int, column: int, seats_per_row: int) -> int:
+    """Position of a seat in the bitmap (rows start at 1, columns at 0)"""
+    return (row - 1) * seats_per_row + column
+
+
+def encode_token(booking_id, bus_id, seat_indices, seats_per_row: int, expires_at: datetime) -> str:
+    """Build a signed, QR-friendly ticket token"""
+    bitmap_length = (max(seat_indices, default=-1) + 8) // 8
+    bitmap = bytearray(bitmap_length)
+    for index in seat_indices:
+        bitmap[index // 8] |= 1 << (index % 8)
+    
+    body = _HEADER.pack(
+        TOKEN_VERSION,
+        uuid.UUID(str(booking_id)).bytes,
+        uuid.UUID(str(bus_id)).bytes,
+        int(expires_at.timestamp()),
+        seats_per_row,
+        bitmap_length
+    ) + bytes(bitmap)
+    
+    encoded = base64.b32encode(body + _sign(body)).decode('ascii').rstrip('=')
+    return TOKEN_PREFIX + encoded
+
+
+def decode_token(token: str, now: datetime = None) -> TicketToken:
+    """Verify a token's signature and expiry and return its contents"""
+    if not token.startswith(TOKEN_PREFIX):
+        raise InvalidTicketToken("Invalid ticket type")
+    
+    encoded = token[len(TOKEN_PREFIX):]
+    try:
+        raw = base64.b32decode(encoded + '=' * (-len(encoded) % 8))
+    except ValueError:
+        raise InvalidTicketToken("Invalid QR code format")
+    
+    if len(raw) < _HEADER.size + SIGNATURE_LENGTH:
+        raise InvalidTicketToken("Invalid QR code format")
+    
+    body, signature = raw[:-SIGNATURE_LENGTH], raw[-SIGNATURE_LENGTH:]
+    if not hmac.compare_digest(_sign(body), signature):
+        raise InvalidTicketToken("Invalid ticket signature")
+    
+    version, booking_id, bus_id, expiry, seats_per_row, bitmap_length = _HEADER.unpack_from(body)
+    bitmap = body[_HEADER.size:]
+    if version != TOKEN_VERSION or len(bitmap) != bitmap_length or not seats_per_row:
+        raise InvalidTicketToken("Invalid QR code format")
+    
+    expires_at = datetime.fromtimestamp(expiry, tz=dt_timezone.utc)
+    if expires_at < (now or timezone.now()):
+        raise InvalidTicketToken("Ticket has expired")
+    
+    seat_indices = tuple(
+        byte_index * 8 + bit
+        for byte_index, byte in enumerate(bitmap)
+        for bit in range(8)
+        if byte & (1 << bit)
+    )
+    
+    return TicketToken(
+        booking_id=uuid.UUID(bytes=booking_id),
+        bus_id=uuid.UUID(bytes=bus_id),
+        seat_indices=seat_indices,
+        seats_per_row=seats_per_row,
+        expires_at=expires_at
+    )
@@ -2,10 +2,18 @@
 URL patterns for tickets
 """
 from django.urls import path
-from .views import TicketDetailView, TicketValidateView, MyTicketsView
+from .views import (
+    TicketDetailView,
+    TicketValidateView,
+    TicketBatchValidateView,
+    TicketBulkExportView,
+    MyTicketsView
+)
 
 urlpatterns = [
     path('my-tickets/', MyTicketsView.as_view(), name='my_tickets'),
+    path('bulk/', TicketBulkExportView.as_view(), name='ticket_bulk_export'),
     path('validate/', TicketValidateView.as_view(), name='ticket_validate'),
+    path('validate/batch/', TicketBatchValidateView.as_view(), name='ticket_validate_batch'),
     path('<uuid:booking_id>/', TicketDetailView.as_view(), name='ticket_detail'),
 ]
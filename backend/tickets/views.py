@@ -1,22 +1,49 @@
 """
 Ticket views
 """
+from django.http import StreamingHttpResponse
 from rest_framework import status
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from bookings.cache import TripCache
 from bookings.models import Booking, BookingStatus
 from .models import Ticket
-from .serializers import TicketSerializer, TicketValidateSerializer
+from .bulk import collect_ticket_fields, stream_pdf, stream_zip
+from .serializers import (
+    TicketSerializer,
+    TicketValidateSerializer,
+    TicketBatchValidateSerializer,
+    TicketBulkExportSerializer
+)
+from .rendering import render_on_demand
 from .services import TicketService
 
+QR_FORMATS = ('png', 'svg', 'matrix')
+
+
+class QRFormatNegotiation(DefaultContentNegotiation):
+    """Always answer in JSON; ?format= selects the QR encoding instead"""
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return super().select_renderer(request, renderers, format_suffix or 'json')
+
 
 class TicketDetailView(APIView):
-    """Get ticket for a booking"""
+    """Get ticket for a booking (?format=png|svg|matrix for the QR code)"""
     
     permission_classes = [IsAuthenticated]
+    content_negotiation_class = QRFormatNegotiation
     
     def get(self, request, booking_id):
+        qr_format = request.query_params.get('format', 'png')
+        if qr_format not in QR_FORMATS:
+            return Response(
+                {'error': f"format must be one of: {', '.join(QR_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         try:
             booking = Booking.objects.get(id=booking_id, user=request.user)
         except Booking.DoesNotExist:
@@ -31,7 +58,7 @@ class TicketDetailView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Generate ticket if not exists
+        # Generate ticket if not exists (normally already issued on confirmation)
         try:
             ticket = TicketService.generate_ticket(booking)
         except Exception as e:
@@ -40,12 +67,41 @@ class TicketDetailView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        # Get QR code as base64
+        serializer = TicketSerializer(ticket)
+        
+        # Vector formats are cheap to build and need no Pillow
+        if qr_format == 'svg':
+            return Response({
+                **serializer.data,
+                'qr_status': 'ready',
+                'qr_format': 'svg',
+                'qr_svg': TicketService.get_qr_svg(ticket)
+            })
+        if qr_format == 'matrix':
+            return Response({
+                **serializer.data,
+                'qr_status': 'ready',
+                'qr_format': 'matrix',
+                'qr_matrix': TicketService.get_qr_matrix(ticket)
+            })
+        
+        # Get QR code as base64, rendering on demand only as a bounded fallback
         qr_base64 = TicketService.get_qr_base64(ticket)
+        if qr_base64 is None:
+            qr_base64 = render_on_demand(ticket)
+        
+        if qr_base64 is None:
+            return Response({
+                **serializer.data,
+                'qr_status': 'pending',
+                'qr_format': 'png',
+                'qr_image_base64': None
+            }, status=status.HTTP_202_ACCEPTED)
         
-        serializer = TicketSerializer(ticket)
         return Response({
             **serializer.data,
+            'qr_status': 'ready',
+            'qr_format': 'png',
             'qr_image_base64': qr_base64
         })
 
@@ -77,18 +133,69 @@ class TicketValidateView(APIView):
             return Response(result, status=status.HTTP_400_BAD_REQUEST)
 
 
+class TicketBatchValidateView(APIView):
+    """Validate many scanned tickets in one request (for operators)"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        if request.user.role not in ['operator', 'admin']:
+            return Response(
+                {'error': 'Only operators can validate tickets'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = TicketBatchValidateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = TicketService.validate_tickets(
+            qr_payloads=serializer.validated_data['qr_data'],
+            validated_by=serializer.validated_data.get('validated_by', request.user.name)
+        )
+        validated = sum(1 for result in results if result['valid'])
+        
+        return Response({
+            'validated': validated,
+            'rejected': len(results) - validated,
+            'results': results
+        })
+
+
+class TicketBulkExportView(APIView):
+    """Download tickets for many bookings as one PDF or a ZIP of QR PNGs"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = TicketBulkExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        ticket_fields = collect_ticket_fields(request.user, serializer.validated_data['booking_ids'])
+        if not ticket_fields:
+            return Response(
+                {'error': 'No confirmed bookings found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if serializer.validated_data['format'] == 'zip':
+            response = StreamingHttpResponse(stream_zip(ticket_fields), content_type='application/zip')
+            filename = 'gobus-tickets.zip'
+        else:
+            response = StreamingHttpResponse(stream_pdf(ticket_fields), content_type='application/pdf')
+            filename = 'gobus-tickets.pdf'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Ticket-Count'] = str(len(ticket_fields))
+        return response
+
+
 class MyTicketsView(APIView):
     """Get all tickets for the current user"""
     
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        tickets = Ticket.objects.filter(
-            booking__user=request.user
-        ).select_related('booking', 'booking__bus').order_by('-created_at')
-        
-        serializer = TicketSerializer(tickets, many=True)
+        tickets = TripCache.get_tickets(request.user)
         return Response({
-            'count': tickets.count(),
-            'tickets': serializer.data
+            'count': len(tickets),
+            'tickets': tickets
         })